@@ -1,5 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -10,10 +11,14 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from shared.auth import get_current_user, require_role
+from shared.query_stats import QueryStatsMiddleware, query_metrics, instrument_engine
+from shared.slow_queries import slow_query_log
+from shared.database import workload_pools
 
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://postgres:postgres@db:5432/ev_repair_db')
 engine = create_engine(DATABASE_URL)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -28,6 +33,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
 
 # Import routes
 from routes import router as admin_router
@@ -42,6 +48,25 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+def metrics():
+    """Per-endpoint query counts, DB time and workload-class pool usage in Prometheus text format"""
+    return PlainTextResponse(query_metrics.render_prometheus() + workload_pools.render_prometheus())
+
+@app.get("/metrics/queries")
+def query_metrics_detail(current_user: dict = Depends(require_role(["admin"]))):
+    """Per-endpoint query stats and the most repeated (N+1) statement shapes"""
+    return query_metrics.get_stats()
+
+@app.get("/metrics/slow-queries")
+def slow_queries(
+    limit: int = 20,
+    order_by: str = "total",
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Slowest statement shapes seen by this instance (order_by: total, max, avg, count)"""
+    return slow_query_log.get_stats(limit, order_by)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8007)
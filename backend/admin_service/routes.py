@@ -1,4 +1,4 @@
-from fastapi import Body, APIRouter, Depends, HTTPException, status
+from fastapi import Body, APIRouter, Depends, HTTPException, status, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, desc
@@ -16,7 +16,9 @@ import os
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from shared.auth import get_current_user, require_role
+from shared.auth import get_current_user, require_role, invalidate_user_profile
+from shared.cache import cache_service, CacheTags
+from shared.database import get_analytics_db, query_optimizer
 from shared import models as shared_models
 
 router = APIRouter()
@@ -29,6 +31,30 @@ def get_db():
     finally:
         db.close()
 
+# Larger than any page the dashboard asks for
+MAX_PAGE_SIZE = 1000
+
+def paginate(query, response: Response, sort_column, id_column, skip: int, limit: int,
+             cursor: Optional[str] = None, descending: bool = True):
+    """
+    OFFSET pagination when `skip` is given (existing clients), otherwise keyset
+    pagination with the next cursor in the X-Next-Cursor header.
+    """
+    if skip:
+        if descending:
+            query = query.order_by(sort_column.desc(), id_column.desc())
+        else:
+            query = query.order_by(sort_column.asc(), id_column.asc())
+        return query.offset(skip).limit(limit).all()
+    try:
+        page = query_optimizer.paginate_keyset(
+            query, sort_column, id_column, cursor, limit, descending, max_limit=MAX_PAGE_SIZE
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    page.set_headers(response)
+    return page.items
+
 # ==================== INVENTORY APIs ====================
 
 # Sau các endpoint inventory:
@@ -48,6 +74,7 @@ def adjust_inventory_stock(item_id: str, data: dict = Body(...), db: Session = D
     db_item.quantity_in_stock = db_item.quantity_in_stock + int(quantity_change)
     db_item.updated_at = datetime.utcnow()
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.PARTS])
     db.refresh(db_item)
     # Ghi log nếu cần
     return db_item
@@ -56,8 +83,10 @@ def adjust_inventory_stock(item_id: str, data: dict = Body(...), db: Session = D
 
 @router.get("/users", response_model=List[dict])
 def get_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     role: str = None,
     status: str = None,
     db: Session = Depends(get_db),
@@ -91,7 +120,7 @@ def get_users(
     elif status == "inactive":
         query = query.filter(models.User.is_active == False)
     
-    users = query.offset(skip).limit(limit).all()
+    users = paginate(query, response, models.User.created_at, models.User.id, skip, limit, cursor)
     
     # Enrich user data with staff/technician info
     result = []
@@ -227,6 +256,7 @@ def update_user(user_id: str, user_update: schemas.UserUpdate, current_user: dic
         )
     
     update_data = user_update.dict(exclude_unset=True)
+    was_technician = db_user.role == "technician"
     
     # Handle password hashing if password is being updated
     if 'password' in update_data and update_data['password']:
@@ -238,6 +268,11 @@ def update_user(user_id: str, user_update: schemas.UserUpdate, current_user: dic
     
     db.commit()
     db.refresh(db_user)
+    # Profile fields or is_active may have changed
+    invalidate_user_profile(db_user.id)
+    # The cached technicians list shows name, phone and email, and filters on role
+    if was_technician or db_user.role == "technician":
+        cache_service.invalidate_tags_sync([CacheTags.TECHNICIANS])
     
     log_activity(db, current_user.get("id"), "update", "user", user_id, f"Updated user: {db_user.username}")
     
@@ -267,8 +302,12 @@ def delete_user(user_id: str, current_user: dict = Depends(get_current_user), db
         )
     
     username = db_user.username
+    was_technician = db_user.role == "technician"
     db.delete(db_user)
     db.commit()
+    invalidate_user_profile(user_uuid)
+    if was_technician:
+        cache_service.invalidate_tags_sync([CacheTags.TECHNICIANS])
     
     log_activity(db, current_user.get("id"), "delete", "user", user_id, f"Deleted user: {username}")
     
@@ -332,6 +371,7 @@ def create_branch(branch: schemas.BranchCreate, db: Session = Depends(get_db)):
     db_branch = models.Branch(**branch.dict())
     db.add(db_branch)
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.SERVICE_CENTERS])
     db.refresh(db_branch)
     
     log_activity(db, None, "create", "branch", db_branch.id, f"Created branch: {branch.name}")
@@ -356,6 +396,7 @@ def update_branch(branch_id: str, branch_update: schemas.BranchUpdate, db: Sessi
         setattr(db_branch, field, value)
     
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.SERVICE_CENTERS])
     db.refresh(db_branch)
     
     log_activity(db, None, "update", "branch", branch_id, f"Updated branch: {db_branch.name}")
@@ -378,6 +419,7 @@ def delete_branch(branch_id: str, db: Session = Depends(get_db)):
     name = db_branch.name
     db.delete(db_branch)
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.SERVICE_CENTERS])
     
     log_activity(db, None, "delete", "branch", branch_id, f"Deleted branch: {name}")
     
@@ -387,8 +429,10 @@ def delete_branch(branch_id: str, db: Session = Depends(get_db)):
 
 @router.get("/inventory", response_model=List[schemas.InventoryResponse])
 def get_inventory(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     category: str = None,
     low_stock: bool = False,
     db: Session = Depends(get_db)
@@ -401,7 +445,9 @@ def get_inventory(
     if low_stock:
         query = query.filter(models.Inventory.quantity_in_stock < models.Inventory.minimum_stock_level)
     
-    items = query.offset(skip).limit(limit).all()
+    items = paginate(
+        query, response, models.Inventory.name, models.Inventory.id, skip, limit, cursor, descending=False
+    )
     return items
 
 @router.post("/inventory", response_model=schemas.InventoryResponse)
@@ -410,6 +456,7 @@ def create_inventory_item(item: schemas.InventoryCreate, db: Session = Depends(g
     db_item = models.Inventory(**item.dict())
     db.add(db_item)
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.PARTS])
     db.refresh(db_item)
     
     log_activity(db, None, "create", "inventory", db_item.id, f"Created inventory item: {item.name}")
@@ -435,6 +482,7 @@ def update_inventory_item(item_id: str, item_update: schemas.InventoryUpdate, db
     
     db_item.updated_at = datetime.utcnow()
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.PARTS])
     db.refresh(db_item)
     
     log_activity(db, None, "update", "inventory", item_id, f"Updated inventory item: {db_item.name}")
@@ -457,6 +505,7 @@ def delete_inventory_item(item_id: str, db: Session = Depends(get_db)):
     name = db_item.name
     db.delete(db_item)
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.PARTS])
     
     log_activity(db, None, "delete", "inventory", item_id, f"Deleted inventory item: {name}")
     
@@ -476,6 +525,7 @@ def create_service(service: schemas.ServiceCreate, db: Session = Depends(get_db)
     db_service = shared_models.ServiceType(**service.dict())
     db.add(db_service)
     db.commit()
+    cache_service.invalidate_tags_sync([CacheTags.SERVICE_TYPES])
     db.refresh(db_service)
     
     log_activity(db, None, "create", "service", db_service.id, f"Created service: {service.name}")
@@ -591,11 +641,18 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
 # ==================== ACTIVITY LOGS ====================
 
 @router.get("/activities", response_model=List[schemas.ActivityLogResponse])
-def get_activities(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    """Get activity logs"""
-    activities = db.query(models.ActivityLog).order_by(
-        desc(models.ActivityLog.created_at)
-    ).offset(skip).limit(limit).all()
+def get_activities(
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get activity logs, newest first"""
+    activities = paginate(
+        db.query(models.ActivityLog), response, models.ActivityLog.created_at, models.ActivityLog.id,
+        skip, limit, cursor
+    )
     return activities
 
 # ==================== HELPER FUNCTIONS ====================
@@ -652,7 +709,7 @@ def format_time_ago(dt):
 # ==================== FINANCE ENDPOINTS ====================
 
 @router.get("/finance/stats", response_model=schemas.FinanceStats)
-def get_finance_stats(db: Session = Depends(get_db)):
+def get_finance_stats(db: Session = Depends(get_analytics_db)):
     """Get financial statistics"""
     
     # Total revenue from completed appointments
@@ -760,7 +817,7 @@ def get_transactions(
     status: str = None,
     start_date: str = None,
     end_date: str = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Get all financial transactions"""
     query = db.query(models.Appointment).filter(
@@ -802,7 +859,7 @@ def get_transactions(
 @router.get("/finance/revenue")
 def get_revenue_data(
     period: str = "monthly",  # daily, weekly, monthly
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Get revenue data by period"""
     today = datetime.utcnow()
@@ -860,7 +917,7 @@ def get_revenue_data(
     return data
 
 @router.get("/finance/expenses")
-def get_expense_data(db: Session = Depends(get_db)):
+def get_expense_data(db: Session = Depends(get_analytics_db)):
     """Get expense breakdown by category"""
     
     # Mock expense data (would come from expenses table in real app)
@@ -884,7 +941,7 @@ def get_expense_data(db: Session = Depends(get_db)):
 def export_finance_pdf(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Export finance report as PDF (simplified version - returns CSV for now)"""
     
@@ -929,7 +986,7 @@ Báo cáo được tạo tự động bởi hệ thống EV Care
 def export_finance_excel(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Export finance report as Excel (simplified CSV version)"""
     
@@ -966,8 +1023,10 @@ def export_finance_excel(
 
 @router.get("/appointments", response_model=List[schemas.AppointmentResponse])
 def get_appointments(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: str = None,
     db: Session = Depends(get_db)
 ):
@@ -977,7 +1036,9 @@ def get_appointments(
     if status:
         query = query.filter(models.Appointment.status == status)
     
-    appointments = query.offset(skip).limit(limit).all()
+    appointments = paginate(
+        query, response, models.Appointment.created_at, models.Appointment.id, skip, limit, cursor
+    )
     return appointments
 
 @router.get("/appointments/{appointment_id}", response_model=schemas.AppointmentResponse)
@@ -1180,6 +1241,7 @@ def create_work_schedule(schedule: schemas.WorkScheduleCreate, db: Session = Dep
                 )
                 db.add(new_technician)
                 db.commit()
+                cache_service.invalidate_tags_sync([CacheTags.TECHNICIANS])
                 db.refresh(new_technician)
                 technician_id = new_technician.id
                 technician = new_technician
@@ -1346,6 +1408,7 @@ def update_work_schedule(schedule_id: str, schedule_update: schemas.WorkSchedule
                     )
                     db.add(new_technician)
                     db.commit()
+                    cache_service.invalidate_tags_sync([CacheTags.TECHNICIANS])
                     db.refresh(new_technician)
                     update_data['technician_id'] = new_technician.id
                 else:
@@ -0,0 +1,125 @@
+"""
+Hedged Requests
+For a few latency-critical idempotent GETs, sends a second copy to another
+replica when the first has not answered within the route's observed p95,
+keeps whichever answers first and cancels the other. A global token budget
+caps the extra load hedging can add.
+"""
+import os
+import re
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from resilience import LatencyTracker, RetryBudget
+
+logger = logging.getLogger('api_gateway.hedging')
+
+HEDGING_ENABLED = os.getenv("GATEWAY_HEDGING", "true").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("GATEWAY_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("GATEWAY_HEDGE_MIN_DELAY", "0.005"))
+HEDGE_MAX_DELAY = float(os.getenv("GATEWAY_HEDGE_MAX_DELAY", "1.0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("GATEWAY_HEDGE_MIN_SAMPLES", "20"))
+# Each eligible request earns `ratio` hedge tokens, so hedges stay below that share of traffic
+HEDGE_BUDGET_RATIO = float(os.getenv("GATEWAY_HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_BUDGET_MIN = float(os.getenv("GATEWAY_HEDGE_BUDGET_MIN", "5"))
+
+
+@dataclass
+class HedgeRoute:
+    """An idempotent GET route that opts into hedging"""
+    service: str
+    pattern: re.Pattern
+    name: str
+
+
+HEDGE_ROUTES = [
+    HedgeRoute("customer", re.compile(r"^vehicles/[^/]+/?$"), "customer:vehicles/{id}"),
+    HedgeRoute("notification", re.compile(r"^notifications/unread-count/?$"), "notification:notifications/unread-count"),
+]
+
+
+class HedgePolicy:
+    """Per-route hedge delays from observed latency, plus one shared budget"""
+
+    def __init__(self, routes: List[HedgeRoute], enabled: bool = HEDGING_ENABLED):
+        self.routes = routes
+        self.enabled = enabled
+        self.latency: Dict[str, LatencyTracker] = {route.name: LatencyTracker() for route in routes}
+        self.budget = RetryBudget(ratio=HEDGE_BUDGET_RATIO, min_tokens=HEDGE_BUDGET_MIN)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def match(self, service: str, path: str) -> Optional[HedgeRoute]:
+        if not self.enabled:
+            return None
+        for route in self.routes:
+            if route.service == service and route.pattern.match(path):
+                return route
+        return None
+
+    def delay_for(self, route: HedgeRoute) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latency has been observed"""
+        tracker = self.latency[route.name]
+        if len(tracker.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        observed = tracker.percentile(HEDGE_PERCENTILE)
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, observed))
+
+    def record(self, route: HedgeRoute, seconds: float):
+        self.latency[route.name].record(seconds)
+
+    async def run(self, primary: Awaitable[Any], start_hedge: Callable[[], Awaitable[Any]],
+                  delay: float, acceptable: Callable[[Any], bool] = lambda result: True) -> Any:
+        """
+        Await primary; if it is still running after delay and the budget allows,
+        start a hedge and return the first acceptable result. A failed or
+        unacceptable result only wins when the other call fails too.
+        """
+        self.budget.deposit()
+        primary_task = asyncio.ensure_future(primary)
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self.budget.try_spend():
+                return await primary_task
+
+            self.hedges_sent += 1
+            hedge_task = asyncio.ensure_future(start_hedge())
+            tasks.add(hedge_task)
+            pending = set(tasks)
+            fallback = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and acceptable(task.result()):
+                        if task is hedge_task:
+                            self.hedges_won += 1
+                        return task.result()
+                    fallback = fallback or task
+            return fallback.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route in self.routes:
+            delay = self.delay_for(route)
+            routes[route.name] = {
+                "samples": len(self.latency[route.name].samples),
+                "hedge_delay": round(delay, 4) if delay is not None else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "budget_tokens": round(self.budget.tokens, 2),
+            "budget_exhausted": self.budget.exhausted,
+            "routes": routes,
+        }
+
+
+hedging = HedgePolicy(HEDGE_ROUTES)
@@ -0,0 +1,226 @@
+"""
+Downstream HTTP Client Pool
+Keeps one long-lived httpx.AsyncClient per downstream service so proxied
+calls reuse keep-alive connections instead of opening a new TCP connection
+for every request. Services with several replicas are spread across them
+through the shared load balancer.
+"""
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple
+
+import httpx
+
+from shared.load_balancer import LoadBalancer, Endpoint
+
+logger = logging.getLogger('api_gateway.http_pool')
+
+
+def _env_value(name: str, service: Optional[str], default: str) -> str:
+    """Read a pool setting, allowing a per-service override (e.g. NAME_PAYMENT)"""
+    if service:
+        override = os.getenv(f"{name}_{service.upper()}")
+        if override:
+            return override
+    return os.getenv(name, default)
+
+
+@dataclass
+class PoolSettings:
+    """Connection pool configuration for one downstream service"""
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    connect_timeout: float
+    read_timeout: float
+    pool_timeout: float
+    http2: bool
+
+    @classmethod
+    def from_env(cls, service: Optional[str] = None) -> "PoolSettings":
+        return cls(
+            max_connections=int(_env_value("GATEWAY_POOL_MAX_CONNECTIONS", service, "100")),
+            max_keepalive_connections=int(_env_value("GATEWAY_POOL_MAX_KEEPALIVE", service, "20")),
+            keepalive_expiry=float(_env_value("GATEWAY_POOL_KEEPALIVE_EXPIRY", service, "30")),
+            connect_timeout=float(_env_value("GATEWAY_CONNECT_TIMEOUT", service, "5")),
+            read_timeout=float(_env_value("GATEWAY_UPSTREAM_TIMEOUT", service, "30")),
+            pool_timeout=float(_env_value("GATEWAY_POOL_ACQUIRE_TIMEOUT", service, "5")),
+            http2=_env_value("GATEWAY_HTTP2", service, "false").lower() in ("1", "true", "yes"),
+        )
+
+
+@dataclass
+class ServicePoolStats:
+    """Usage counters for one downstream client"""
+    requests_total: int = 0
+    errors_total: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    total_time: float = 0.0
+
+
+class DownstreamClientPool:
+    """
+    One pooled AsyncClient per downstream service, created at startup and
+    closed at shutdown. `services` holds the base URL callers build request
+    URLs from; `replicas` optionally lists the endpoints actually serving it.
+    """
+
+    def __init__(self, services: Dict[str, str], replicas: Optional[Dict[str, List[str]]] = None):
+        self.services = {name: url.rstrip("/") for name, url in services.items()}
+        self.settings = {name: PoolSettings.from_env(name) for name in self.services}
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.stats = {name: ServicePoolStats() for name in self.services}
+        replicas = replicas or {}
+        self.balancers = {
+            name: LoadBalancer(name, replicas.get(name) or [url])
+            for name, url in self.services.items()
+        }
+
+    def _http2_available(self) -> bool:
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _create_client(self, service: str) -> httpx.AsyncClient:
+        settings = self.settings[service]
+        http2 = settings.http2
+        if http2 and not self._http2_available():
+            logger.warning("HTTP/2 requested for %s but the 'h2' package is missing; using HTTP/1.1", service)
+            http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.read_timeout,
+                connect=settings.connect_timeout,
+                pool=settings.pool_timeout,
+            ),
+        )
+
+    async def start(self):
+        """Create the per-service clients and start replica health probes"""
+        for service in self.services:
+            if service not in self.clients:
+                self.clients[service] = self._create_client(service)
+            self.balancers[service].start_health_checks(self.clients[service])
+        logger.info("Downstream client pool started for %s", ", ".join(self.services))
+
+    async def close(self):
+        """Close every client and release pooled connections"""
+        for balancer in self.balancers.values():
+            await balancer.stop_health_checks()
+        for service, client in list(self.clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing client for {service}: {e}")
+        self.clients.clear()
+        logger.info("Downstream client pool closed")
+
+    def service_for_url(self, url: str) -> Optional[str]:
+        """Resolve which downstream service a full URL belongs to"""
+        for service, base_url in self.services.items():
+            if url == base_url or url.startswith(base_url + "/"):
+                return service
+        return None
+
+    def client_for(self, service: str) -> httpx.AsyncClient:
+        """Get the pooled client for a service (created lazily if startup did not run)"""
+        client = self.clients.get(service)
+        if client is None or client.is_closed:
+            client = self._create_client(service)
+            self.clients[service] = client
+        return client
+
+    def timeout_for(self, service: str, read_timeout: float) -> httpx.Timeout:
+        """Per-call timeout with the service's connect/pool limits and a custom read timeout"""
+        settings = self.settings[service]
+        return httpx.Timeout(read_timeout, connect=settings.connect_timeout, pool=settings.pool_timeout)
+
+    def acquire_endpoint(self, service: str, url: str, exclude: Optional[Endpoint] = None) -> Tuple[Endpoint, str]:
+        """Pick a replica for a call and rewrite the service URL onto it"""
+        endpoint = self.balancers[service].acquire(exclude)
+        return endpoint, endpoint.url + url[len(self.services[service]):]
+
+    def release_endpoint(self, service: str, endpoint: Endpoint, success: bool = True):
+        self.balancers[service].release(endpoint, success)
+
+    def client_for_url(self, url: str) -> httpx.AsyncClient:
+        service = self.service_for_url(url)
+        if service is None:
+            raise ValueError(f"No downstream service configured for {url}")
+        return self.client_for(service)
+
+    def begin_request(self, service: str) -> float:
+        """Mark a call as in flight; returns the start time for end_request"""
+        stats = self.stats[service]
+        stats.requests_total += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        return time.perf_counter()
+
+    def end_request(self, service: str, start_time: float, failed: bool = False):
+        """Mark a call started with begin_request as finished"""
+        stats = self.stats[service]
+        stats.in_flight -= 1
+        stats.total_time += time.perf_counter() - start_time
+        if failed:
+            stats.errors_total += 1
+
+    @asynccontextmanager
+    async def track(self, service: str):
+        """Record in-flight count and latency for a call made through the pool"""
+        start_time = self.begin_request(service)
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.end_request(service, start_time, failed)
+
+    def _connection_counts(self, client: Optional[httpx.AsyncClient]) -> Dict[str, int]:
+        """Inspect the underlying httpcore pool; best effort since it is not public API"""
+        counts = {"open": 0, "idle": 0, "active": 0}
+        if client is None:
+            return counts
+        try:
+            connections = client._transport._pool.connections
+            counts["open"] = len(connections)
+            counts["idle"] = sum(1 for conn in connections if conn.is_idle())
+            counts["active"] = counts["open"] - counts["idle"]
+        except Exception:
+            pass
+        return counts
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool usage per service, for sizing the limits"""
+        result = {}
+        for service, stats in self.stats.items():
+            settings = self.settings[service]
+            avg_time = stats.total_time / stats.requests_total if stats.requests_total else 0.0
+            result[service] = {
+                **asdict(stats),
+                "average_time": avg_time,
+                "connections": self._connection_counts(self.clients.get(service)),
+                "balancer": self.balancers[service].get_stats(),
+                "limits": {
+                    "max_connections": settings.max_connections,
+                    "max_keepalive_connections": settings.max_keepalive_connections,
+                    "keepalive_expiry": settings.keepalive_expiry,
+                    "http2": settings.http2,
+                },
+            }
+        return result
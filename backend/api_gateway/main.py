@@ -1,26 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, WebSocket
+from fastapi import FastAPI, Depends, HTTPException, status, Request, WebSocket, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import timedelta
 import sys
 import os
+import re
+import time
+import hashlib
 import logging
+import asyncio
+from urllib.parse import urlencode, urlsplit, parse_qsl
+from typing import Optional
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.database import get_db, engine
+from shared.database import get_db, engine, SessionLocal
+from shared.singleflight import SingleFlight
+from shared.cache import cache_service, CacheTags
+from shared.load_balancer import endpoints_from_env
 from shared.models import User, Customer, Staff, Technician, Base
 from shared.auth import (
     verify_password, 
+    verify_password_async,
     create_access_token, 
     decode_access_token,
     get_password_hash,
+    get_password_hash_async,
+    password_needs_rehash,
+    password_hasher,
     get_current_user,
+    get_user_profile_cached,
+    token_cache,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from schemas import UserCreate, UserResponse, Token, UserLogin
+from schemas import UserCreate, UserResponse, Token, UserLogin, BatchRequest, BatchItem, BatchResponse
+from http_pool import DownstreamClientPool
+from response_cache import response_cache, etag_matches
+from resilience import resilience, FAILURE_STATUS_CODES
+from hedging import hedging
 import httpx
 
 # Create tables
@@ -60,6 +80,38 @@ NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://localho
 PAYMENT_SERVICE_URL = os.getenv("PAYMENT_SERVICE_URL", "http://localhost:8005")
 ADMIN_SERVICE_URL = os.getenv("ADMIN_SERVICE_URL", "http://localhost:8007")
 
+# One long-lived, pooled HTTP client per downstream service. Replicas come from
+# the *_SERVICE_URLS lists (comma-separated) and default to the single URL.
+downstream_pool = DownstreamClientPool(
+    {
+        "customer": CUSTOMER_SERVICE_URL,
+        "service_center": SERVICE_CENTER_URL,
+        "chat": CHAT_SERVICE_URL,
+        "notification": NOTIFICATION_SERVICE_URL,
+        "payment": PAYMENT_SERVICE_URL,
+        "admin": ADMIN_SERVICE_URL,
+    },
+    replicas={
+        "customer": endpoints_from_env("CUSTOMER_SERVICE_URLS", CUSTOMER_SERVICE_URL),
+        "service_center": endpoints_from_env("SERVICE_CENTER_URLS", SERVICE_CENTER_URL),
+        "chat": endpoints_from_env("CHAT_SERVICE_URLS", CHAT_SERVICE_URL),
+        "notification": endpoints_from_env("NOTIFICATION_SERVICE_URLS", NOTIFICATION_SERVICE_URL),
+        "payment": endpoints_from_env("PAYMENT_SERVICE_URLS", PAYMENT_SERVICE_URL),
+        "admin": endpoints_from_env("ADMIN_SERVICE_URLS", ADMIN_SERVICE_URL),
+    }
+)
+
+@app.on_event("startup")
+async def start_downstream_pool():
+    await downstream_pool.start()
+    for service in downstream_pool.services:
+        resilience.get(service)
+
+@app.on_event("shutdown")
+async def close_downstream_pool():
+    await downstream_pool.close()
+    await cache_service.close()
+
 @app.get("/")
 async def root():
     return {
@@ -75,72 +127,142 @@ async def root():
         }
     }
 
+def _store_password_hash(user_id, password_hash: str):
+    """Persist an upgraded hash on a short-lived session of its own"""
+    db = SessionLocal.session_factory()
+    try:
+        db.query(User).filter(User.id == user_id).update({User.password_hash: password_hash})
+        db.commit()
+    finally:
+        db.close()
+
+async def upgrade_password_hash(user_id, password: str):
+    """Re-hash with the current BCRYPT_ROUNDS after a successful login"""
+    try:
+        new_hash = await get_password_hash_async(password)
+        await run_in_threadpool(_store_password_hash, user_id, new_hash)
+        logger.info("Upgraded password hash cost for user id=%s", user_id)
+    except Exception as e:
+        # Not fatal: the old hash keeps working and the upgrade is retried next login
+        logger.warning("Password hash upgrade failed for user id=%s: %s", user_id, e)
+
+def login_snapshot(user: User) -> dict:
+    """The fields a login needs, as plain values usable after the session closes"""
+    return {
+        "id": user.id,
+        "email": user.email,
+        "role": user.role,
+        "full_name": user.full_name,
+        "is_active": user.is_active,
+        "password_hash": user.password_hash
+    }
+
+def _load_login_account(email: str) -> Optional[dict]:
+    """
+    Look up a login on a short-lived session of its own; run through
+    run_in_threadpool so the query never blocks the event loop.
+    """
+    db = SessionLocal.session_factory()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        return login_snapshot(user) if user else None
+    finally:
+        db.close()
+
+def _email_registered(email: str) -> bool:
+    db = SessionLocal.session_factory()
+    try:
+        return db.query(User.id).filter(User.email == email).first() is not None
+    finally:
+        db.close()
+
+def _create_user(user_data: UserCreate, password_hash: str) -> UserResponse:
+    """Insert the user and its role profile on a short-lived session (threadpool)"""
+    db = SessionLocal.session_factory()
+    try:
+        # Auto-generate username from email (part before @)
+        username = user_data.email.split('@')[0]
+        
+        # Check if username already exists, if so, append numbers
+        base_username = username
+        counter = 1
+        while db.query(User.id).filter(User.username == username).first():
+            username = f"{base_username}{counter}"
+            counter += 1
+        
+        # Create user
+        db_user = User(
+            email=user_data.email,
+            username=username,
+            password_hash=password_hash,
+            full_name=user_data.full_name,
+            phone=user_data.phone,
+            role=user_data.role
+        )
+        db.add(db_user)
+        db.flush()
+        
+        # Create role-specific profile
+        if user_data.role == "customer":
+            db.add(Customer(user_id=db_user.id))
+        elif user_data.role == "staff":
+            db.add(Staff(user_id=db_user.id))
+        elif user_data.role == "technician":
+            db.add(Technician(user_id=db_user.id))
+        
+        db.commit()
+        db.refresh(db_user)
+        
+        return UserResponse(
+            id=str(db_user.id),
+            email=db_user.email,
+            full_name=db_user.full_name,
+            phone=db_user.phone,
+            role=db_user.role,
+            is_active=db_user.is_active
+        )
+    finally:
+        db.close()
+
+async def check_password(account: dict, password: str, background_tasks: BackgroundTasks) -> bool:
+    """
+    Verify on the bcrypt pool. Outdated hashes are upgraded after the response
+    is sent, so the second bcrypt run and the write stay out of login latency.
+    """
+    if not await verify_password_async(password, account["password_hash"]):
+        return False
+    if password_needs_rehash(account["password_hash"]):
+        background_tasks.add_task(upgrade_password_hash, account["id"], password)
+    return True
+
 @app.post("/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    # Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+async def register(user_data: UserCreate):
+    # Database work runs in the threadpool; bcrypt runs on its own pool
+    if await run_in_threadpool(_email_registered, user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Auto-generate username from email (part before @)
-    username = user_data.email.split('@')[0]
-    
-    # Check if username already exists, if so, append numbers
-    base_username = username
-    counter = 1
-    while db.query(User).filter(User.username == username).first():
-        username = f"{base_username}{counter}"
-        counter += 1
-    
-    # Create user
-    db_user = User(
-        email=user_data.email,
-        username=username,
-        password_hash=get_password_hash(user_data.password),
-        full_name=user_data.full_name,
-        phone=user_data.phone,
-        role=user_data.role
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    # Create role-specific profile
-    if user_data.role == "customer":
-        customer = Customer(user_id=db_user.id)
-        db.add(customer)
-    elif user_data.role == "staff":
-        staff = Staff(user_id=db_user.id)
-        db.add(staff)
-    elif user_data.role == "technician":
-        technician = Technician(user_id=db_user.id)
-        db.add(technician)
-    
-    db.commit()
-    
-    return UserResponse(
-        id=str(db_user.id),
-        email=db_user.email,
-        full_name=db_user.full_name,
-        phone=db_user.phone,
-        role=db_user.role,
-        is_active=db_user.is_active
-    )
+    # Hash on the bcrypt pool only once the email is known to be new
+    password_hash = await get_password_hash_async(user_data.password)
+    user = await run_in_threadpool(_create_user, user_data, password_hash)
+    if user.role == "technician":
+        # service_center caches the technicians list under this tag
+        await cache_service.invalidate_tags([CacheTags.TECHNICIANS])
+    return user
 
 @app.post("/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(background_tasks: BackgroundTasks, form_data: OAuth2PasswordRequestForm = Depends()):
+    account = await run_in_threadpool(_load_login_account, form_data.username)
+    if not account or not await check_password(account, form_data.password, background_tasks):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not user.is_active:
+    if not account["is_active"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive"
@@ -149,21 +271,21 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={
-            "sub": user.email, 
-            "user_id": str(user.id),
-            "role": user.role,
-            "full_name": user.full_name
+            "sub": account["email"], 
+            "user_id": str(account["id"]),
+            "role": account["role"],
+            "full_name": account["full_name"]
         },
         expires_delta=access_token_expires
     )
     
-    return Token(access_token=access_token, token_type="bearer", role=user.role)
+    return Token(access_token=access_token, token_type="bearer", role=account["role"])
 
 @app.post("/auth/login-json", response_model=Token)
-async def login_json(user_login: UserLogin, db: Session = Depends(get_db)):
+async def login_json(user_login: UserLogin, background_tasks: BackgroundTasks):
     logger.info("Login-json attempt for email=%s", user_login.email)
-    user = db.query(User).filter(User.email == user_login.email).first()
-    if not user:
+    account = await run_in_threadpool(_load_login_account, user_login.email)
+    if not account:
         logger.info("Login-json: user not found for email=%s", user_login.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -172,13 +294,16 @@ async def login_json(user_login: UserLogin, db: Session = Depends(get_db)):
 
     # Log a short prefix of password_hash for debugging malformed hashes
     try:
-        ph_sample = (user.password_hash[:40] + '...') if user.password_hash else '<none>'
-        logger.info("Login-json: found user id=%s role=%s password_hash_prefix=%s", str(user.id), user.role, ph_sample)
+        ph_sample = (account["password_hash"][:40] + '...') if account["password_hash"] else '<none>'
+        logger.info("Login-json: found user id=%s role=%s password_hash_prefix=%s", str(account["id"]), account["role"], ph_sample)
     except Exception as e:
         logger.exception("Error reading password_hash for user %s: %s", user_login.email, e)
 
     try:
-        pw_ok = verify_password(user_login.password, user.password_hash)
+        pw_ok = await check_password(account, user_login.password, background_tasks)
+    except HTTPException:
+        # bcrypt pool saturated: surface the 503 instead of a 401
+        raise
     except Exception as e:
         # Log exception details to help trace 'Invalid salt' errors
         logger.exception("Password verification error for user %s: %s", user_login.email, e)
@@ -194,7 +319,7 @@ async def login_json(user_login: UserLogin, db: Session = Depends(get_db)):
             detail="Incorrect email or password"
         )
     
-    if not user.is_active:
+    if not account["is_active"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive"
@@ -203,19 +328,19 @@ async def login_json(user_login: UserLogin, db: Session = Depends(get_db)):
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={
-            "sub": user.email, 
-            "user_id": str(user.id),
-            "role": user.role,
-            "full_name": user.full_name
+            "sub": account["email"], 
+            "user_id": str(account["id"]),
+            "role": account["role"],
+            "full_name": account["full_name"]
         },
         expires_delta=access_token_expires
     )
     
-    return Token(access_token=access_token, token_type="bearer", role=user.role)
+    return Token(access_token=access_token, token_type="bearer", role=account["role"])
 
 @app.get("/auth/me", response_model=UserResponse)
 async def get_current_user_info(request: Request, db: Session = Depends(get_db)):
-    logger.info("Auth me request from %s headers=%s", request.client.host if request.client else '<unknown>', dict(request.headers))
+    logger.debug("Auth me request from %s", request.client.host if request.client else '<unknown>')
     
     # Get token from Authorization header or query params
     auth_header = request.headers.get("Authorization")
@@ -243,45 +368,314 @@ async def get_current_user_info(request: Request, db: Session = Depends(get_db))
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == payload["user_id"]).first()
-    if not user:
+    def load_profile(user_id: str):
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return None
+        return {
+            "id": str(user.id),
+            "email": user.email,
+            "full_name": user.full_name,
+            "phone": user.phone,
+            "role": user.role,
+            "is_active": user.is_active
+        }
+    
+    profile = await get_user_profile_cached(payload["user_id"], load_profile)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(
-        id=str(user.id),
-        email=user.email,
-        full_name=user.full_name,
-        phone=user.phone,
-        role=user.role,
-        is_active=user.is_active
-    )
+    return UserResponse(**profile)
 
 # Proxy endpoints to microservices
+BODY_METHODS = ("POST", "PUT", "PATCH")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Headers that only apply to a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade", "host"
+}
+
+# Downstream headers that survive proxy_json re-wrapping the body (pagination cursor, query debug stats)
+PASSTHROUGH_HEADERS = ("x-next-cursor", "x-db-query-count", "x-db-time-ms", "x-db-n-plus-one")
+
+# Concurrent identical GETs share one downstream call
+COALESCE_GETS = os.getenv("GATEWAY_COALESCE_GETS", "true").lower() in ("1", "true", "yes")
+get_coalescer = SingleFlight("gateway_get")
+
+# GET routes whose responses depend only on the caller's role, so callers
+# with the same role (not just the same token) can share one call
+ROLE_SCOPED_GETS = {
+    "service_center": re.compile(r"^(dashboard/stats|queue/status)/?$"),
+}
+
+# Routes whose bodies are passed through in chunks instead of being decoded as JSON
+STREAMING_ROUTES = {
+    "service_center": re.compile(r"^reports/"),
+    "admin": re.compile(r"(^|/)export(/|$)"),
+}
+
+async def send_to_replica(service: str, endpoint, target_url: str, method: str, **request_kwargs):
+    """One downstream call on an already chosen replica; releases the replica afterwards"""
+    client = downstream_pool.client_for(service)
+    # A call cancelled because its hedge won is not held against the replica
+    endpoint_ok = True
+    try:
+        async with downstream_pool.track(service):
+            response = await client.request(method, target_url, **request_kwargs)
+        endpoint_ok = response.status_code not in FAILURE_STATUS_CODES
+        return response
+    except Exception:
+        endpoint_ok = False
+        raise
+    finally:
+        downstream_pool.release_endpoint(service, endpoint, endpoint_ok)
+
 async def proxy_request(url: str, method: str = "GET", headers: dict = None, json_data: dict = None, params: dict = None):
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    service = downstream_pool.service_for_url(url)
+    guard = resilience.get(service)
+    
+    if not guard.breaker.allow_request():
+        raise HTTPException(status_code=503, detail=f"Service unavailable: {service} circuit open")
+    guard.retry_budget.deposit()
+    
+    # Hedging only makes sense when there is another replica to send the copy to
+    hedge_route = None
+    if method == "GET" and len(downstream_pool.balancers[service].endpoints) > 1:
+        hedge_route = hedging.match(service, url[len(downstream_pool.services[service]) + 1:])
+    
+    attempt = 0
+    endpoint = None
+    while True:
+        request_kwargs = dict(
+            headers=headers or {},
+            params=params,
+            json=json_data if method in BODY_METHODS else None,
+            timeout=downstream_pool.timeout_for(service, guard.current_timeout())
+        )
+        # Retries go to a different replica when one is available
+        endpoint, target_url = downstream_pool.acquire_endpoint(service, url, exclude=endpoint)
+        primary = send_to_replica(service, endpoint, target_url, method, **request_kwargs)
+        hedge_delay = hedging.delay_for(hedge_route) if hedge_route else None
+        start_time = time.perf_counter()
         try:
-            request_headers = headers or {}
-            if method == "GET":
-                response = await client.get(url, headers=request_headers, params=params)
-            elif method == "POST":
-                response = await client.post(url, headers=request_headers, json=json_data)
-            elif method == "PUT":
-                response = await client.put(url, headers=request_headers, json=json_data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=request_headers)
-            
-            # Return the response with the same status code
-            return response
-        except httpx.TimeoutException:
-            raise HTTPException(status_code=504, detail="Service timeout")
-        except httpx.RequestError as e:
+            if hedge_delay is None:
+                response = await primary
+            else:
+                def start_hedge(primary_endpoint=endpoint):
+                    hedge_endpoint, hedge_url = downstream_pool.acquire_endpoint(service, url, exclude=primary_endpoint)
+                    return send_to_replica(service, hedge_endpoint, hedge_url, method, **request_kwargs)
+                response = await hedging.run(
+                    primary, start_hedge, hedge_delay,
+                    acceptable=lambda r: r.status_code not in FAILURE_STATUS_CODES
+                )
+        except (httpx.TimeoutException, httpx.RequestError) as e:
+            guard.breaker.record_failure()
+            if guard.can_retry(method, attempt):
+                attempt += 1
+                logger.warning("Retrying %s %s after error: %s", method, url, e)
+                continue
+            if isinstance(e, httpx.TimeoutException):
+                raise HTTPException(status_code=504, detail="Service timeout")
             raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+        
+        if response.status_code in FAILURE_STATUS_CODES:
+            guard.breaker.record_failure()
+            if guard.can_retry(method, attempt):
+                attempt += 1
+                logger.warning("Retrying %s %s after status %s", method, url, response.status_code)
+                continue
+        else:
+            elapsed = time.perf_counter() - start_time
+            guard.breaker.record_success()
+            guard.latency.record(elapsed)
+            if hedge_route:
+                hedging.record(hedge_route, elapsed)
+        
+        # Return the response with the same status code
+        return response
+
+def is_streaming_request(service: str, path: str, request: Request) -> bool:
+    """Decide whether a proxied call should use the streaming passthrough"""
+    pattern = STREAMING_ROUTES.get(service)
+    if pattern and pattern.search(path):
+        return True
+    # Anything that is not a JSON body (multipart uploads, binary files) is never decoded
+    if request.method in BODY_METHODS:
+        content_type = request.headers.get("content-type", "")
+        return bool(content_type) and "json" not in content_type
+    return False
+
+async def stream_proxy(request: Request, url: str, headers: dict = None, params: dict = None):
+    """
+    Forward a request and its response body in chunks without decoding them,
+    keeping status code and headers intact.
+    """
+    service = downstream_pool.service_for_url(url)
+    client = downstream_pool.client_for(service)
+    
+    forward_headers = {
+        key: value for key, value in request.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() != "authorization"
+    }
+    forward_headers.update(headers or {})
+    body = request.stream() if request.method in BODY_METHODS else None
+    
+    # Streams are never retried and keep the pool's fixed timeout (reports can be slow),
+    # but they still respect and feed the circuit breaker
+    guard = resilience.get(service)
+    if not guard.breaker.allow_request():
+        raise HTTPException(status_code=503, detail=f"Service unavailable: {service} circuit open")
+    
+    endpoint, target_url = downstream_pool.acquire_endpoint(service, url)
+    upstream_request = client.build_request(
+        request.method, target_url, headers=forward_headers, params=params, content=body
+    )
+    start_time = downstream_pool.begin_request(service)
+    try:
+        upstream_response = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException:
+        downstream_pool.end_request(service, start_time, failed=True)
+        downstream_pool.release_endpoint(service, endpoint, success=False)
+        guard.breaker.record_failure()
+        raise HTTPException(status_code=504, detail="Service timeout")
+    except httpx.RequestError as e:
+        downstream_pool.end_request(service, start_time, failed=True)
+        downstream_pool.release_endpoint(service, endpoint, success=False)
+        guard.breaker.record_failure()
+        raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
+    
+    endpoint_ok = upstream_response.status_code not in FAILURE_STATUS_CODES
+    if endpoint_ok:
+        guard.breaker.record_success()
+    else:
+        guard.breaker.record_failure()
+    
+    # Multipart writes (e.g. service types with images) still invalidate the catalog cache
+    if request.method in WRITE_METHODS and upstream_response.status_code < 400:
+        await response_cache.invalidate_for_write(service, url[len(downstream_pool.services[service]) + 1:])
+    
+    async def close_upstream():
+        await upstream_response.aclose()
+        downstream_pool.end_request(service, start_time)
+        downstream_pool.release_endpoint(service, endpoint, endpoint_ok)
+    
+    response = StreamingResponse(
+        upstream_response.aiter_raw(),
+        status_code=upstream_response.status_code,
+        background=BackgroundTask(close_upstream)
+    )
+    # Copy raw headers so repeated ones (e.g. Set-Cookie) survive
+    response.raw_headers = [
+        (key.encode("latin-1"), value.encode("latin-1"))
+        for key, value in upstream_response.headers.multi_items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    ]
+    return response
+
+def caller_role(headers: dict) -> str:
+    """Caller role from the forwarded bearer token, used to vary cached responses"""
+    auth_header = headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return "anonymous"
+    payload = decode_access_token(auth_header.split(" ", 1)[1])
+    return payload.get("role", "anonymous") if payload else "anonymous"
+
+def coalescing_key(service: str, path: str, headers: dict, params: dict) -> str:
+    """Key identical GETs on path, query and caller identity (or role where safe)"""
+    pattern = ROLE_SCOPED_GETS.get(service)
+    if pattern and pattern.match(path):
+        caller = f"role:{caller_role(headers)}"
+    else:
+        auth_header = headers.get("Authorization", "")
+        caller = "token:" + hashlib.sha256(auth_header.encode("utf-8")).hexdigest()[:32]
+    return f"GET {service}/{path}?{urlencode(sorted(params.items()))} {caller}"
+
+async def coalesced_get(service: str, path: str, url: str, headers: dict, params: dict):
+    """GET through the single-flight layer so concurrent duplicates share one call"""
+    if not COALESCE_GETS:
+        return await proxy_request(url, method="GET", headers=headers, params=params)
+    key = coalescing_key(service, path, headers, params)
+    return await get_coalescer.do(
+        key, lambda: proxy_request(url, method="GET", headers=headers, params=params)
+    )
+
+async def cached_json_response(rule, service: str, path: str, url: str, request: Request, headers: dict, params: dict):
+    """Serve a catalog GET from the gateway cache, honouring If-None-Match"""
+    query = urlencode(sorted(params.items()))
+    key = await response_cache.build_key(rule, path, query, caller_role(headers))
+    entry = await response_cache.get(key)
+    
+    if entry is None:
+        response = await coalesced_get(service, path, url, headers, params)
+        try:
+            content = response.json()
+        except:
+            content = {"error": "Invalid response", "status": response.status_code}
+            return JSONResponse(content=content, status_code=response.status_code)
+        if response.status_code != 200:
+            return JSONResponse(content=content, status_code=response.status_code)
+        entry = await response_cache.set(key, rule, response.status_code, response.text)
+    
+    cache_headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("If-None-Match"), entry["etag"]):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=cache_headers)
+    
+    return Response(
+        content=entry["body"],
+        status_code=entry["status_code"],
+        media_type="application/json",
+        headers=cache_headers
+    )
+
+async def proxy_json(service: str, path: str, url: str, request: Request, headers: dict, params: dict, invalid_content=None):
+    """Forward a JSON request and re-wrap the downstream JSON response"""
+    rule = response_cache.match(service, path) if request.method == "GET" else None
+    if rule:
+        return await cached_json_response(rule, service, path, url, request, headers, params)
+    
+    # Get body for POST/PUT/PATCH requests
+    body = None
+    if request.method in BODY_METHODS:
+        try:
+            body = await request.json()
+        except:
+            pass
+    
+    if request.method == "GET":
+        response = await coalesced_get(service, path, url, headers, params)
+    else:
+        response = await proxy_request(
+            url,
+            method=request.method,
+            headers=headers,
+            json_data=body,
+            params=params
+        )
+    
+    # Writes to catalog data make the matching cached responses stale
+    if request.method in WRITE_METHODS and response.status_code < 400:
+        await response_cache.invalidate_for_write(service, path)
+    
+    try:
+        content = response.json()
+    except:
+        if invalid_content:
+            content = invalid_content(response)
+        else:
+            content = {"error": "Invalid response", "status": response.status_code}
+    
+    passthrough = {name: response.headers[name] for name in PASSTHROUGH_HEADERS if name in response.headers}
+    return JSONResponse(content=content, status_code=response.status_code, headers=passthrough)
 
 # Customer Service Proxy Routes
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
 
 @app.api_route("/customer/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def proxy_customer_service(path: str, request: Request):
@@ -295,28 +689,10 @@ async def proxy_customer_service(path: str, request: Request):
     # Get query params
     params = dict(request.query_params)
     
-    # Get body for POST/PUT requests
-    body = None
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.json()
-        except:
-            pass
+    if is_streaming_request("customer", path, request):
+        return await stream_proxy(request, url, headers=headers, params=params)
     
-    response = await proxy_request(
-        url, 
-        method=request.method,
-        headers=headers,
-        json_data=body,
-        params=params
-    )
-    
-    try:
-        content = response.json()
-    except:
-        content = {"error": "Invalid response", "status": response.status_code}
-    
-    return JSONResponse(content=content, status_code=response.status_code)
+    return await proxy_json("customer", path, url, request, headers, params)
 
 # Service Center Proxy Routes  
 @app.api_route("/service-center/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -343,60 +719,11 @@ async def proxy_service_center(path: str, request: Request):
     if "token" in params:
         del params["token"]
     
-    # Check if this is a multipart request (FormData)
-    content_type = request.headers.get("content-type", "")
-    is_multipart = content_type.startswith("multipart/form-data")
-    
-    if is_multipart:
-        # For multipart requests, forward the raw body
-        body_bytes = await request.body()
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                headers["Content-Type"] = content_type
-                # Use data parameter for multipart form data
-                response = await client.request(
-                    method=request.method,
-                    url=url,
-                    headers=headers,
-                    content=body_bytes,
-                    params=params
-                )
-                
-                try:
-                    content = response.json()
-                except:
-                    content = {"error": "Invalid response", "status": response.status_code}
-                
-                return JSONResponse(content=content, status_code=response.status_code)
-            except httpx.TimeoutException:
-                raise HTTPException(status_code=504, detail="Service timeout")
-            except httpx.RequestError as e:
-                raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
-    else:
-        # For JSON requests, parse as JSON
-        body = None
-        if request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.json()
-            except:
-                pass
-        
-        response = await proxy_request(
-            url,
-            method=request.method,
-            headers=headers,
-            json_data=body,
-            params=params
-        )
-        
-        try:
-            content = response.json()
-        except:
-            content = {"error": "Invalid response", "status": response.status_code}
-        
-        return JSONResponse(content=content, status_code=response.status_code)
+    # Multipart uploads and report downloads are passed through unchanged
+    if is_streaming_request("service_center", path, request):
+        return await stream_proxy(request, url, headers=headers, params=params)
+    
+    return await proxy_json("service_center", path, url, request, headers, params)
 
 # Static Files Proxy Route for Service Center uploads
 @app.api_route("/uploads/{path:path}", methods=["GET"])
@@ -404,16 +731,9 @@ async def proxy_service_center_uploads(path: str, request: Request):
     """Proxy /uploads/* requests to service center service for static files"""
     url = f"{SERVICE_CENTER_URL}/uploads/{path}"
     
-    # For static files, we don't need authentication
-    response = await proxy_request(url, method="GET")
-    
-    # Return the raw response for static files
-    from fastapi.responses import Response
-    return Response(
-        content=response.content,
-        status_code=response.status_code,
-        headers=dict(response.headers)
-    )
+    # For static files, we don't need authentication; stream them instead of
+    # loading whole files into gateway memory
+    return await stream_proxy(request, url)
 
 # Chat Service Proxy Routes (including WebSocket)
 @app.api_route("/chat/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -425,27 +745,13 @@ async def proxy_chat_service(path: str, request: Request):
     headers = {"Authorization": auth_header} if auth_header else {}
     params = dict(request.query_params)
     
-    body = None
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.json()
-        except:
-            pass
+    if is_streaming_request("chat", path, request):
+        return await stream_proxy(request, url, headers=headers, params=params)
     
-    response = await proxy_request(
-        url,
-        method=request.method,
-        headers=headers,
-        json_data=body,
-        params=params
+    return await proxy_json(
+        "chat", path, url, request, headers, params,
+        invalid_content=lambda response: {"error": "Invalid response from chat service", "details": response.text}
     )
-    
-    try:
-        content = response.json()
-    except:
-        content = {"error": "Invalid response from chat service", "details": response.text}
-    
-    return JSONResponse(content=content, status_code=response.status_code)
 
 # Notification Service Proxy Routes
 @app.api_route("/notification/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -457,27 +763,10 @@ async def proxy_notification_service(path: str, request: Request):
     headers = {"Authorization": auth_header} if auth_header else {}
     params = dict(request.query_params)
     
-    body = None
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.json()
-        except:
-            pass
+    if is_streaming_request("notification", path, request):
+        return await stream_proxy(request, url, headers=headers, params=params)
     
-    response = await proxy_request(
-        url,
-        method=request.method,
-        headers=headers,
-        json_data=body,
-        params=params
-    )
-    
-    try:
-        content = response.json()
-    except:
-        content = {"error": "Invalid response", "status": response.status_code}
-    
-    return JSONResponse(content=content, status_code=response.status_code)
+    return await proxy_json("notification", path, url, request, headers, params)
 
 # Payment Service Proxy Routes
 @app.api_route("/payment/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -499,27 +788,10 @@ async def proxy_payment_service(path: str, request: Request):
     if "token" in params:
         del params["token"]
     
-    body = None
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.json()
-        except:
-            pass
-    
-    response = await proxy_request(
-        url,
-        method=request.method,
-        headers=headers,
-        json_data=body,
-        params=params
-    )
-    
-    try:
-        content = response.json()
-    except:
-        content = {"error": "Invalid response", "status": response.status_code}
+    if is_streaming_request("payment", path, request):
+        return await stream_proxy(request, url, headers=headers, params=params)
     
-    return JSONResponse(content=content, status_code=response.status_code)
+    return await proxy_json("payment", path, url, request, headers, params)
 
 # Admin Service Proxy Routes
 @app.api_route("/admin/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -531,31 +803,152 @@ async def proxy_admin_service(path: str, request: Request):
     headers = {"Authorization": auth_header} if auth_header else {}
     params = dict(request.query_params)
     
-    body = None
-    if request.method in ["POST", "PUT", "PATCH"]:
+    if is_streaming_request("admin", path, request):
+        return await stream_proxy(request, url, headers=headers, params=params)
+    
+    return await proxy_json("admin", path, url, request, headers, params)
+
+# Batch endpoint: several JSON sub-requests in one round-trip
+BATCH_MAX_ITEMS = int(os.getenv("GATEWAY_BATCH_MAX_ITEMS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("GATEWAY_BATCH_CONCURRENCY", "6"))
+BATCH_DEADLINE = float(os.getenv("GATEWAY_BATCH_DEADLINE", "10"))
+
+# Public path prefix -> (service, downstream base URL), mirroring the proxy routes above
+GATEWAY_ROUTES = {
+    "customer": ("customer", CUSTOMER_SERVICE_URL),
+    "service-center": ("service_center", SERVICE_CENTER_URL),
+    "chat": ("chat", CHAT_SERVICE_URL),
+    "notification": ("notification", NOTIFICATION_SERVICE_URL),
+    "payment": ("payment", PAYMENT_SERVICE_URL),
+    "admin": ("admin", f"{ADMIN_SERVICE_URL}/api/admin"),
+}
+
+def batch_error(item: BatchItem, status_code: int, detail: str) -> dict:
+    return {"id": item.id, "status": status_code, "body": {"detail": detail}, "headers": {}}
+
+async def run_batch_item(item: BatchItem, headers: dict, semaphore: asyncio.Semaphore) -> dict:
+    """Dispatch one batch entry through the same pooled, guarded path as the proxy routes"""
+    method = item.method.upper()
+    if method not in ("GET", "POST", "PUT", "DELETE", "PATCH"):
+        return batch_error(item, 405, f"Method {method} not allowed in batch")
+    
+    parts = urlsplit(item.path)
+    prefix, _, path = parts.path.lstrip("/").partition("/")
+    if prefix not in GATEWAY_ROUTES:
+        return batch_error(item, 404, f"No route for {parts.path}")
+    service, base_url = GATEWAY_ROUTES[prefix]
+    params = dict(parse_qsl(parts.query))
+    params.pop("token", None)
+    
+    # File downloads and reports cannot be embedded in a JSON batch response
+    pattern = STREAMING_ROUTES.get(service)
+    if pattern and pattern.search(path):
+        return batch_error(item, 400, "Streaming routes are not supported in batch")
+    
+    url = f"{base_url}/{path}"
+    async with semaphore:
         try:
-            body = await request.json()
-        except:
-            pass
+            if method == "GET":
+                response = await coalesced_get(service, path, url, headers, params)
+            else:
+                response = await proxy_request(url, method=method, headers=headers, json_data=item.body, params=params)
+        except HTTPException as e:
+            return batch_error(item, e.status_code, e.detail)
     
-    response = await proxy_request(
-        url,
-        method=request.method,
-        headers=headers,
-        json_data=body,
-        params=params
-    )
+    if method in WRITE_METHODS and response.status_code < 400:
+        await response_cache.invalidate_for_write(service, path)
     
     try:
-        content = response.json()
+        body = response.json()
     except:
-        content = {"error": "Invalid response", "status": response.status_code}
+        body = {"error": "Invalid response", "status": response.status_code}
+    result_headers = {}
+    if "etag" in response.headers:
+        result_headers["ETag"] = response.headers["etag"]
+    return {"id": item.id, "status": response.status_code, "body": body, "headers": result_headers}
+
+@app.post("/batch", response_model=BatchResponse)
+async def batch_requests(batch: BatchRequest, request: Request):
+    """
+    Run several JSON sub-requests concurrently with the caller's credentials and
+    return every result, each with its own status. Items still running when the
+    batch deadline expires are cancelled and reported as 504.
+    """
+    if not batch.requests:
+        return {"responses": []}
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch is limited to {BATCH_MAX_ITEMS} requests"
+        )
+    
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        token = request.query_params.get("token")
+        if token:
+            auth_header = f"Bearer {token}"
+    headers = {"Authorization": auth_header} if auth_header else {}
     
-    return JSONResponse(content=content, status_code=response.status_code)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(run_batch_item(item, headers, semaphore))
+        for item in batch.requests
+    ]
+    done, pending = await asyncio.wait(tasks, timeout=BATCH_DEADLINE)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning("Batch deadline hit with %d of %d requests unfinished", len(pending), len(tasks))
+    
+    responses = []
+    for item, task in zip(batch.requests, tasks):
+        if task in pending:
+            responses.append(batch_error(item, 504, "Batch deadline exceeded"))
+        elif task.exception() is not None:
+            logger.error("Batch item %s failed: %s", item.path, task.exception())
+            responses.append(batch_error(item, 500, "Internal error"))
+        else:
+            responses.append(task.result())
+    return {"responses": responses}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "api_gateway"}
+    downstream = resilience.get_stats()
+    open_circuits = [name for name, stats in downstream.items() if stats["breaker"]["state"] != "closed"]
+    return {
+        "status": "degraded" if open_circuits else "healthy",
+        "service": "api_gateway",
+        "downstream": downstream
+    }
+
+@app.get("/health/pools")
+async def downstream_pool_stats():
+    """Connection pool usage per downstream service"""
+    return downstream_pool.get_stats()
+
+@app.get("/health/cache")
+async def response_cache_stats():
+    """Gateway response cache and shared L1/L2 cache hit rates"""
+    return {**response_cache.get_stats(), "tiers": cache_service.get_stats()}
+
+@app.get("/health/auth")
+async def auth_stats():
+    """Verified-token cache and bcrypt pool usage"""
+    return {
+        "token_cache": token_cache.get_stats(),
+        "password_hasher": password_hasher.get_stats()
+    }
+
+@app.get("/health/hedging")
+async def hedging_stats():
+    """Hedged GETs sent and won, and the current per-route hedge delays"""
+    return hedging.get_stats()
+
+@app.get("/health/coalescing")
+async def coalescing_stats():
+    """How many concurrent GETs were served by a shared downstream call"""
+    return get_coalescer.get_stats()
 
 # WebSocket proxy for chat service
 @app.websocket("/chat/ws/chat/{session_id}")
@@ -588,7 +981,6 @@ async def websocket_chat_proxy(websocket: WebSocket, session_id: str):
                 except Exception as e:
                     print(f"Error forwarding to client: {e}")
             
-            import asyncio
             await asyncio.gather(
                 forward_to_chat(),
                 forward_to_client()
@@ -0,0 +1,203 @@
+"""
+Downstream Resilience
+Per-service circuit breakers, latency-derived timeouts and retry budgets so
+one slow or failing downstream service cannot tie up the whole gateway.
+"""
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger('api_gateway.resilience')
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("GATEWAY_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("GATEWAY_BREAKER_RESET_TIMEOUT", "30"))
+BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("GATEWAY_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+
+TIMEOUT_MIN = float(os.getenv("GATEWAY_TIMEOUT_MIN", "5"))
+TIMEOUT_MAX = float(os.getenv("GATEWAY_UPSTREAM_TIMEOUT", "30"))
+TIMEOUT_PERCENTILE = float(os.getenv("GATEWAY_TIMEOUT_PERCENTILE", "99"))
+TIMEOUT_MULTIPLIER = float(os.getenv("GATEWAY_TIMEOUT_MULTIPLIER", "4"))
+TIMEOUT_MIN_SAMPLES = int(os.getenv("GATEWAY_TIMEOUT_MIN_SAMPLES", "50"))
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("GATEWAY_MAX_RETRIES", "1"))
+RETRY_BUDGET_RATIO = float(os.getenv("GATEWAY_RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_TOKENS = float(os.getenv("GATEWAY_RETRY_BUDGET_MIN", "10"))
+
+# Only safe methods are retried; writes are never replayed
+RETRYABLE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Statuses that mean "the service is in trouble", as opposed to a bad request
+FAILURE_STATUS_CODES = (502, 503, 504)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self, window: int = 500):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. After failure_threshold consecutive
+    failures it opens and rejects calls; after reset_timeout it lets a
+    limited number of probe calls through (half-open) and closes again on
+    the first success.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT,
+                 half_open_max_calls: int = BREAKER_HALF_OPEN_MAX_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_since = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.half_open_since = time.monotonic()
+            self.half_open_calls = 0
+            logger.info("Circuit for %s half-open, probing", self.name)
+
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) must not wedge the breaker
+            if time.monotonic() - self.half_open_since > self.reset_timeout:
+                self.half_open_since = time.monotonic()
+                self.half_open_calls = 0
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Circuit for %s closed", self.name)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.half_open_calls = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuit for %s opened after %d failures", self.name, self.consecutive_failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.half_open_calls = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(retry_in, 1),
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a fraction of normal traffic: every
+    request deposits `ratio` tokens and every retry spends one.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_tokens: float = RETRY_BUDGET_MIN_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, 1.0)
+        self.tokens = self.max_tokens
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class ServiceResilience:
+    """Breaker, latency tracker and retry budget for one downstream service"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.retry_budget = RetryBudget()
+
+    def current_timeout(self) -> float:
+        """Read timeout derived from observed latency, clamped to [min, max]"""
+        if len(self.latency.samples) < TIMEOUT_MIN_SAMPLES:
+            return TIMEOUT_MAX
+        observed = self.latency.percentile(TIMEOUT_PERCENTILE) or TIMEOUT_MAX
+        return min(TIMEOUT_MAX, max(TIMEOUT_MIN, observed * TIMEOUT_MULTIPLIER))
+
+    def can_retry(self, method: str, attempt: int) -> bool:
+        return (
+            method in RETRYABLE_METHODS
+            and attempt < RETRY_MAX_ATTEMPTS
+            and self.breaker.state == CircuitBreaker.CLOSED
+            and self.retry_budget.try_spend()
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50 = self.latency.percentile(50)
+        p99 = self.latency.percentile(99)
+        return {
+            "breaker": self.breaker.get_stats(),
+            "timeout_seconds": round(self.current_timeout(), 2),
+            "latency_p50": round(p50, 4) if p50 is not None else None,
+            "latency_p99": round(p99, 4) if p99 is not None else None,
+            "retries": self.retry_budget.retries,
+            "retry_budget_exhausted": self.retry_budget.exhausted,
+        }
+
+
+class ResilienceRegistry:
+    """Lazily created ServiceResilience per downstream service"""
+
+    def __init__(self):
+        self.services: Dict[str, ServiceResilience] = {}
+
+    def get(self, service: str) -> ServiceResilience:
+        if service not in self.services:
+            self.services[service] = ServiceResilience(service)
+        return self.services[service]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: svc.get_stats() for name, svc in self.services.items()}
+
+
+resilience = ResilienceRegistry()
@@ -0,0 +1,221 @@
+"""
+Gateway Response Cache
+Caches read-heavy public catalog responses at the gateway with per-route TTLs,
+strong ETags and If-None-Match handling. Entries live in Redis through the
+shared CacheService, with an in-process fallback when Redis is unavailable
+or a generation bump could not be written to it.
+"""
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.cache import cache_service
+
+logger = logging.getLogger('api_gateway.response_cache')
+
+
+@dataclass
+class CacheRule:
+    """A cacheable GET route on one downstream service"""
+    service: str
+    pattern: re.Pattern
+    group: str
+    ttl: int
+
+
+@dataclass
+class InvalidationRule:
+    """A write route that makes one or more cache groups stale"""
+    service: str
+    pattern: re.Pattern
+    groups: List[str]
+
+
+CACHE_RULES = [
+    CacheRule("customer", re.compile(r"^service-types/?$"), "service_types", 300),
+    CacheRule("service_center", re.compile(r"^service-types/public/?$"), "service_types", 300),
+    CacheRule("customer", re.compile(r"^service-centers/?$"), "service_centers", 300),
+    CacheRule("customer", re.compile(r"^parts/?$"), "parts", 60),
+]
+
+INVALIDATION_RULES = [
+    InvalidationRule("service_center", re.compile(r"^service-types(/|$)"), ["service_types"]),
+    InvalidationRule("admin", re.compile(r"^services(/|$)"), ["service_types"]),
+    InvalidationRule("admin", re.compile(r"^branches(/|$)"), ["service_centers"]),
+    InvalidationRule("service_center", re.compile(r"^parts(/|$)"), ["parts"]),
+    InvalidationRule("admin", re.compile(r"^inventory(/|$)"), ["parts"]),
+]
+
+
+class _LocalStore:
+    """Small in-process LRU with per-entry expiry, used when Redis is down"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self.entries.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at and expires_at < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        expires_at = time.time() + ttl if ttl else 0
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def increment(self, key: str) -> int:
+        value = (self.get(key) or 0) + 1
+        self.set(key, value)
+        return value
+
+
+class GatewayResponseCache:
+    """
+    Per-route response cache. Keys vary on route, query string and caller
+    role; each cache group carries a generation counter so a write only has
+    to bump one number to invalidate every cached variant.
+    """
+
+    KEY_PREFIX = "gw:resp"
+    # Keys under this prefix live in the in-process store
+    LOCAL_PREFIX = "gw:resp:local"
+
+    def __init__(self, rules: List[CacheRule], invalidation_rules: List[InvalidationRule], backend=None):
+        self.rules = rules
+        self.invalidation_rules = invalidation_rules
+        self.backend = backend or cache_service
+        self.local = _LocalStore()
+        # Generation keys whose bump Redis missed; retried before the group is read again
+        self.unsynced_generations = set()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def _use_redis(self) -> bool:
+        return bool(getattr(self.backend, "enabled", False))
+
+    def match(self, service: str, path: str) -> Optional[CacheRule]:
+        """Find the cache rule for a GET on service/path"""
+        for rule in self.rules:
+            if rule.service == service and rule.pattern.match(path):
+                return rule
+        return None
+
+    async def _get(self, key: str) -> Optional[Any]:
+        if self._use_redis and not key.startswith(self.LOCAL_PREFIX):
+            return await self.backend.get(key)
+        return self.local.get(key)
+
+    async def _set(self, key: str, value: Any, ttl: int):
+        if self._use_redis and not key.startswith(self.LOCAL_PREFIX):
+            await self.backend.set(key, value, ttl)
+        else:
+            self.local.set(key, value, ttl)
+
+    async def _redis_generation_synced(self, generation_key: str) -> bool:
+        """Retry a generation bump Redis missed; False while Redis still cannot take it"""
+        if generation_key not in self.unsynced_generations:
+            return True
+        if await self.backend.increment(generation_key) is None:
+            return False
+        self.unsynced_generations.discard(generation_key)
+        logger.info("Replayed missed gateway cache invalidation %s", generation_key)
+        return True
+
+    async def build_key(self, rule: CacheRule, path: str, query: str, role: str) -> str:
+        """
+        Cache key for one variant of a cached route. While a write's generation
+        bump has not reached Redis, the group is served from the in-process
+        store, so entries cached before the write are never returned.
+        """
+        generation_key = f"{self.KEY_PREFIX}:gen:{rule.group}"
+        query_digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+        if self._use_redis and await self._redis_generation_synced(generation_key):
+            value = await self.backend.get(generation_key)
+            prefix = self.KEY_PREFIX
+        else:
+            value = self.local.get(generation_key)
+            prefix = self.LOCAL_PREFIX
+        generation = int(value) if value else 0
+        return f"{prefix}:{rule.group}:{generation}:{rule.service}:{path}:{role}:{query_digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = await self._get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    async def set(self, key: str, rule: CacheRule, status_code: int, body: str) -> Dict[str, Any]:
+        """Store a response body and return the cached entry (with its ETag)"""
+        entry = {
+            "status_code": status_code,
+            "body": body,
+            "etag": make_etag(body.encode("utf-8")),
+            "stored_at": time.time(),
+        }
+        await self._set(key, entry, rule.ttl)
+        return entry
+
+    async def invalidate_for_write(self, service: str, path: str):
+        """Bump the generation of every group a write to service/path touches"""
+        for rule in self.invalidation_rules:
+            if rule.service != service or not rule.pattern.match(path):
+                continue
+            for group in rule.groups:
+                key = f"{self.KEY_PREFIX}:gen:{group}"
+                # The local generation is always bumped, for the fallback store
+                self.local.increment(key)
+                if self._use_redis and await self.backend.increment(key) is None:
+                    self.unsynced_generations.add(key)
+                    logger.warning("Redis missed gateway cache invalidation %s; serving it locally until replayed", key)
+                logger.info("Invalidated gateway cache group %s after write to %s/%s", group, service, path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": "redis" if self._use_redis else "local",
+            "unsynced_generations": len(self.unsynced_generations),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": (self.hits / total) * 100 if total else 0.0,
+        }
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact response bytes"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+response_cache = GatewayResponseCache(CACHE_RULES, INVALIDATION_RULES)
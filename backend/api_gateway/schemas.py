@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -28,3 +28,21 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     role: str
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchItemResult(BaseModel):
+    id: Optional[str]
+    status: int
+    body: Optional[Any] = None
+    headers: Dict[str, str] = {}
+
+class BatchResponse(BaseModel):
+    responses: List[BatchItemResult]
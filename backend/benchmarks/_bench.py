@@ -0,0 +1,59 @@
+"""
+Benchmark helpers
+Tiny timing harness shared by the scripts in this directory: runs a callable
+repeatedly and prints per-call cost, so before/after variants can be compared
+side by side. Scripts are standalone: python benchmarks/<name>.py
+"""
+import os
+import sys
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Let scripts import shared.* and the service packages the same way services do
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+
+def measure(name: str, func: Callable[[], Any], iterations: int = 10000, warmup: int = 100) -> Dict[str, Any]:
+    """Time func() over `iterations` calls and print the mean cost per call"""
+    for _ in range(warmup):
+        func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - started
+    result = {"name": name, "iterations": iterations, "per_call_us": elapsed / iterations * 1e6}
+    print(f"{name:<48} {result['per_call_us']:>12.2f} us/call  ({iterations} calls)")
+    return result
+
+
+async def measure_async(name: str, func: Callable[[], Awaitable[Any]], iterations: int = 1000,
+                        warmup: int = 10) -> Dict[str, Any]:
+    """measure() for coroutine functions, awaited one after another"""
+    for _ in range(warmup):
+        await func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    elapsed = time.perf_counter() - started
+    result = {"name": name, "iterations": iterations, "per_call_us": elapsed / iterations * 1e6}
+    print(f"{name:<48} {result['per_call_us']:>12.2f} us/call  ({iterations} calls)")
+    return result
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def speedup(before: Dict[str, Any], after: Dict[str, Any]):
+    print(f"  -> {before['per_call_us'] / after['per_call_us']:.1f}x faster per call\n")
+
+
+def run(coro):
+    return asyncio.run(coro)
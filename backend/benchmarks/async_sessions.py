@@ -0,0 +1,80 @@
+"""
+Async Session Throughput Benchmark
+Throughput and fast-request latency when slow and fast queries arrive at the
+same time, run the way an async route executes them: a sync Session called
+from the coroutine (the old pattern) versus an AsyncSession from
+shared.database.get_async_engine(). Slow requests run pg_sleep; fast ones
+SELECT 1. With the sync session each slow query freezes the event loop, so
+the fast requests queue behind it.
+
+Needs PostgreSQL (DATABASE_URL) and asyncpg.
+
+Usage: python benchmarks/async_sessions.py [slow] [fast] [slow_seconds]
+"""
+import sys
+import time
+import asyncio
+
+import _bench
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from shared import database
+
+
+async def mixed_load(slow_request, fast_request, slow: int, fast: int):
+    latencies = []
+
+    async def timed_fast():
+        started = time.perf_counter()
+        await fast_request()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(slow_request() for _ in range(slow)), *(timed_fast() for _ in range(fast)))
+    return time.perf_counter() - started, latencies
+
+
+async def main(slow: int, fast: int, slow_seconds: float):
+    if database.get_async_engine() is None:
+        print("Async engine unavailable (install asyncpg and use a PostgreSQL DATABASE_URL)")
+        return
+    sleep = text("SELECT pg_sleep(:seconds)")
+    ping = text("SELECT 1")
+
+    async def sync_slow():
+        with Session(database.engine) as db:
+            db.execute(sleep, {"seconds": slow_seconds})
+
+    async def sync_fast():
+        with Session(database.engine) as db:
+            db.execute(ping)
+
+    async def async_slow():
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(sleep, {"seconds": slow_seconds})
+
+    async def async_fast():
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(ping)
+
+    print(f"{slow} slow ({slow_seconds}s) + {fast} fast requests at once")
+    for name, slow_request, fast_request in (
+        ("sync Session in async route (before)", sync_slow, sync_fast),
+        ("AsyncSession (after)", async_slow, async_fast),
+    ):
+        elapsed, latencies = await mixed_load(slow_request, fast_request, slow, fast)
+        print(
+            f"{name:<38} {(slow + fast) / elapsed:8.1f} req/s  total {elapsed:6.2f}s  "
+            f"fast p50={_bench.percentile(latencies, 50):8.1f}ms p99={_bench.percentile(latencies, 99):8.1f}ms"
+        )
+
+    await database.async_engine.dispose()
+    database.engine.dispose()
+
+
+if __name__ == "__main__":
+    slow = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    fast = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    slow_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    _bench.run(main(slow, fast, slow_seconds))
@@ -0,0 +1,49 @@
+"""
+Auth Cost Microbenchmark
+Per-request cost of authenticating a bearer token before and after the
+verified-claims cache: a full jose decode + HMAC verification on every call
+versus shared.auth.decode_access_token with the token already cached, plus
+get_current_user as FastAPI invokes it.
+
+Usage: python benchmarks/auth_cost.py [iterations]
+"""
+import sys
+import asyncio
+
+import _bench
+from jose import jwt
+
+from shared.auth import (
+    SECRET_KEY, ALGORITHM, create_access_token, decode_access_token, get_current_user, token_cache
+)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = create_access_token({"sub": "bench@example.com", "user_id": "bench-user", "role": "customer"})
+
+    print("Token verification per request")
+    before = _bench.measure("uncached jwt.decode (before)", lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), iterations)
+    token_cache.clear()
+    decode_access_token(token)
+    after = _bench.measure("decode_access_token, cached (after)", lambda: decode_access_token(token), iterations)
+    _bench.speedup(before, after)
+
+    print("get_current_user dependency")
+    loop = asyncio.new_event_loop()
+    try:
+        token_cache.clear()
+        max_size = token_cache.max_size
+        token_cache.max_size = 0  # put() stores nothing, so every call decodes
+        uncached = _bench.measure("get_current_user, cache disabled", lambda: loop.run_until_complete(get_current_user(token)), iterations // 4)
+        token_cache.max_size = max_size
+        decode_access_token(token)
+        cached = _bench.measure("get_current_user, cache warm", lambda: loop.run_until_complete(get_current_user(token)), iterations // 4)
+        _bench.speedup(uncached, cached)
+    finally:
+        loop.close()
+    print(f"token cache stats: {token_cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cache Codec Benchmark
+Encode/decode time and bytes stored for typical cached values (an
+appointment list and an analytics result) with the old
+json.dumps(default=str) serializer versus shared.cache_codec.CacheCodec in
+each codec/compression combination installed here. Combinations whose
+library is missing are reported as such instead of silently falling back.
+
+Usage: python benchmarks/cache_codec.py [iterations]
+"""
+import sys
+import json
+import uuid
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+
+import _bench
+
+from shared.cache_codec import (
+    CacheCodec, CODEC_MSGPACK, COMPRESSION_NONE, COMPRESSION_ZSTD, COMPRESSION_LZ4
+)
+
+
+def appointment_list(count: int = 200):
+    start = datetime(2024, 1, 1, 9, 0)
+    return [
+        {
+            "id": uuid.uuid4(),
+            "customer_id": uuid.uuid4(),
+            "vehicle_id": uuid.uuid4(),
+            "technician_id": uuid.uuid4(),
+            "appointment_date": start + timedelta(hours=i),
+            "status": "scheduled" if i % 3 else "completed",
+            "estimated_cost": Decimal("149.95") + i,
+            "notes": "Customer reports a noise from the front left wheel at low speed",
+        }
+        for i in range(count)
+    ]
+
+
+def analytics_result(days: int = 90):
+    today = date(2024, 3, 31)
+    return {
+        "generated_at": datetime(2024, 3, 31, 23, 59),
+        "revenue_total": Decimal("125430.50"),
+        "daily": [
+            {"date": today - timedelta(days=i), "revenue": Decimal("1393.67"), "appointments": 14 + i % 5}
+            for i in range(days)
+        ],
+    }
+
+
+def legacy_encode(value):
+    return json.dumps(value, default=str).encode("utf-8")
+
+
+def legacy_decode(data):
+    return json.loads(data)
+
+
+def variants():
+    yield "json default=str (before)", legacy_encode, legacy_decode
+    for codec in ("json", "msgpack"):
+        for compression in ("none", "zstd", "lz4"):
+            name = f"CacheCodec {codec}+{compression}"
+            instance = CacheCodec(codec=codec, compression=compression, threshold=1024)
+            wanted_codec = CODEC_MSGPACK if codec == "msgpack" else instance.codec_id
+            wanted_compression = {"zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4}.get(compression, COMPRESSION_NONE)
+            if instance.codec_id != wanted_codec or instance.compression_id != wanted_compression:
+                print(f"{name:<48} skipped: library not installed")
+                continue
+            yield name, instance.encode, instance.decode
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    for label, value in (("appointment list (200 rows)", appointment_list()), ("analytics result (90 days)", analytics_result())):
+        print(f"\n{label}")
+        for name, encode, decode in variants():
+            payload = encode(value)
+            _bench.measure(f"{name} encode", lambda: encode(value), iterations, warmup=10)
+            _bench.measure(f"{name} decode", lambda: decode(payload), iterations, warmup=10)
+            print(f"{'':<48} {len(payload):>12} bytes stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cache Event-Loop Blocking Benchmark
+How long the event loop is blocked while many coroutines hit Redis at once,
+using the blocking client (get_sync/set_sync, what the async methods used to
+call internally) versus the redis.asyncio pool behind CacheService.get/set.
+A probe measures how late a 10ms timer fires; with the blocking client every
+round-trip stalls it.
+
+Needs a reachable Redis (REDIS_URL, default redis://localhost:6379).
+
+Usage: python benchmarks/cache_event_loop.py [requests] [concurrency]
+"""
+import sys
+import time
+import asyncio
+
+import _bench
+
+from shared.cache import cache_service
+
+PROBE_INTERVAL = 0.01
+KEY_PREFIX = "bench:loop:"
+
+
+async def probe_lag(stop: asyncio.Event, samples: list):
+    """Record how much later than scheduled each timer tick runs"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def traffic(call, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await call(f"{KEY_PREFIX}{i % 100}")
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+async def main(requests: int, concurrency: int):
+    if not cache_service.enabled:
+        print("Redis is not reachable; set REDIS_URL")
+        return
+    payload = {"id": "bench", "items": list(range(50))}
+    for i in range(100):
+        await cache_service.set(f"{KEY_PREFIX}{i}", payload, ttl=300)
+
+    async def blocking_call(key):
+        cache_service.get_sync(key)
+        cache_service.set_sync(key, payload, ttl=300)
+
+    async def async_call(key):
+        await cache_service.get(key)
+        await cache_service.set(key, payload, ttl=300)
+
+    print(f"{requests} get+set pairs, concurrency {concurrency}")
+    for name, call in (("blocking client (before)", blocking_call), ("redis.asyncio pool (after)", async_call)):
+        samples, stop = [], asyncio.Event()
+        probe = asyncio.create_task(probe_lag(stop, samples))
+        started = time.perf_counter()
+        await traffic(call, requests, concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+        print(
+            f"{name:<28} {requests / elapsed:9.0f} pairs/s  "
+            f"loop lag p50={_bench.percentile(samples, 50):7.2f}ms p99={_bench.percentile(samples, 99):7.2f}ms "
+            f"max={max(samples, default=0):7.2f}ms"
+        )
+
+    for i in range(100):
+        await cache_service.delete(f"{KEY_PREFIX}{i}")
+    await cache_service.close()
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    _bench.run(main(requests, concurrency))
@@ -0,0 +1,140 @@
+"""
+Login Storm Load Test
+Drives a running gateway's real /auth/login with a burst of concurrent
+logins while timing GET /health, and reports /health p50/p99 idle versus
+during the storm, plus how many logins were shed with 503. Without
+--email/--password a throwaway customer is registered first.
+
+--in-process skips the gateway and isolates the bcrypt part: event-loop lag
+(how late a 10ms timer fires) while the same storm runs bcrypt inline in
+the coroutine versus on shared.auth's bounded bcrypt pool.
+
+Usage:
+  python benchmarks/login_storm.py [--url http://localhost:8000] [--logins 200] [--concurrency 50]
+  python benchmarks/login_storm.py --in-process
+"""
+import time
+import uuid
+import asyncio
+import argparse
+
+import _bench
+from fastapi import HTTPException
+
+PROBE_INTERVAL = 0.01
+IDLE_SECONDS = 3
+
+
+async def probe_lag(stop: asyncio.Event, samples: list):
+    """Record how much later than scheduled each timer tick runs"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def storm(login, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    outcome = {"ok": 0, "rejected": 0}
+
+    async def one():
+        async with semaphore:
+            try:
+                await login()
+                outcome["ok"] += 1
+            except HTTPException:
+                outcome["rejected"] += 1
+
+    await asyncio.gather(*(one() for _ in range(logins)))
+    return outcome
+
+
+async def run_http(url: str, email: str, password: str, logins: int, concurrency: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        if not email:
+            email, password = f"login-storm-{uuid.uuid4().hex[:12]}@example.com", uuid.uuid4().hex
+            response = await client.post(
+                "/auth/register", json={"email": email, "password": password, "full_name": "Login Storm"}
+            )
+            response.raise_for_status()
+
+        async def health_latencies(stop: asyncio.Event, samples: list):
+            while not stop.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                samples.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(PROBE_INTERVAL)
+
+        async def login():
+            response = await client.post("/auth/login", data={"username": email, "password": password})
+            if response.status_code == 503:
+                raise HTTPException(status_code=503)
+            response.raise_for_status()
+
+        idle, stop = [], asyncio.Event()
+        probe = asyncio.create_task(health_latencies(stop, idle))
+        await asyncio.sleep(IDLE_SECONDS)
+        stop.set()
+        await probe
+
+        during, stop = [], asyncio.Event()
+        probe = asyncio.create_task(health_latencies(stop, during))
+        started = time.perf_counter()
+        outcome = await storm(login, logins, concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    print(f"{logins} logins to {url}/auth/login, concurrency {concurrency}, storm {elapsed:.2f}s")
+    for name, samples in (("idle", idle), ("login storm", during)):
+        print(f"/health {name:<12} p50={_bench.percentile(samples, 50):8.2f}ms p99={_bench.percentile(samples, 99):8.2f}ms  n={len(samples)}")
+    print(f"logins ok={outcome['ok']} rejected (503)={outcome['rejected']}")
+
+
+async def run_in_process(logins: int, concurrency: int):
+    from shared.auth import get_password_hash, verify_password, verify_password_async, password_hasher
+
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+
+    async def inline_login():
+        verify_password(password, hashed)
+
+    async def pooled_login():
+        await verify_password_async(password, hashed)
+
+    print(f"{logins} logins, concurrency {concurrency}, bcrypt pool {password_hasher.get_stats()}")
+    for name, login in (("inline bcrypt (before)", inline_login), ("bcrypt pool (after)", pooled_login)):
+        samples, stop = [], asyncio.Event()
+        probe = asyncio.create_task(probe_lag(stop, samples))
+        started = time.perf_counter()
+        outcome = await storm(login, logins, concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+        print(
+            f"{name:<24} storm {elapsed:6.2f}s  ok={outcome['ok']} rejected={outcome['rejected']}  "
+            f"loop lag p50={_bench.percentile(samples, 50):8.2f}ms p99={_bench.percentile(samples, 99):8.2f}ms "
+            f"max={max(samples, default=0):8.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--in-process", action="store_true")
+    args = parser.parse_args()
+    if args.in_process:
+        _bench.run(run_in_process(args.logins, args.concurrency))
+    else:
+        _bench.run(run_http(args.url, args.email, args.password, args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Statement Cache Microbenchmark
+Per-call cost of the hottest point lookup (Customer by user_id) on a real
+Session before and after shared.statement_cache:
+db.query(Customer).filter(...).first() versus customer_by_user(db, ...).
+Both run end-to-end against DATABASE_URL, so the figure includes the
+database round-trip and is the saving a request actually sees.
+
+A breakdown without the database follows: building and cache-keying a fresh
+Query/select per call, which the prebuilt statement skips, and a full
+compile for reference (paid on every compiled-cache miss). --no-db prints
+only the breakdown.
+
+Usage: python benchmarks/statement_cache.py [iterations] [--no-db]
+"""
+import sys
+import uuid
+
+import _bench
+from sqlalchemy import select
+from sqlalchemy.orm import Query
+from sqlalchemy.dialects import postgresql
+
+from shared.models import Customer
+from shared.statement_cache import statement_cache, customer_by_user
+
+
+def rebuilt_query(user_id):
+    """What each request did before: a fresh Query, converted to a statement and cache-keyed"""
+    statement = Query(Customer).filter(Customer.user_id == user_id).limit(1).statement
+    return statement._generate_cache_key()
+
+
+def rebuilt_select(user_id):
+    statement = select(Customer).where(Customer.user_id == user_id).limit(1)
+    return statement._generate_cache_key()
+
+
+def session_lookups(iterations: int, user_id):
+    from shared.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print("Customer by user_id on a Session (includes the database round-trip)")
+        before = _bench.measure(
+            "db.query(Customer).filter(...).first() (before)",
+            lambda: db.query(Customer).filter(Customer.user_id == user_id).first(), iterations
+        )
+        after = _bench.measure("customer_by_user(db, user_id) (after)", lambda: customer_by_user(db, user_id), iterations)
+        _bench.speedup(before, after)
+    finally:
+        db.close()
+        SessionLocal.remove()
+
+
+def python_breakdown(iterations: int, user_id):
+    statement = statement_cache.lookups["customer_by_user"].statement
+    print("Breakdown without the database: per-call statement construction the prebuilt lookup skips")
+    _bench.measure("Query(...).filter(...) + cache key", lambda: rebuilt_query(user_id), iterations)
+    _bench.measure("select(...).where(...) + cache key", lambda: rebuilt_select(user_id), iterations)
+    _bench.measure("full compile to PostgreSQL SQL", lambda: statement.compile(dialect=postgresql.dialect()), iterations // 10)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    iterations = int(args[0]) if args else 2000
+    user_id = uuid.uuid4()
+    if "--no-db" not in sys.argv:
+        session_lookups(iterations, user_id)
+    python_breakdown(iterations * 10, user_id)
+
+
+if __name__ == "__main__":
+    main()
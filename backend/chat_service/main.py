@@ -2,16 +2,17 @@
 Chat Service - FastAPI Microservice
 Provides real-time chat with AI assistant, chat history, and WebSocket support
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
 from typing import List, Optional, Dict
 from datetime import datetime
 import json
 import logging
 
-from database import engine, Base, get_db
-from models import ChatSession, ChatMessage, ChatParticipant
+from database import engine, Base, get_db, encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from models import ChatSession, ChatMessage, ChatParticipant, get_participant
 from schemas import (
     ChatSessionCreate, ChatSessionResponse, 
     ChatMessageCreate, ChatMessageResponse,
@@ -255,10 +256,7 @@ def get_session(
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Verify user is participant
-    participant = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    participant = get_participant(db, session_id, current_user['user_id'])
     
     if not participant:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -269,25 +267,41 @@ def get_session(
 @app.get("/sessions/{session_id}/messages", response_model=List[ChatMessageResponse])
 def get_session_messages(
     session_id: str,
+    response: Response,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get messages from a chat session"""
+    """
+    Get messages from a chat session, newest first. Pass the X-Next-Cursor
+    response header back as `cursor` for older messages; `offset` still works
+    for existing clients.
+    """
     # Verify user is participant
-    participant = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    participant = get_participant(db, session_id, current_user['user_id'])
     
     if not participant:
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Get messages
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.created_at.desc()).offset(offset).limit(limit).all()
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    
+    if offset:
+        return query.order_by(ChatMessage.created_at.desc()).offset(offset).limit(limit).all()
+    
+    if cursor:
+        try:
+            created_at, message_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, message_id))
+    
+    messages = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(messages[-1].created_at, messages[-1].id)
     
     return messages
 
@@ -304,10 +318,7 @@ async def send_message(
     Prefer WebSocket for real-time messaging
     """
     # Verify user is participant
-    participant = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    participant = get_participant(db, session_id, current_user['user_id'])
     
     if not participant:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -359,19 +370,13 @@ def add_participant(
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Check if requester is creator or admin
-    requester = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    requester = get_participant(db, session_id, current_user['user_id'])
     
     if not requester or (requester.role != 'creator' and current_user['role'] != 'admin'):
         raise HTTPException(status_code=403, detail="Permission denied")
     
     # Check if user is already participant
-    existing = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == user_id
-    ).first()
+    existing = get_participant(db, session_id, user_id)
     
     if existing:
         return {"message": "User is already a participant"}
@@ -442,10 +447,7 @@ def get_session_participants(
 ):
     """Get all participants in a chat session"""
     # Verify user is participant
-    participant = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    participant = get_participant(db, session_id, current_user['user_id'])
     
     if not participant:
         raise HTTPException(status_code=403, detail="Access denied")
@@ -470,10 +472,7 @@ def close_session(
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Verify user permissions: allow if admin or staff (support), otherwise require creator
-    participant = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    participant = get_participant(db, session_id, current_user['user_id'])
 
     # Admins and staff/support can close sessions even if they are not participants
     logger.info(f"close_session requested by user: {current_user}")
@@ -533,10 +532,7 @@ def join_session_as_staff(
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Check if staff is already a participant
-    existing = db.query(ChatParticipant).filter(
-        ChatParticipant.session_id == session_id,
-        ChatParticipant.user_id == current_user['user_id']
-    ).first()
+    existing = get_participant(db, session_id, current_user['user_id'])
     
     if existing:
         return {"message": "Already joined this session", "participant_id": str(existing.id)}
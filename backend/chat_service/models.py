@@ -8,7 +8,7 @@ import uuid
 import enum
 
 from database import Base
-from sqlalchemy import event
+from sqlalchemy import event, select, bindparam
 
 
 class SessionType(str, enum.Enum):
@@ -117,3 +117,17 @@ class ChatParticipant(Base):
     
     # Relationships
     session = relationship("ChatSession", back_populates="participants")
+
+
+# Participant check run on nearly every chat request. Built once so SQLAlchemy
+# reuses its cache key and compiled SQL (the chat service does not ship
+# shared/statement_cache.py).
+participant_lookup = select(ChatParticipant).where(
+    ChatParticipant.session_id == bindparam("session_id"),
+    ChatParticipant.user_id == bindparam("user_id")
+).limit(1)
+
+
+def get_participant(db, session_id, user_id):
+    """The ChatParticipant row for (session, user), or None"""
+    return db.execute(participant_lookup, {"session_id": session_id, "user_id": user_id}).scalars().first()
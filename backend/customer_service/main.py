@@ -1,6 +1,9 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 import sys
@@ -10,12 +13,17 @@ from uuid import UUID
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.database import get_db, engine
+from shared.database import get_db, get_db_context, get_async_db, engine, db_manager, query_optimizer, workload_pools
 from shared.models import (
     Base, Vehicle, Appointment, ServiceType, ServiceCenter, 
     Customer, User, Notification, ServiceRecord, Invoice, Part, Technician
 )
-from shared.auth import get_current_user, require_role, verify_password, get_password_hash
+from shared.auth import get_current_user, require_role, verify_password, get_password_hash, invalidate_user_profile_async
+from shared.query_stats import QueryStatsMiddleware, query_metrics
+from shared.slow_queries import slow_query_log
+from shared.cache import cache_service, CacheTags, CacheKeys
+from shared.cache_warming import cache_warmer, model_to_dict
+from shared.statement_cache import customer_by_user, customer_by_user_async, service_type_by_id, statement_cache
 from schemas import (
     VehicleCreate, VehicleResponse, VehicleUpdate,
     AppointmentCreate, AppointmentResponse,
@@ -35,6 +43,34 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "600"))
+
+# Reference data warmed at startup; the same keys are shared with service_center
+@cache_warmer.loader("service_types", CacheKeys.SERVICE_TYPES, REFERENCE_CACHE_TTL, [CacheTags.SERVICE_TYPES])
+def load_service_types():
+    with get_db_context("background") as db:
+        return [model_to_dict(st) for st in db.query(ServiceType).filter(ServiceType.is_active == True).all()]
+
+@cache_warmer.loader("service_centers", CacheKeys.SERVICE_CENTERS, REFERENCE_CACHE_TTL, [CacheTags.SERVICE_CENTERS])
+def load_service_centers():
+    with get_db_context("background") as db:
+        return [model_to_dict(c) for c in db.query(ServiceCenter).filter(ServiceCenter.is_active == True).all()]
+
+@cache_warmer.loader("parts", CacheKeys.PARTS_INVENTORY, REFERENCE_CACHE_TTL, [CacheTags.PARTS])
+def load_parts():
+    with get_db_context("background") as db:
+        return [model_to_dict(p) for p in db.query(Part).filter(Part.is_active == True).order_by(Part.name).all()]
+
+@app.on_event("startup")
+async def startup_event():
+    await cache_warmer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await cache_warmer.stop()
+    await db_manager.close_async()
 
 # Vehicle Management
 @app.post("/vehicles", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
@@ -44,7 +80,7 @@ async def create_vehicle(
     db: Session = Depends(get_db)
 ):
     # Get customer ID
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     if not customer:
         raise HTTPException(status_code=404, detail="Customer profile not found")
     
@@ -60,34 +96,34 @@ async def create_vehicle(
     db.add(db_vehicle)
     db.commit()
     db.refresh(db_vehicle)
+    await cache_service.invalidate_tags(CacheTags.for_vehicle(db_vehicle))
     
     return db_vehicle
 
 @app.get("/vehicles", response_model=List[VehicleResponse])
 async def get_my_vehicles(
     current_user: dict = Depends(require_role(["customer", "admin"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
-    if not customer:
-        return []
-    
-    vehicles = db.query(Vehicle).filter(Vehicle.customer_id == customer.id).all()
-    return vehicles
+    result = await db.execute(
+        select(Vehicle).join(Customer, Vehicle.customer_id == Customer.id)
+        .where(Customer.user_id == current_user["user_id"])
+    )
+    return result.scalars().all()
 
 @app.get("/vehicles/{vehicle_id}", response_model=VehicleResponse)
 async def get_vehicle(
     vehicle_id: UUID,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+    vehicle = await db.get(Vehicle, vehicle_id)
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
     # Check ownership for customers
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = await customer_by_user_async(db, current_user["user_id"])
         if vehicle.customer_id != customer.id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
@@ -106,7 +142,7 @@ async def update_vehicle(
     
     # Check ownership
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = customer_by_user(db, current_user["user_id"])
         if vehicle.customer_id != customer.id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
@@ -115,6 +151,7 @@ async def update_vehicle(
     
     db.commit()
     db.refresh(vehicle)
+    await cache_service.invalidate_tags(CacheTags.for_vehicle(vehicle))
     return vehicle
 
 @app.delete("/vehicles/{vehicle_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -128,24 +165,24 @@ async def delete_vehicle(
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = customer_by_user(db, current_user["user_id"])
         if vehicle.customer_id != customer.id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
+    tags = CacheTags.for_vehicle(vehicle)
     db.delete(vehicle)
     db.commit()
+    await cache_service.invalidate_tags(tags)
     return None
 
 # Appointment Management
 @app.get("/service-types", response_model=List[ServiceTypeResponse])
-async def get_service_types(db: Session = Depends(get_db)):
-    service_types = db.query(ServiceType).filter(ServiceType.is_active == True).all()
-    return service_types
+async def get_service_types():
+    return await cache_warmer.get("service_types")
 
 @app.get("/service-centers", response_model=List[ServiceCenterResponse])
-async def get_service_centers(db: Session = Depends(get_db)):
-    centers = db.query(ServiceCenter).filter(ServiceCenter.is_active == True).all()
-    return centers
+async def get_service_centers():
+    return await cache_warmer.get("service_centers")
 
 @app.get("/parts", response_model=List[PartResponse])
 async def get_parts(
@@ -153,6 +190,12 @@ async def get_parts(
     search: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    if not search:
+        parts = await cache_warmer.get("parts")
+        if category:
+            parts = [part for part in parts if part["category"] == category]
+        return parts
+    
     query = db.query(Part).filter(Part.is_active == True)
     
     if category:
@@ -173,7 +216,7 @@ async def create_appointment(
     current_user: dict = Depends(require_role(["customer"])),
     db: Session = Depends(get_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     if not customer:
         raise HTTPException(status_code=404, detail="Customer profile not found")
     
@@ -210,7 +253,7 @@ async def create_appointment(
     
     # Add service cost if applicable
     if appointment.service_type_id:
-        service_type = db.query(ServiceType).filter(ServiceType.id == appointment.service_type_id).first()
+        service_type = service_type_by_id(db, appointment.service_type_id)
         if service_type:
             estimated_cost += service_type.base_price
     
@@ -227,29 +270,44 @@ async def create_appointment(
     db.add(db_appointment)
     db.commit()
     db.refresh(db_appointment)
+    await cache_service.invalidate_tags(CacheTags.for_appointment(db_appointment))
     
     return db_appointment
 
 @app.get("/appointments", response_model=List[AppointmentResponse])
 async def get_my_appointments(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
     current_user: dict = Depends(require_role(["customer"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
-    if not customer:
-        return []
-    
-    appointments = db.query(Appointment)\
+    """Newest first. Without cursor/limit the full history is returned as before."""
+    # Relationships must be eager-loaded: lazy loads are not possible on an AsyncSession
+    stmt = (
+        select(Appointment)
+        .join(Customer, Appointment.customer_id == Customer.id)
         .options(
             joinedload(Appointment.vehicle),
             joinedload(Appointment.service_center),
             joinedload(Appointment.service_type)
-        )\
-        .filter(Appointment.customer_id == customer.id)\
-        .order_by(Appointment.appointment_date.desc())\
-        .all()
+        )
+        .where(Customer.user_id == current_user["user_id"])
+    )
+    if cursor is None and limit is None:
+        result = await db.execute(stmt.order_by(Appointment.appointment_date.desc()))
+        return result.scalars().all()
     
-    return appointments
+    try:
+        stmt = query_optimizer.add_keyset_pagination(
+            stmt, Appointment.appointment_date, Appointment.id, cursor, limit or 20
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    result = await db.execute(stmt)
+    page = query_optimizer.keyset_page(result.scalars().all(), Appointment.appointment_date, Appointment.id, limit or 20)
+    page.set_headers(response)
+    return page.items
 
 @app.get("/appointments/{appointment_id}", response_model=AppointmentResponse)
 async def get_appointment(
@@ -257,7 +315,7 @@ async def get_appointment(
     current_user: dict = Depends(require_role(["customer"])),
     db: Session = Depends(get_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     
     appointment = db.query(Appointment)\
         .options(
@@ -281,7 +339,7 @@ async def cancel_appointment(
     current_user: dict = Depends(require_role(["customer"])),
     db: Session = Depends(get_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     
     appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if not appointment:
@@ -294,7 +352,9 @@ async def cancel_appointment(
         raise HTTPException(status_code=400, detail="Cannot cancel this appointment")
     
     appointment.status = "cancelled"
+    tags = CacheTags.for_appointment(appointment)
     db.commit()
+    await cache_service.invalidate_tags(tags)
     return None
 
 # Maintenance Reminders
@@ -303,7 +363,7 @@ async def get_maintenance_reminders(
     current_user: dict = Depends(require_role(["customer"])),
     db: Session = Depends(get_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     if not customer:
         return []
     
@@ -332,7 +392,7 @@ async def get_service_history(
     current_user: dict = Depends(require_role(["customer"])),
     db: Session = Depends(get_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     if not customer:
         return []
     
@@ -376,7 +436,7 @@ async def get_profile(
     db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(User.id == current_user["user_id"]).first()
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     
     if not user or not customer:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -398,7 +458,7 @@ async def update_profile(
     db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(User.id == current_user["user_id"]).first()
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     
     if not user or not customer:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -418,6 +478,8 @@ async def update_profile(
     db.commit()
     db.refresh(user)
     db.refresh(customer)
+    await invalidate_user_profile_async(user.id)
+    await cache_service.invalidate_tags([CacheTags.CUSTOMER.format(id=customer.id)])
     
     return {
         "user_id": str(user.id),
@@ -467,7 +529,7 @@ async def upload_avatar(
     current_user: dict = Depends(require_role(["customer"])),
     db: Session = Depends(get_db)
 ):
-    customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+    customer = customer_by_user(db, current_user["user_id"])
     if not customer:
         raise HTTPException(status_code=404, detail="Profile not found")
     
@@ -483,12 +545,37 @@ async def upload_avatar(
     
     customer.avatar_url = f"/IMG/avatars/{filename}"
     db.commit()
+    await cache_service.invalidate_tags([CacheTags.CUSTOMER.format(id=customer.id)])
     
     return {"avatar_url": customer.avatar_url}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "customer_service"}
+    if not cache_warmer.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "service": "customer_service", "cache_warming": cache_warmer.get_stats()}
+        )
+    return {"status": "healthy", "service": "customer_service", "cache_warming": cache_warmer.get_stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """Per-endpoint query counts, DB time and workload-class pool usage in Prometheus text format"""
+    return PlainTextResponse(query_metrics.render_prometheus() + workload_pools.render_prometheus())
+
+@app.get("/metrics/queries")
+async def query_metrics_detail(current_user: dict = Depends(require_role(["admin"]))):
+    """Per-endpoint query stats, the most repeated (N+1) statement shapes and point-lookup counters"""
+    return {**query_metrics.get_stats(), "point_lookups": statement_cache.get_stats()}
+
+@app.get("/metrics/slow-queries")
+async def slow_queries(
+    limit: int = 20,
+    order_by: str = "total",
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Slowest statement shapes seen by this instance (order_by: total, max, avg, count)"""
+    return slow_query_log.get_stats(limit, order_by)
 
 if __name__ == "__main__":
     import uvicorn
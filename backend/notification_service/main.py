@@ -1,7 +1,10 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from typing import List, Optional
 import sys
 import os
 from uuid import UUID
@@ -12,12 +15,15 @@ from email.mime.multipart import MIMEMultipart
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.database import get_db, engine
+from shared.database import get_db, get_async_db, ensure_indexes, engine, db_manager, query_optimizer, workload_pools
 from shared.models import Base, Notification, User
 from shared.auth import get_current_user, require_role, api_gateway_client
+from shared.query_stats import QueryStatsMiddleware, query_metrics
+from shared.slow_queries import slow_query_log
 from schemas import NotificationCreate, NotificationResponse
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes()
 
 app = FastAPI(title="Notification Service", version="1.0.0")
 
@@ -28,20 +34,35 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await db_manager.close_async()
 
 @app.get("/notifications", response_model=List[NotificationResponse])
 async def get_my_notifications(
+    response: Response,
     unread_only: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Notification).filter(Notification.user_id == current_user["user_id"])
+    """Newest first; pass X-Next-Cursor back as `cursor` for the next page"""
+    query = select(Notification).where(Notification.user_id == current_user["user_id"])
     
     if unread_only:
-        query = query.filter(Notification.is_read == False)
+        query = query.where(Notification.is_read == False)
     
-    notifications = query.order_by(Notification.created_at.desc()).limit(50).all()
-    return notifications
+    try:
+        query = query_optimizer.add_keyset_pagination(query, Notification.created_at, Notification.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    result = await db.execute(query)
+    page = query_optimizer.keyset_page(result.scalars().all(), Notification.created_at, Notification.id, limit)
+    page.set_headers(response)
+    return page.items
 
 @app.post("/notifications", response_model=NotificationResponse, status_code=status.HTTP_201_CREATED)
 async def create_notification(
@@ -92,12 +113,14 @@ async def mark_all_as_read(
 @app.get("/notifications/unread-count")
 async def get_unread_count(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    count = db.query(Notification).filter(
-        Notification.user_id == current_user["user_id"],
-        Notification.is_read == False
-    ).count()
+    count = await db.scalar(
+        select(func.count()).select_from(Notification).where(
+            Notification.user_id == current_user["user_id"],
+            Notification.is_read == False
+        )
+    )
     
     return {"unread_count": count}
 
@@ -239,6 +262,25 @@ async def get_upcoming_payment_reminders(
 async def health_check():
     return {"status": "healthy", "service": "notification_service"}
 
+@app.get("/metrics")
+async def metrics():
+    """Per-endpoint query counts, DB time and workload-class pool usage in Prometheus text format"""
+    return PlainTextResponse(query_metrics.render_prometheus() + workload_pools.render_prometheus())
+
+@app.get("/metrics/queries")
+async def query_metrics_detail(current_user: dict = Depends(require_role(["admin"]))):
+    """Per-endpoint query stats and the most repeated (N+1) statement shapes"""
+    return query_metrics.get_stats()
+
+@app.get("/metrics/slow-queries")
+async def slow_queries(
+    limit: int = 20,
+    order_by: str = "total",
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Slowest statement shapes seen by this instance (order_by: total, max, avg, count)"""
+    return slow_query_log.get_stats(limit, order_by)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
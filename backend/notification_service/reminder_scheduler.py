@@ -33,7 +33,7 @@ class PaymentReminderScheduler:
         """
         Kiểm tra các hóa đơn sắp đến hạn thanh toán
         """
-        with get_db_context() as db:
+        with get_db_context("background") as db:
             today = datetime.now().date()
             upcoming_invoices = []
             
@@ -66,7 +66,7 @@ class PaymentReminderScheduler:
         """
         Kiểm tra các hóa đơn quá hạn
         """
-        with get_db_context() as db:
+        with get_db_context("background") as db:
             today = datetime.now().date()
             overdue_invoices = []
             
@@ -101,7 +101,7 @@ class PaymentReminderScheduler:
         Gửi thông báo nhắc thanh toán
         """
         try:
-            with get_db_context() as db:
+            with get_db_context("background") as db:
                 notification = Notification(
                     user_id=customer_id,
                     notification_type=NotificationType.payment_reminder,
@@ -176,7 +176,7 @@ class PaymentReminderScheduler:
         """
         Kiểm tra các gói bảo dưỡng sắp hết hạn
         """
-        with get_db_context() as db:
+        with get_db_context("background") as db:
             today = datetime.now().date()
             renewal_date = today + timedelta(days=30)  # Nhắc trước 30 ngày
             
@@ -1,7 +1,9 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List
 import sys
 import os
@@ -16,14 +18,19 @@ from pytz import timezone
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.database import get_db, engine
+from shared.database import get_db, get_async_db, ensure_indexes, engine, db_manager, workload_pools
 from shared.models import Base, Invoice, Payment, Appointment, Customer, Vehicle, Technician, ServiceCenter, ServiceRecord, User
 from shared.auth import get_current_user, require_role, api_gateway_client
+from shared.query_stats import QueryStatsMiddleware, query_metrics
+from shared.slow_queries import slow_query_log
+from shared.cache import cache_service, CacheTags
+from shared.statement_cache import customer_by_user, customer_by_user_async, invoice_by_id, statement_cache
 from schemas import *
 from vnpay import VNPay
 from config_vnpay import *
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes()
 
 app = FastAPI(title="Payment Service", version="1.0.0")
 
@@ -34,6 +41,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await db_manager.close_async()
 
 # VNPay Configuration (imported from config_vnpay.py)
 
@@ -91,6 +103,7 @@ async def create_manual_invoice(
     db.add(db_invoice)
     db.commit()
     db.refresh(db_invoice)
+    await cache_service.invalidate_tags(CacheTags.for_invoice(db_invoice))
 
     # Log manual invoice creation
     print(f"Manual invoice created: {db_invoice.invoice_number} for customer {db_invoice.customer_id} by user {current_user['user_id']} ({current_user['role']})")
@@ -102,24 +115,22 @@ async def get_invoices(
     customer_id: UUID = None,
     appointment_id: UUID = None,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Customers can only see their own invoices
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
-        if not customer:
-            return []
-        invoices = db.query(Invoice).filter(Invoice.customer_id == customer.id).all()
+        query = select(Invoice).join(Customer, Invoice.customer_id == Customer.id)\
+            .where(Customer.user_id == current_user["user_id"])
     else:
-        query = db.query(Invoice)
+        query = select(Invoice)
         # Allow filtering by appointment_id for admin/staff calls or internal checks
         if appointment_id:
-            query = query.filter(Invoice.appointment_id == appointment_id)
+            query = query.where(Invoice.appointment_id == appointment_id)
         if customer_id:
-            query = query.filter(Invoice.customer_id == customer_id)
-        invoices = query.all()
+            query = query.where(Invoice.customer_id == customer_id)
     
-    return invoices
+    result = await db.execute(query)
+    return result.scalars().all()
 
 
 @app.get("/invoices/comprehensive", response_model=List[InvoiceDetailsResponse])
@@ -146,7 +157,7 @@ async def get_comprehensive_invoices(
     
     # Role-based filtering
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = customer_by_user(db, current_user["user_id"])
         if not customer:
             return []
         query = query.filter(Invoice.customer_id == customer.id)
@@ -278,15 +289,15 @@ async def get_comprehensive_invoices(
 async def get_invoice_detail(
     invoice_id: UUID,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    invoice = await db.get(Invoice, invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
     # Customers can only see their own invoices
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = await customer_by_user_async(db, current_user["user_id"])
         if not customer or invoice.customer_id != customer.id:
             raise HTTPException(status_code=403, detail="Access denied")
     
@@ -299,13 +310,13 @@ async def get_invoice_details(
     db: Session = Depends(get_db)
 ):
     # Get invoice with related data
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    invoice = invoice_by_id(db, invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
     # Customers can only see their own invoices
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = customer_by_user(db, current_user["user_id"])
         if not customer or invoice.customer_id != customer.id:
             raise HTTPException(status_code=403, detail="Access denied")
     
@@ -454,6 +465,7 @@ async def generate_invoice_for_appointment(
     db.add(db_invoice)
     db.commit()
     db.refresh(db_invoice)
+    await cache_service.invalidate_tags(CacheTags.for_invoice(db_invoice))
 
     # Log invoice creation for debugging
     print(f"Invoice created: {db_invoice.invoice_number} for customer {db_invoice.customer_id} by user {current_user['user_id']} ({current_user['role']})")
@@ -473,7 +485,7 @@ async def create_vnpay_payment(
             detail="Dịch vụ thanh toán VNPay chưa được cấu hình. Vui lòng liên hệ quản trị viên để thiết lập thông tin VNPay."
         )
 
-    invoice = db.query(Invoice).filter(Invoice.id == payment_request.invoice_id).first()
+    invoice = invoice_by_id(db, payment_request.invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Không tìm thấy hóa đơn")
     
@@ -670,7 +682,7 @@ async def record_cash_payment(
     current_user: dict = Depends(require_role(["staff", "admin"])),
     db: Session = Depends(get_db)
 ):
-    invoice = db.query(Invoice).filter(Invoice.id == payment_request.invoice_id).first()
+    invoice = invoice_by_id(db, payment_request.invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
@@ -689,8 +701,10 @@ async def record_cash_payment(
     invoice.payment_method = "cash"
     invoice.payment_date = datetime.now()
     
+    tags = CacheTags.for_invoice(invoice)
     db.commit()
     db.refresh(payment)
+    await cache_service.invalidate_tags(tags)
     
     return {
         "payment_id": str(payment.id),
@@ -711,7 +725,7 @@ async def vnpay_callback(request: Request, db: Session = Depends(get_db)):
     if not payment:
         raise HTTPException(status_code=404, detail="Không tìm thấy thanh toán")
     
-    invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
+    invoice = invoice_by_id(db, payment.invoice_id)
     
     # Validate response using VNPay class
     vnp = VNPay()
@@ -756,7 +770,9 @@ async def vnpay_callback(request: Request, db: Session = Depends(get_db)):
         payment.payment_gateway_response = params
         print(f"Invalid VNPay signature for payment {payment_id}")
     
+    tags = CacheTags.for_invoice(invoice)
     db.commit()
+    await cache_service.invalidate_tags(tags)
     
     return {"status": payment.status, "invoice_id": str(invoice.id)}
 
@@ -788,7 +804,7 @@ async def vnpay_ipn(request: Request, db: Session = Depends(get_db)):
             if not payment:
                 return {"RspCode": "01", "Message": "Không tìm thấy đơn hàng"}
             
-            invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
+            invoice = invoice_by_id(db, payment.invoice_id)
             if not invoice:
                 return {"RspCode": "01", "Message": "Không tìm thấy hóa đơn"}
             
@@ -811,7 +827,9 @@ async def vnpay_ipn(request: Request, db: Session = Depends(get_db)):
                 invoice.payment_method = "vnpay"
                 invoice.payment_date = datetime.now()
                 
+                tags = CacheTags.for_invoice(invoice)
                 db.commit()
+                await cache_service.invalidate_tags(tags)
                 
                 # Send payment success notification
                 try:
@@ -865,7 +883,7 @@ async def test_vnpay_callback(
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     
-    invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
+    invoice = invoice_by_id(db, payment.invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
@@ -1101,6 +1119,26 @@ async def health_check():
     return {"status": "healthy", "service": "payment_service", "version": "1.0.0"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Per-endpoint query counts, DB time and workload-class pool usage in Prometheus text format"""
+    return PlainTextResponse(query_metrics.render_prometheus() + workload_pools.render_prometheus())
+
+@app.get("/metrics/queries")
+async def query_metrics_detail(current_user: dict = Depends(require_role(["admin"]))):
+    """Per-endpoint query stats, the most repeated (N+1) statement shapes and point-lookup counters"""
+    return {**query_metrics.get_stats(), "point_lookups": statement_cache.get_stats()}
+
+@app.get("/metrics/slow-queries")
+async def slow_queries(
+    limit: int = 20,
+    order_by: str = "total",
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Slowest statement shapes seen by this instance (order_by: total, max, avg, count)"""
+    return slow_query_log.get_stats(limit, order_by)
+
+
 @app.get("/invoices/missing-payments")
 async def list_invoices_missing_payments(
     current_user: dict = Depends(require_role(["admin"])),
@@ -1173,6 +1211,9 @@ async def reconcile_missing_payments(
         created.append({"invoice_id": str(invoice_id), "payment_id": str(payment.id)})
 
     db.commit()
+    await cache_service.invalidate_tags(
+        [CacheTags.INVOICE.format(id=item["invoice_id"]) for item in created] + [CacheTags.DASHBOARD]
+    )
 
     return {"created_count": len(created), "created": created}
 
@@ -1280,7 +1321,7 @@ async def get_comprehensive_invoices(
     
     # Role-based filtering
     if current_user["role"] == "customer":
-        customer = db.query(Customer).filter(Customer.user_id == current_user["user_id"]).first()
+        customer = customer_by_user(db, current_user["user_id"])
         if not customer:
             return []
         query = query.filter(Invoice.customer_id == customer.id)
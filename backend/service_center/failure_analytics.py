@@ -17,7 +17,7 @@ from shared.models import (
     Appointment, ServiceRecord, ServiceType, Part, Vehicle,
     AppointmentStatus, ChecklistItem, AppointmentChecklistProgress
 )
-from shared.database import get_db_context
+from shared.database import get_db_context, date_range
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +36,7 @@ class FailureAnalytics:
         """
         Lấy danh sách các sự cố phổ biến nhất
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             if not start_date:
                 start_date = date.today() - timedelta(days=90)  # 3 months
             if not end_date:
@@ -52,8 +52,7 @@ class FailureAnalytics:
                 Appointment,
                 ServiceType.id == Appointment.service_type_id
             ).filter(
-                func.date(Appointment.appointment_date) >= start_date,
-                func.date(Appointment.appointment_date) <= end_date,
+                date_range(Appointment.appointment_date, start_date, end_date),
                 Appointment.status == AppointmentStatus.completed
             ).group_by(
                 ServiceType.name,
@@ -96,7 +95,7 @@ class FailureAnalytics:
         """
         Phân tích tỷ lệ hỏng của phụ tùng
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             if not start_date:
                 start_date = date.today() - timedelta(days=180)  # 6 months
             if not end_date:
@@ -104,8 +103,7 @@ class FailureAnalytics:
             
             # Lấy service records với parts used
             service_records = db.query(ServiceRecord).filter(
-                func.date(ServiceRecord.service_date) >= start_date,
-                func.date(ServiceRecord.service_date) <= end_date,
+                date_range(ServiceRecord.service_date, start_date, end_date),
                 ServiceRecord.parts_used.isnot(None)
             ).all()
             
@@ -152,7 +150,7 @@ class FailureAnalytics:
         """
         Phân tích độ tin cậy theo model xe
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             if not start_date:
                 start_date = date.today() - timedelta(days=365)  # 1 year
             if not end_date:
@@ -168,8 +166,7 @@ class FailureAnalytics:
                 Appointment,
                 Vehicle.id == Appointment.vehicle_id
             ).filter(
-                func.date(Appointment.appointment_date) >= start_date,
-                func.date(Appointment.appointment_date) <= end_date,
+                date_range(Appointment.appointment_date, start_date, end_date),
                 Appointment.status == AppointmentStatus.completed
             ).group_by(
                 Vehicle.make,
@@ -220,7 +217,7 @@ class FailureAnalytics:
         """
         Phân tích xu hướng theo mùa
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             trends = []
             
             for i in range(months):
@@ -235,15 +232,13 @@ class FailureAnalytics:
                 
                 # Count appointments
                 count = db.query(func.count(Appointment.id)).filter(
-                    func.date(Appointment.appointment_date) >= start_date,
-                    func.date(Appointment.appointment_date) <= end_date,
+                    date_range(Appointment.appointment_date, start_date, end_date),
                     Appointment.status == AppointmentStatus.completed
                 ).scalar()
                 
                 # Average cost
                 avg_cost = db.query(func.avg(Appointment.actual_cost)).filter(
-                    func.date(Appointment.appointment_date) >= start_date,
-                    func.date(Appointment.appointment_date) <= end_date,
+                    date_range(Appointment.appointment_date, start_date, end_date),
                     Appointment.status == AppointmentStatus.completed
                 ).scalar()
                 
@@ -268,7 +263,7 @@ class FailureAnalytics:
         """
         Phân tích insights từ diagnosis notes
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             if not start_date:
                 start_date = date.today() - timedelta(days=90)
             if not end_date:
@@ -276,8 +271,7 @@ class FailureAnalytics:
             
             # Get service records with diagnosis
             records = db.query(ServiceRecord).filter(
-                func.date(ServiceRecord.service_date) >= start_date,
-                func.date(ServiceRecord.service_date) <= end_date,
+                date_range(ServiceRecord.service_date, start_date, end_date),
                 ServiceRecord.diagnosis.isnot(None)
             ).all()
             
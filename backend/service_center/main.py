@@ -1,8 +1,8 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, Query, UploadFile, File, Form, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_, or_
 from sqlalchemy.exc import ProgrammingError
 from typing import List, Optional
@@ -10,20 +10,27 @@ from datetime import datetime, date, timedelta
 import sys
 import os
 import shutil
+import asyncio
 from uuid import UUID
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.database import get_db, engine
+from shared.database import get_db, get_db_context, get_analytics_db, date_range, ensure_indexes, engine, query_optimizer, workload_pools
 from shared.models import (
     Base, Appointment, Vehicle, Customer, User, ServiceType,
     ServiceCenter, Technician, Part, ServiceRecord, Invoice, Staff,
     ServiceChecklist, ChecklistItem, AppointmentChecklistProgress
 )
 from shared.auth import get_current_user, require_role, api_gateway_client
+from shared.query_stats import QueryStatsMiddleware, query_metrics
+from shared.slow_queries import slow_query_log
+from shared.cache import cache_service, CacheTags, CacheKeys
+from shared.cache_warming import cache_warmer, model_to_dict
+from shared.statement_cache import technician_by_user, technician_id_by_user, service_type_by_id, statement_cache
 from schemas import *
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes()
 
 app = FastAPI(title="Service Center Management", version="1.0.0")
 
@@ -34,6 +41,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
 
 # Create uploads directory if it doesn't exist
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
@@ -50,13 +58,140 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 from technician_routes import router as technician_router
 app.include_router(technician_router)
 
+# Reference data warmed at startup; service types and parts share keys with customer_service
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "600"))
+
+@cache_warmer.loader("service_types", CacheKeys.SERVICE_TYPES, REFERENCE_CACHE_TTL, [CacheTags.SERVICE_TYPES])
+def load_service_types():
+    with get_db_context("background") as db:
+        return [model_to_dict(st) for st in db.query(ServiceType).filter(ServiceType.is_active == True).all()]
+
+@cache_warmer.loader("parts", CacheKeys.PARTS_INVENTORY, REFERENCE_CACHE_TTL, [CacheTags.PARTS])
+def load_parts():
+    with get_db_context("background") as db:
+        return [model_to_dict(p) for p in db.query(Part).filter(Part.is_active == True).order_by(Part.name).all()]
+
+@cache_warmer.loader("technicians", CacheKeys.TECHNICIANS, REFERENCE_CACHE_TTL, [CacheTags.TECHNICIANS])
+def load_technicians_list():
+    with get_db_context("background") as db:
+        technicians = db.query(Technician).join(User).options(joinedload(Technician.user)).filter(User.role == "technician").all()
+        return [
+            {
+                "id": tech.id,
+                "employee_id": tech.employee_id,
+                "full_name": tech.user.full_name,
+                "phone": tech.user.phone,
+                "email": tech.user.email,
+                "specialization": tech.specialization,
+                "experience_years": tech.experience_years,
+                "is_available": tech.is_available,
+                "certification_number": tech.certification_number,
+                "certification_expiry": tech.certification_expiry
+            }
+            for tech in technicians
+        ]
+
+@cache_warmer.loader("checklist_templates", CacheKeys.CHECKLIST_TEMPLATES, REFERENCE_CACHE_TTL, [CacheTags.CHECKLISTS])
+def load_checklist_templates():
+    """Active checklist per service type (keyed by its id as a string) with its ordered items"""
+    with get_db_context("background") as db:
+        checklists = db.query(ServiceChecklist).options(joinedload(ServiceChecklist.items)).filter(
+            ServiceChecklist.is_active == True
+        ).all()
+        templates = {}
+        for checklist in checklists:
+            key = str(checklist.service_type_id)
+            if key in templates:
+                continue
+            templates[key] = {
+                "id": checklist.id,
+                "name": checklist.name,
+                "items": [model_to_dict(item) for item in sorted(checklist.items, key=lambda i: i.display_order or 0)],
+            }
+        return templates
+
+@app.on_event("startup")
+async def startup_event():
+    await cache_warmer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await cache_warmer.stop()
+
+# Cached entity lookups for appointment enrichment
+ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", "300"))
+VEHICLE_FETCH_CONCURRENCY = int(os.getenv("VEHICLE_FETCH_CONCURRENCY", "10"))
+
+def load_customers(db: Session, customer_ids: List[UUID]) -> dict:
+    rows = db.query(Customer).join(User).options(joinedload(Customer.user)).filter(Customer.id.in_(customer_ids)).all()
+    return {
+        row.id: {
+            "id": str(row.user.id),
+            "full_name": row.user.full_name,
+            "phone": row.user.phone,
+            "email": row.user.email,
+            "address": row.address,
+            "date_of_birth": row.date_of_birth.isoformat() if row.date_of_birth else None,
+            "avatar_url": row.avatar_url,
+            "created_at": row.created_at.isoformat() if row.created_at else None
+        }
+        for row in rows
+    }
+
+def load_technicians(db: Session, technician_ids: List[UUID], user_ids: dict) -> dict:
+    rows = db.query(Technician).join(User).options(joinedload(Technician.user)).filter(Technician.id.in_(technician_ids)).all()
+    result = {}
+    for row in rows:
+        user_ids[row.id] = row.user_id
+        result[row.id] = {
+            "id": row.id,
+            "full_name": row.user.full_name,
+            "phone": row.user.phone,
+            "email": row.user.email,
+            "specialization": row.specialization,
+            "experience_years": row.experience_years,
+            "certification_number": row.certification_number
+        }
+    return result
+
+async def load_vehicles(vehicle_ids: List[UUID]) -> dict:
+    """Vehicle info from the customer service; vehicles it cannot return are left out"""
+    semaphore = asyncio.Semaphore(VEHICLE_FETCH_CONCURRENCY)
+    
+    async def fetch(vehicle_id):
+        async with semaphore:
+            return await api_gateway_client.call_service(f"/customer/vehicles/{vehicle_id}")
+    
+    responses = await asyncio.gather(*(fetch(vehicle_id) for vehicle_id in vehicle_ids), return_exceptions=True)
+    result = {}
+    for vehicle_id, vehicle_data in zip(vehicle_ids, responses):
+        if isinstance(vehicle_data, Exception):
+            continue
+        result[vehicle_id] = {
+            "id": vehicle_data["id"],
+            "make": vehicle_data["make"],
+            "model": vehicle_data["model"],
+            "year": vehicle_data["year"],
+            "license_plate": vehicle_data["license_plate"],
+            "color": vehicle_data["color"],
+            "vin": vehicle_data["vin"],
+            "battery_capacity": vehicle_data["battery_capacity"],
+            "current_mileage": vehicle_data["current_mileage"],
+            "last_maintenance_date": vehicle_data["last_maintenance_date"],
+            "next_maintenance_date": vehicle_data["next_maintenance_date"]
+        }
+    return result
+
 # Appointment Management
 @app.get("/appointments", response_model=List[AppointmentDetailResponse])
 async def get_all_appointments(
+    response: Response,
     id: Optional[UUID] = None,
     status: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
     current_user: dict = Depends(require_role(["staff", "technician", "admin"])),
     db: Session = Depends(get_db)
 ):
@@ -80,60 +215,60 @@ async def get_all_appointments(
     
     # For technicians, only show their appointments
     if current_user["role"] == "technician":
-        tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
-        if tech:
-            query = query.filter(Appointment.technician_id == tech.id)
+        tech_id = technician_id_by_user(db, current_user["user_id"])
+        if tech_id:
+            query = query.filter(Appointment.technician_id == tech_id)
     
     try:
-        appointments = query.order_by(Appointment.appointment_date).all()
+        if cursor is None and limit is None:
+            appointments = query.order_by(Appointment.appointment_date).all()
+        else:
+            # Keyset pages in the same (ascending) order; the cursor comes back in X-Next-Cursor
+            page = query_optimizer.paginate_keyset(
+                query, Appointment.appointment_date, Appointment.id, cursor, limit or 20, descending=False
+            )
+            page.set_headers(response)
+            appointments = page.items
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except ProgrammingError as e:
         import logging
         logging.getLogger('service_center.db').error('Database programming error when fetching appointments: %s', e)
         return []
     
-    # Enrich with full customer, vehicle, service type, service center, and technician info
+    # Enrich with full customer, vehicle, service type, service center, and technician info.
+    # Customers, vehicles and technicians are looked up in bulk through the cache;
+    # only the misses hit the database or the customer service.
+    customers = await cache_service.get_or_load_many(
+        [apt.customer_id for apt in appointments], CacheKeys.CUSTOMER, lambda ids: load_customers(db, ids),
+        ttl=ENTITY_CACHE_TTL,
+        tags_for=lambda customer_id, customer: [
+            CacheTags.CUSTOMER.format(id=customer_id), CacheTags.USER.format(id=customer["id"])
+        ]
+    )
+    vehicles = await cache_service.get_or_load_many(
+        [apt.vehicle_id for apt in appointments], CacheKeys.VEHICLE, load_vehicles,
+        ttl=ENTITY_CACHE_TTL,
+        tags_for=lambda vehicle_id, vehicle: [CacheTags.VEHICLE.format(id=vehicle_id)]
+    )
+    technician_users = {}
+    technicians = await cache_service.get_or_load_many(
+        [apt.technician_id for apt in appointments], CacheKeys.TECHNICIAN,
+        lambda ids: load_technicians(db, ids, technician_users),
+        ttl=ENTITY_CACHE_TTL,
+        tags_for=lambda technician_id, technician: [
+            CacheTags.TECHNICIAN.format(id=technician_id), CacheTags.USER.format(id=technician_users[technician_id])
+        ]
+    )
+    
     result = []
     for apt in appointments:
-        # Get customer info from local DB (shared database) instead of API Gateway
-        customer_query = db.query(Customer).join(User).filter(Customer.id == apt.customer_id).first()
-        if customer_query:
-            customer = {
-                "id": str(customer_query.user.id),
-                "full_name": customer_query.user.full_name,
-                "phone": customer_query.user.phone,
-                "email": customer_query.user.email,
-                "address": customer_query.address,
-                "date_of_birth": customer_query.date_of_birth.isoformat() if customer_query.date_of_birth else None,
-                "avatar_url": customer_query.avatar_url,
-                "created_at": customer_query.created_at.isoformat() if customer_query.created_at else None
-            }
-        else:
-            customer = None
-        
-        # Call customer service for vehicle info
-        try:
-            vehicle_data = await api_gateway_client.call_service(f"/customer/vehicles/{apt.vehicle_id}")
-            vehicle = {
-                "id": vehicle_data["id"],
-                "make": vehicle_data["make"],
-                "model": vehicle_data["model"],
-                "year": vehicle_data["year"],
-                "license_plate": vehicle_data["license_plate"],
-                "color": vehicle_data["color"],
-                "vin": vehicle_data["vin"],
-                "battery_capacity": vehicle_data["battery_capacity"],
-                "current_mileage": vehicle_data["current_mileage"],
-                "last_maintenance_date": vehicle_data["last_maintenance_date"],
-                "next_maintenance_date": vehicle_data["next_maintenance_date"]
-            }
-        except Exception as e:
-            # Fallback to basic vehicle info if API call fails
-            vehicle = None
+        customer = customers.get(apt.customer_id)
+        vehicle = vehicles.get(apt.vehicle_id)
         
-        # Get service type, service center, and technician from local DB (these are service_center data)
-        service_type = db.query(ServiceType).filter(ServiceType.id == apt.service_type_id).first()
+        # Get service type and service center from local DB (these are service_center data)
+        service_type = service_type_by_id(db, apt.service_type_id)
         service_center = db.query(ServiceCenter).filter(ServiceCenter.id == apt.service_center_id).first()
-        technician = db.query(Technician).join(User).filter(Technician.id == apt.technician_id).first() if apt.technician_id else None
         
         # Build customer object
         customer_data = None
@@ -189,17 +324,7 @@ async def get_all_appointments(
             }
         
         # Build technician object
-        technician_data = None
-        if technician:
-            technician_data = {
-                "id": technician.id,
-                "full_name": technician.user.full_name,
-                "phone": technician.user.phone,
-                "email": technician.user.email,
-                "specialization": technician.specialization,
-                "experience_years": technician.experience_years,
-                "certification_number": technician.certification_number
-            }
+        technician_data = technicians.get(apt.technician_id)
         
         result.append({
             "id": apt.id,
@@ -241,7 +366,9 @@ async def update_appointment_status(
     if status_update.staff_notes:
         appointment.staff_notes = status_update.staff_notes
 
+    tags = CacheTags.for_appointment(appointment)
     db.commit()
+    await cache_service.invalidate_tags(tags)
 
     # If appointment was completed, ask Payment Service to generate an invoice
     try:
@@ -282,8 +409,12 @@ async def assign_technician(
     if not technician:
         raise HTTPException(status_code=404, detail="Technician not found")
     
+    # Both the previous and the new technician's cached views are stale
+    tags = CacheTags.for_appointment(appointment)
     appointment.technician_id = assignment.technician_id
+    tags += CacheTags.for_appointment(appointment)
     db.commit()
+    await cache_service.invalidate_tags(tags)
     
     return {"message": "Technician assigned successfully"}
 
@@ -295,7 +426,7 @@ async def create_service_record(
     db: Session = Depends(get_db)
 ):
     # Get technician ID
-    technician = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    technician = technician_by_user(db, current_user["user_id"])
     
     db_record = ServiceRecord(
         appointment_id=record.appointment_id,
@@ -324,12 +455,15 @@ async def create_service_record(
     
     # Update appointment
     appointment = db.query(Appointment).filter(Appointment.id == record.appointment_id).first()
+    tags = [CacheTags.VEHICLE.format(id=record.vehicle_id)]
     if appointment:
         appointment.actual_cost = record.total_cost
         appointment.status = "completed"
+        tags += CacheTags.for_appointment(appointment)
     
     db.commit()
     db.refresh(db_record)
+    await cache_service.invalidate_tags(tags)
 
     # After recording service and marking appointment completed, trigger invoice generation
     try:
@@ -368,18 +502,16 @@ async def get_service_records(
 async def get_parts(
     low_stock: bool = False,
     category: Optional[str] = None,
-    current_user: dict = Depends(require_role(["staff", "technician", "admin"])),
-    db: Session = Depends(get_db)
+    current_user: dict = Depends(require_role(["staff", "technician", "admin"]))
 ):
-    query = db.query(Part).filter(Part.is_active == True)
+    parts = await cache_warmer.get("parts")
     
     if low_stock:
-        query = query.filter(Part.quantity_in_stock <= Part.minimum_stock_level)
+        parts = [part for part in parts if (part["quantity_in_stock"] or 0) <= (part["minimum_stock_level"] or 0)]
     
     if category:
-        query = query.filter(Part.category == category)
+        parts = [part for part in parts if part["category"] == category]
     
-    parts = query.all()
     return parts
 
 @app.post("/parts", response_model=PartResponse, status_code=status.HTTP_201_CREATED)
@@ -397,6 +529,7 @@ async def create_part(
     db.add(db_part)
     db.commit()
     db.refresh(db_part)
+    await cache_service.invalidate_tags([CacheTags.PARTS])
     
     return db_part
 
@@ -416,6 +549,7 @@ async def update_part(
     
     db.commit()
     db.refresh(part)
+    await cache_service.invalidate_tags([CacheTags.PARTS])
     return part
 
 @app.post("/parts/{part_id}/adjust-stock")
@@ -435,6 +569,7 @@ async def adjust_part_stock(
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
     db.commit()
+    await cache_service.invalidate_tags([CacheTags.PARTS])
     
     return {
         "message": "Stock adjusted",
@@ -446,32 +581,14 @@ async def adjust_part_stock(
 @app.get("/technicians", response_model=List[TechnicianResponse])
 async def get_technicians(
     available_only: bool = False,
-    current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    current_user: dict = Depends(require_role(["staff", "admin"]))
 ):
-    query = db.query(Technician).join(User).filter(User.role == "technician")
+    technicians = await cache_warmer.get("technicians")
     
     if available_only:
-        query = query.filter(Technician.is_available == True)
+        technicians = [tech for tech in technicians if tech["is_available"]]
     
-    technicians = query.all()
-    
-    result = []
-    for tech in technicians:
-        result.append({
-            "id": tech.id,
-            "employee_id": tech.employee_id,
-            "full_name": tech.user.full_name,
-            "phone": tech.user.phone,
-            "email": tech.user.email,
-            "specialization": tech.specialization,
-            "experience_years": tech.experience_years,
-            "is_available": tech.is_available,
-            "certification_number": tech.certification_number,
-            "certification_expiry": tech.certification_expiry
-        })
-    
-    return result
+    return technicians
 
 @app.put("/technicians/{technician_id}/availability")
 async def update_technician_availability(
@@ -486,12 +603,13 @@ async def update_technician_availability(
     
     # Technicians can only update their own availability
     if current_user["role"] == "technician":
-        tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+        tech = technician_by_user(db, current_user["user_id"])
         if tech.id != technician_id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
     technician.is_available = availability.is_available
     db.commit()
+    await cache_service.invalidate_tags([CacheTags.TECHNICIAN.format(id=technician_id), CacheTags.TECHNICIANS, CacheTags.DASHBOARD])
     
     return {"message": "Availability updated", "is_available": technician.is_available}
 
@@ -624,12 +742,12 @@ async def get_dashboard_stats(
 
         # Today's appointments
         today_appointments = db.query(Appointment).filter(
-            func.date(Appointment.appointment_date) == today
+            date_range(Appointment.appointment_date, today, today)
         ).count()
 
         # Completed today
         completed_today = db.query(Appointment).filter(
-            func.date(Appointment.appointment_date) == today,
+            date_range(Appointment.appointment_date, today, today),
             Appointment.status == "completed"
         ).count()
 
@@ -700,19 +818,14 @@ async def get_appointment_checklist(
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
-    # Get checklist for this service type
-    checklist = db.query(ServiceChecklist).filter(
-        ServiceChecklist.service_type_id == appointment.service_type_id,
-        ServiceChecklist.is_active == True
-    ).first()
+    # Get checklist template (with ordered items) for this service type
+    templates = await cache_warmer.get("checklist_templates")
+    checklist = templates.get(str(appointment.service_type_id))
     
     if not checklist:
         raise HTTPException(status_code=404, detail="No checklist found for this service type")
     
-    # Get all checklist items
-    items = db.query(ChecklistItem).filter(
-        ChecklistItem.checklist_id == checklist.id
-    ).order_by(ChecklistItem.display_order).all()
+    items = checklist["items"]
     
     # Get progress for this appointment
     progress_items = db.query(AppointmentChecklistProgress).filter(
@@ -728,29 +841,29 @@ async def get_appointment_checklist(
     completed_items = 0
     
     for item in items:
-        if item.category not in categories_dict:
-            categories_dict[item.category] = []
+        if item["category"] not in categories_dict:
+            categories_dict[item["category"]] = []
         
-        progress = progress_map.get(item.id)
+        progress = progress_map.get(item["id"])
         is_completed = progress.is_completed if progress else False
         
         if is_completed:
             completed_items += 1
         
         item_response = ChecklistItemResponse(
-            id=item.id,
-            checklist_id=item.checklist_id,
-            category=item.category,
-            item_name=item.item_name,
-            description=item.description,
-            is_required=item.is_required,
-            display_order=item.display_order,
+            id=item["id"],
+            checklist_id=item["checklist_id"],
+            category=item["category"],
+            item_name=item["item_name"],
+            description=item["description"],
+            is_required=item["is_required"],
+            display_order=item["display_order"],
             is_completed=is_completed,
             notes=progress.notes if progress else None,
             completed_at=progress.completed_at if progress else None,
             completed_by=progress.completed_by if progress else None
         )
-        categories_dict[item.category].append(item_response)
+        categories_dict[item["category"]].append(item_response)
     
     # Convert to list of categories
     categories = [
@@ -763,7 +876,7 @@ async def get_appointment_checklist(
     
     return AppointmentChecklistResponse(
         appointment_id=appointment_id,
-        checklist_name=checklist.name,
+        checklist_name=checklist["name"],
         total_items=total_items,
         completed_items=completed_items,
         progress_percentage=round(progress_percentage, 1),
@@ -809,6 +922,7 @@ async def update_checklist_item(
     
     db.commit()
     db.refresh(progress)
+    await cache_service.invalidate_tags([CacheTags.APPOINTMENT.format(id=appointment_id)])
     
     return {
         "message": "Checklist item updated successfully",
@@ -824,7 +938,7 @@ async def generate_report(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Generate work report in Excel or PDF format"""
     from report_generator import ReportGenerator
@@ -851,8 +965,7 @@ async def generate_report(
     
     # Get appointments in date range
     appointments = db.query(Appointment).filter(
-        func.date(Appointment.appointment_date) >= date_from,
-        func.date(Appointment.appointment_date) <= date_to
+        date_range(Appointment.appointment_date, date_from, date_to)
     ).all()
     
     # Get customers and vehicles info
@@ -860,7 +973,7 @@ async def generate_report(
     for apt in appointments:
         customer = db.query(Customer).join(User).filter(Customer.id == apt.customer_id).first()
         vehicle = db.query(Vehicle).filter(Vehicle.id == apt.vehicle_id).first()
-        service_type = db.query(ServiceType).filter(ServiceType.id == apt.service_type_id).first()
+        service_type = service_type_by_id(db, apt.service_type_id)
         
         appointment_details.append({
             'id': str(apt.id),
@@ -922,10 +1035,9 @@ async def get_service_types(
     return service_types
 
 @app.get("/service-types/public", response_model=List[ServiceTypeResponse])
-async def get_public_service_types(db: Session = Depends(get_db)):
+async def get_public_service_types():
     """Get active service types for public access (no authentication required)"""
-    service_types = db.query(ServiceType).filter(ServiceType.is_active == True).all()
-    return service_types
+    return await cache_warmer.get("service_types")
 
 @app.post("/service-types", response_model=ServiceTypeResponse)
 async def create_service_type(
@@ -987,6 +1099,7 @@ async def create_service_type(
     db.add(new_service_type)
     db.commit()
     db.refresh(new_service_type)
+    await cache_service.invalidate_tags([CacheTags.SERVICE_TYPES])
     
     return new_service_type
 
@@ -1007,7 +1120,7 @@ async def update_service_type(
     print(f"DEBUG: update_service_type called with service_type_id={service_type_id}")
     print(f"DEBUG: name={name}, image={image is not None if image else None}")
     
-    service_type = db.query(ServiceType).filter(ServiceType.id == service_type_id).first()
+    service_type = service_type_by_id(db, service_type_id)
     
     if not service_type:
         raise HTTPException(
@@ -1082,6 +1195,7 @@ async def update_service_type(
     
     db.commit()
     db.refresh(service_type)
+    await cache_service.invalidate_tags([CacheTags.SERVICE_TYPES])
     
     print(f"DEBUG: Service type updated successfully, image_url={service_type.image_url}")
     return service_type
@@ -1093,7 +1207,7 @@ async def delete_service_type(
     db: Session = Depends(get_db)
 ):
     """Delete a service type (soft delete by setting is_active=False)"""
-    service_type = db.query(ServiceType).filter(ServiceType.id == service_type_id).first()
+    service_type = service_type_by_id(db, service_type_id)
     
     if not service_type:
         raise HTTPException(
@@ -1110,6 +1224,7 @@ async def delete_service_type(
         # Soft delete instead of hard delete
         service_type.is_active = False
         db.commit()
+        await cache_service.invalidate_tags([CacheTags.SERVICE_TYPES])
         return {
             "message": f"Đã vô hiệu hóa dịch vụ (có {appointments_count} lịch hẹn liên quan)",
             "soft_delete": True
@@ -1118,6 +1233,8 @@ async def delete_service_type(
         # Hard delete if no appointments
         db.delete(service_type)
         db.commit()
+        # Its checklists are removed by the cascade
+        await cache_service.invalidate_tags([CacheTags.SERVICE_TYPES, CacheTags.CHECKLISTS])
         return {
             "message": "Đã xóa dịch vụ thành công",
             "soft_delete": False
@@ -1147,8 +1264,10 @@ async def delete_appointment(
     ).delete()
     
     # Delete the appointment
+    tags = CacheTags.for_appointment(appointment)
     db.delete(appointment)
     db.commit()
+    await cache_service.invalidate_tags(tags)
     
     return {"message": "Appointment deleted successfully"}
 
@@ -1182,9 +1301,9 @@ async def get_next_in_queue(
     
     # Nếu là technician, dùng user_id của họ
     if current_user.get("role") == "technician" and not technician_id:
-        tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
-        if tech:
-            technician_id = str(tech.id)
+        tech_id = technician_id_by_user(db, current_user["user_id"])
+        if tech_id:
+            technician_id = str(tech_id)
     
     next_apt = queue_manager.get_next_appointment(technician_id)
     
@@ -1230,6 +1349,7 @@ async def move_appointment_to_progress(
     success = queue_manager.move_to_in_progress(str(apt_uuid))
     
     if success:
+        await cache_service.invalidate_tags([CacheTags.APPOINTMENT.format(id=apt_uuid), CacheTags.DASHBOARD])
         return {"message": "Appointment moved to in_progress", "appointment_id": appointment_id}
     else:
         raise HTTPException(status_code=400, detail="Cannot move appointment to in_progress")
@@ -1243,7 +1363,7 @@ async def get_technician_performance_detailed(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Lấy báo cáo hiệu suất chi tiết của kỹ thuật viên"""
     from performance_tracker import performance_tracker
@@ -1273,7 +1393,7 @@ async def get_technicians_ranking(
     end_date: Optional[str] = None,
     limit: int = 10,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Xếp hạng kỹ thuật viên theo hiệu suất"""
     from performance_tracker import performance_tracker
@@ -1298,7 +1418,7 @@ async def get_performance_trends(
     technician_id: str,
     months: int = 6,
     current_user: dict = Depends(require_role(["staff", "admin", "technician"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Lấy xu hướng hiệu suất theo tháng"""
     from performance_tracker import performance_tracker
@@ -1311,7 +1431,7 @@ async def get_performance_trends(
     
     # Technicians can only view their own trends
     if current_user.get("role") == "technician":
-        tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+        tech = technician_by_user(db, current_user["user_id"])
         if not tech or str(tech.id) != str(tech_uuid):
             raise HTTPException(status_code=403, detail="Not authorized")
     
@@ -1328,7 +1448,7 @@ async def get_common_issues(
     end_date: Optional[str] = None,
     limit: int = 10,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Lấy danh sách các sự cố phổ biến nhất"""
     from failure_analytics import failure_analytics
@@ -1346,7 +1466,7 @@ async def get_parts_failure_rate(
     end_date: Optional[str] = None,
     limit: int = 15,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Phân tích tỷ lệ hỏng của phụ tùng"""
     from failure_analytics import failure_analytics
@@ -1363,7 +1483,7 @@ async def get_vehicle_reliability(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Phân tích độ tin cậy theo model xe"""
     from failure_analytics import failure_analytics
@@ -1379,7 +1499,7 @@ async def get_vehicle_reliability(
 async def get_seasonal_trends(
     months: int = 12,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Phân tích xu hướng theo mùa"""
     from failure_analytics import failure_analytics
@@ -1392,7 +1512,7 @@ async def get_diagnostic_insights(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     current_user: dict = Depends(require_role(["staff", "admin"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_analytics_db)
 ):
     """Phân tích insights từ diagnosis notes"""
     from failure_analytics import failure_analytics
@@ -1406,7 +1526,31 @@ async def get_diagnostic_insights(
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "service_center"}
+    if not cache_warmer.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "service": "service_center", "cache_warming": cache_warmer.get_stats()}
+        )
+    return {"status": "healthy", "service": "service_center", "cache_warming": cache_warmer.get_stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """Per-endpoint query counts, DB time and workload-class pool usage in Prometheus text format"""
+    return PlainTextResponse(query_metrics.render_prometheus() + workload_pools.render_prometheus())
+
+@app.get("/metrics/queries")
+async def query_metrics_detail(current_user: dict = Depends(require_role(["admin"]))):
+    """Per-endpoint query stats, the most repeated (N+1) statement shapes and point-lookup counters"""
+    return {**query_metrics.get_stats(), "point_lookups": statement_cache.get_stats()}
+
+@app.get("/metrics/slow-queries")
+async def slow_queries(
+    limit: int = 20,
+    order_by: str = "total",
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Slowest statement shapes seen by this instance (order_by: total, max, avg, count)"""
+    return slow_query_log.get_stats(limit, order_by)
 
 if __name__ == "__main__":
     import uvicorn
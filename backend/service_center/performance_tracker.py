@@ -16,7 +16,7 @@ from shared.models import (
     Appointment, AppointmentStatus, Technician, ServiceRecord,
     AppointmentChecklistProgress, User
 )
-from shared.database import get_db_context
+from shared.database import get_db_context, date_range
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +35,7 @@ class PerformanceTracker:
         """
         Lấy báo cáo hiệu suất chi tiết của kỹ thuật viên
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             if not start_date:
                 start_date = date.today() - timedelta(days=30)
             if not end_date:
@@ -48,8 +48,7 @@ class PerformanceTracker:
             # Lấy tất cả appointments trong khoảng thời gian
             appointments = db.query(Appointment).filter(
                 Appointment.technician_id == technician_id,
-                func.date(Appointment.appointment_date) >= start_date,
-                func.date(Appointment.appointment_date) <= end_date
+                date_range(Appointment.appointment_date, start_date, end_date)
             ).all()
             
             total_tasks = len(appointments)
@@ -210,7 +209,7 @@ class PerformanceTracker:
         """
         Xếp hạng tất cả kỹ thuật viên theo hiệu suất
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             technicians = db.query(Technician).all()
             
             rankings = []
@@ -250,7 +249,7 @@ class PerformanceTracker:
         """
         Lấy xu hướng hiệu suất theo tháng
         """
-        with get_db_context() as db:
+        with get_db_context("analytics") as db:
             trends = []
             
             for i in range(months):
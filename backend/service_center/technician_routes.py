@@ -14,13 +14,14 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared.database import get_db
+from shared.database import get_db, date_range
 from shared.models import (
     Appointment, Vehicle, Customer, User, ServiceType,
     Technician, Part, ServiceRecord, AppointmentChecklistProgress,
     ChecklistItem, ServiceChecklist
 )
 from shared.auth import require_role
+from shared.statement_cache import technician_by_user, service_type_by_id
 from schemas import *
 
 router = APIRouter(prefix="/technician", tags=["Technician"])
@@ -34,7 +35,7 @@ async def get_technician_stats(
 ):
     """Get technician dashboard statistics"""
     # Get technician profile
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -43,13 +44,13 @@ async def get_technician_stats(
     # Today's tasks (appointments assigned to this technician)
     today_tasks = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) == today
+        date_range(Appointment.appointment_date, today, today)
     ).count()
     
     # Completed tasks today
     completed_today = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) == today,
+        date_range(Appointment.appointment_date, today, today),
         Appointment.status == "completed"
     ).count()
     
@@ -64,15 +65,14 @@ async def get_technician_stats(
     week_end = week_start + timedelta(days=6)
     week_tasks = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) >= week_start,
-        func.date(Appointment.appointment_date) <= week_end
+        date_range(Appointment.appointment_date, week_start, week_end)
     ).count()
     
     # This month's completed tasks
     month_start = today.replace(day=1)
     completed_month = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) >= month_start,
+        date_range(Appointment.appointment_date, month_start),
         Appointment.status == "completed"
     ).count()
     
@@ -93,7 +93,7 @@ async def get_today_tasks(
     db: Session = Depends(get_db)
 ):
     """Get today's assigned tasks"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -101,7 +101,7 @@ async def get_today_tasks(
     
     appointments = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) == today
+        date_range(Appointment.appointment_date, today, today)
     ).order_by(Appointment.appointment_date).all()
     
     # Enrich with customer and vehicle info
@@ -109,7 +109,7 @@ async def get_today_tasks(
     for apt in appointments:
         customer = db.query(Customer).join(User).filter(Customer.id == apt.customer_id).first()
         vehicle = db.query(Vehicle).filter(Vehicle.id == apt.vehicle_id).first()
-        service_type = db.query(ServiceType).filter(ServiceType.id == apt.service_type_id).first()
+        service_type = service_type_by_id(db, apt.service_type_id)
         
         result.append({
             "id": str(apt.id),
@@ -138,7 +138,7 @@ async def get_tasks(
 ):
     """Get all tasks assigned to this technician"""
     try:
-        tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+        tech = technician_by_user(db, current_user["user_id"])
         if not tech:
             return {"error": "Technician profile not found", "user_id": current_user["user_id"]}
         # Normalize status query: clients may send 'null' or 'undefined' strings
@@ -156,7 +156,7 @@ async def get_tasks(
             try:
                 customer = db.query(Customer).filter(Customer.id == apt.customer_id).first()
                 vehicle = db.query(Vehicle).filter(Vehicle.id == apt.vehicle_id).first()
-                service_type = db.query(ServiceType).filter(ServiceType.id == apt.service_type_id).first()
+                service_type = service_type_by_id(db, apt.service_type_id)
                 
                 result.append({
                     "id": str(apt.id),
@@ -196,7 +196,7 @@ async def get_task_details(
     db: Session = Depends(get_db)
 ):
     """Get detailed information about a specific task"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -210,7 +210,7 @@ async def get_task_details(
     
     customer = db.query(Customer).filter(Customer.id == appointment.customer_id).first()
     vehicle = db.query(Vehicle).filter(Vehicle.id == appointment.vehicle_id).first()
-    service_type = db.query(ServiceType).filter(ServiceType.id == appointment.service_type_id).first()
+    service_type = service_type_by_id(db, appointment.service_type_id)
     
     return {
         "id": str(appointment.id),
@@ -248,7 +248,7 @@ async def start_task(
     db: Session = Depends(get_db)
 ):
     """Start working on a task"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -277,7 +277,7 @@ async def update_task_status(
     db: Session = Depends(get_db)
 ):
     """Update task status"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -315,7 +315,7 @@ async def complete_task(
     db: Session = Depends(get_db)
 ):
     """Complete a task with service record"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -392,7 +392,7 @@ async def get_current_schedule(
     db: Session = Depends(get_db)
 ):
     """Get current week's schedule"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -402,15 +402,14 @@ async def get_current_schedule(
     
     appointments = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) >= week_start,
-        func.date(Appointment.appointment_date) <= week_end
+        date_range(Appointment.appointment_date, week_start, week_end)
     ).order_by(Appointment.appointment_date).all()
     
     result = []
     for apt in appointments:
         customer = db.query(Customer).filter(Customer.id == apt.customer_id).first()
         vehicle = db.query(Vehicle).filter(Vehicle.id == apt.vehicle_id).first()
-        service_type = db.query(ServiceType).filter(ServiceType.id == apt.service_type_id).first()
+        service_type = service_type_by_id(db, apt.service_type_id)
         
         result.append({
             "id": str(apt.id),
@@ -432,7 +431,7 @@ async def get_schedule(
     db: Session = Depends(get_db)
 ):
     """Get schedule for a specific week (offset from current week)"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -442,15 +441,14 @@ async def get_schedule(
     
     appointments = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) >= week_start,
-        func.date(Appointment.appointment_date) <= week_end
+        date_range(Appointment.appointment_date, week_start, week_end)
     ).order_by(Appointment.appointment_date).all()
     
     result = []
     for apt in appointments:
         customer = db.query(Customer).filter(Customer.id == apt.customer_id).first()
         vehicle = db.query(Vehicle).filter(Vehicle.id == apt.vehicle_id).first()
-        service_type = db.query(ServiceType).filter(ServiceType.id == apt.service_type_id).first()
+        service_type = service_type_by_id(db, apt.service_type_id)
         
         result.append({
             "id": str(apt.id),
@@ -477,7 +475,7 @@ async def get_notifications(
     db: Session = Depends(get_db)
 ):
     """Get technician notifications (upcoming tasks, urgent issues)"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -487,7 +485,7 @@ async def get_notifications(
     today = date.today()
     pending_today = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) == today,
+        date_range(Appointment.appointment_date, today, today),
         Appointment.status == "pending"
     ).count()
     
@@ -524,7 +522,7 @@ async def request_part(
     db: Session = Depends(get_db)
 ):
     """Request a part for a task"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -590,7 +588,7 @@ async def get_task_checklist(
     db: Session = Depends(get_db)
 ):
     """Get checklist for a task"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -649,7 +647,7 @@ async def update_checklist_item(
     db: Session = Depends(get_db)
 ):
     """Update checklist item completion status"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -693,7 +691,7 @@ async def get_performance(
     db: Session = Depends(get_db)
 ):
     """Get technician performance metrics"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -711,13 +709,13 @@ async def get_performance(
     # Total tasks
     total_tasks = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) >= start_date
+        date_range(Appointment.appointment_date, start_date)
     ).count()
     
     # Completed tasks
     completed = db.query(Appointment).filter(
         Appointment.technician_id == tech.id,
-        func.date(Appointment.appointment_date) >= start_date,
+        date_range(Appointment.appointment_date, start_date),
         Appointment.status == "completed"
     ).count()
     
@@ -742,7 +740,7 @@ async def update_task_progress(
     db: Session = Depends(get_db)
 ):
     """Update task progress with notes and updates"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
@@ -771,7 +769,7 @@ async def get_progress_history(
     db: Session = Depends(get_db)
 ):
     """Get progress history for a task"""
-    tech = db.query(Technician).filter(Technician.user_id == current_user["user_id"]).first()
+    tech = technician_by_user(db, current_user["user_id"])
     if not tech:
         raise HTTPException(status_code=404, detail="Technician profile not found")
     
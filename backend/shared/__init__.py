@@ -6,11 +6,18 @@ This package contains utilities and shared code used across services in the `bac
 Public modules:
 - auth
 - cache
+- cache_codec
+- cache_warming
 - database
 - health_check
+- load_balancer
 - logging_config
 - models
+- query_stats
 - security
+- singleflight
+- slow_queries
+- statement_cache
 - validation
 
 Owner: Dev 1 (see BACKEND_ASSIGNMENT.md)
@@ -18,13 +25,20 @@ Owner: Dev 1 (see BACKEND_ASSIGNMENT.md)
 
 from .auth import *
 from .cache import *
+from .cache_codec import *
+from .cache_warming import *
 from .database import *
 from .health_check import *
+from .load_balancer import *
 from .logging_config import *
 from .models import *
+from .query_stats import *
 from .security import *
+from .singleflight import *
+from .slow_queries import *
+from .statement_cache import *
 from .validation import *
 
 __all__ = [
-    'auth', 'cache', 'database', 'health_check', 'logging_config', 'models', 'security', 'validation'
+    'auth', 'cache', 'cache_codec', 'cache_warming', 'database', 'health_check', 'load_balancer', 'logging_config', 'models', 'query_stats', 'security', 'singleflight', 'slow_queries', 'statement_cache', 'validation'
 ]
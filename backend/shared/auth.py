@@ -1,19 +1,100 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Callable
+from collections import OrderedDict
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import os
+import time
+import asyncio
+import hashlib
 import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import httpx
 
+from .cache import cache_service, CacheKeys, CacheTags
+from .load_balancer import LoadBalancer, endpoints_from_env
+
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# bcrypt cost factor for new hashes; existing hashes with a different cost
+# are upgraded transparently on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_PROFILE_CACHE_TTL = int(os.getenv("USER_PROFILE_CACHE_TTL", "300"))
+
+class TokenClaimsCache:
+    """
+    Bounded LRU of verified JWT claims, keyed by a digest of the token and
+    kept only until the token's own expiry. Only successfully verified
+    tokens are cached, so garbage tokens cannot evict real entries.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may mutate the claims dict, so hand out a copy
+        return dict(payload)
+
+    def put(self, token: str, payload: dict):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+        key = self._digest(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) * 100 if total else 0.0,
+        }
+
+token_cache = TokenClaimsCache()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -22,9 +103,71 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a bcrypt hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        # Format: $2b$<cost>$<salt+hash>
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+class PasswordHashExecutor:
+    """
+    Runs bcrypt on a dedicated, bounded thread pool so hashing never blocks
+    the event loop. Once max_pending calls are queued or running, new calls
+    are rejected immediately with 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication is busy, please try again",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+password_hasher = PasswordHashExecutor()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded bcrypt pool"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bounded bcrypt pool"""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -36,11 +179,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def decode_access_token(token: str):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    token_cache.put(token, payload)
+    return payload
+
+async def get_user_profile_cached(user_id: str, loader: Callable[[str], Optional[dict]]) -> Optional[dict]:
+    """
+    Cached user profile lookup. loader(user_id) is called on a miss and
+    should return a JSON-serializable dict, or None if the user is missing.
+    """
+    cache_key = CacheKeys.USER_PROFILE.format(user_id=user_id)
+    profile = await cache_service.get(cache_key)
+    if profile is not None:
+        return profile
+    
+    profile = loader(user_id)
+    if profile is not None:
+        await cache_service.set(cache_key, profile, USER_PROFILE_CACHE_TTL)
+    return profile
+
+def invalidate_user_profile(user_id) -> None:
+    """Drop a cached user profile after the user is updated, deactivated or deleted (sync/threadpool routes)"""
+    cache_service.delete_sync(CacheKeys.USER_PROFILE.format(user_id=str(user_id)))
+    # Cached customer/technician lookups embed the user's name and contact details
+    cache_service.invalidate_tags_sync([CacheTags.USER.format(id=str(user_id))])
+
+async def invalidate_user_profile_async(user_id) -> None:
+    """invalidate_user_profile() for async routes, without blocking the event loop"""
+    await cache_service.delete(CacheKeys.USER_PROFILE.format(user_id=str(user_id)))
+    await cache_service.invalidate_tags([CacheTags.USER.format(id=str(user_id))])
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
@@ -77,6 +250,8 @@ class APIGatewayClient:
     def __init__(self):
         self.base_url = os.getenv("API_GATEWAY_URL", "http://api_gateway:8000")
         self.timeout = 30.0
+        # API_GATEWAY_URLS lists gateway replicas; failing ones are ejected passively
+        self.balancer = LoadBalancer("api_gateway", endpoints_from_env("API_GATEWAY_URLS", self.base_url))
         # Create a long-lived internal service token so services can call
         # protected endpoints via the API Gateway. This token has role 'admin'
         # to allow internal operations like invoice generation. The token
@@ -105,7 +280,9 @@ class APIGatewayClient:
             data: Request data for POST/PUT
             headers: Additional headers
         """
-        url = f"{self.base_url}{service_path}"
+        endpoint = self.balancer.acquire()
+        url = f"{endpoint.url}{service_path}"
+        endpoint_ok = False
 
         request_headers = {"Content-Type": "application/json"}
         if headers:
@@ -130,6 +307,7 @@ class APIGatewayClient:
                 else:
                     raise ValueError(f"Unsupported HTTP method: {method}")
 
+                endpoint_ok = response.status_code < 500
                 response.raise_for_status()
                 return response.json()
 
@@ -139,6 +317,8 @@ class APIGatewayClient:
             raise HTTPException(status_code=e.response.status_code, detail=f"Service error: {e.response.text}")
         except Exception as e:
             raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
+        finally:
+            self.balancer.release(endpoint, endpoint_ok)
 
 # Global client instance
 api_gateway_client = APIGatewayClient()
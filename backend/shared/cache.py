@@ -1,25 +1,115 @@
 """
 Redis Cache Service
-Provides centralized caching functionality for all microservices
+Provides centralized caching functionality for all microservices.
+Async methods use a redis.asyncio connection pool so cache calls never block
+the event loop; the *_sync methods use a blocking client for threaded callers.
+Hot keys are also kept in a small in-process L1 that is invalidated across
+every worker through Redis pub/sub.
 """
 import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import inspect
+import functools
 import logging
+import threading
+from collections import OrderedDict
 import redis
-from typing import Any, Optional, Union
+import redis.asyncio as aioredis
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from datetime import timedelta
 import os
 
+from .cache_codec import cache_codec, CodecError
+
 logger = logging.getLogger(__name__)
 
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+# Idle connections are PINGed before reuse after this many seconds
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# In-process L1 for small, hot, rarely changing keys (matched by prefix)
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000"))
+CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", "60"))
+CACHE_L1_PREFIXES = [
+    prefix.strip()
+    for prefix in os.getenv("CACHE_L1_PREFIXES", "service:types,service:centers,parts:inventory,technicians:list,checklist:templates").split(",")
+    if prefix.strip()
+]
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+
+# Returned by acquire_lock when Redis cannot be reached, as opposed to None (lock held elsewhere)
+LOCK_UNAVAILABLE = object()
+
+class LocalCache:
+    """Thread-safe in-process LRU with per-entry expiry"""
+    
+    def __init__(self, max_entries: int = CACHE_L1_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
 class CacheService:
     """
-    Redis-based cache service with JSON serialization
+    Redis-based cache service; values are encoded by shared.cache_codec
     """
     
     def __init__(self):
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        self._async_client = None
+        self._async_loop = None
+        self.instance_id = uuid.uuid4().hex
+        self.local = LocalCache() if CACHE_L1_ENABLED else None
+        self.local_prefixes = tuple(CACHE_L1_PREFIXES)
+        self._pubsub_thread = None
+        self.codec = cache_codec
+        self.stats = {"l1_hits": 0, "l1_misses": 0, "l2_hits": 0, "l2_misses": 0, "l1_invalidations": 0}
         try:
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            self.redis_client = redis.from_url(
+                self.redis_url,
+                decode_responses=False,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+            )
             # Test connection
             self.redis_client.ping()
             self.enabled = True
@@ -28,22 +118,157 @@ class CacheService:
             logger.warning(f"Redis connection failed: {e}. Cache disabled.")
             self.enabled = False
             self.redis_client = None
+        
+        if self.enabled and self.local is not None:
+            self._start_invalidation_listener()
+    
+    # L1 tier and cross-process invalidation
+    
+    def _is_local(self, key: str) -> bool:
+        return self.local is not None and key.startswith(self.local_prefixes)
+    
+    def _start_invalidation_listener(self):
+        """Subscribe to invalidations from other workers on a daemon thread"""
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: self._on_invalidation})
+            self._pubsub_thread = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+            )
+        except Exception as e:
+            # Without the listener L1 could serve stale data indefinitely
+            logger.warning(f"Cache invalidation listener failed to start: {e}. L1 disabled.")
+            self.local = None
     
-    def _serialize(self, data: Any) -> str:
-        """Serialize data to JSON string"""
+    def _on_invalidation(self, message: Dict[str, Any]):
+        try:
+            payload = json.loads(message["data"])
+        except (json.JSONDecodeError, TypeError, KeyError):
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+        self.local.delete(payload.get("keys", []))
+        self.stats["l1_invalidations"] += 1
+    
+    def _on_listener_error(self, error: Exception, pubsub, thread):
+        # Messages may have been missed while disconnected, so drop everything
+        logger.warning(f"Cache invalidation listener error: {error}")
+        self.local.clear()
+        time.sleep(1.0)
+    
+    def _evict_local(self, keys: List[str]):
+        """Drop keys from this process's L1 and tell every other worker to do the same"""
+        keys = [key for key in keys if self._is_local(key)]
+        if not keys:
+            return
+        self.local.delete(keys)
+        try:
+            self.redis_client.publish(
+                CACHE_INVALIDATION_CHANNEL,
+                json.dumps({"origin": self.instance_id, "keys": keys})
+            )
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error: {e}")
+    
+    async def _evict_local_async(self, keys: List[str]):
+        keys = [key for key in keys if self._is_local(key)]
+        if not keys:
+            return
+        self.local.delete(keys)
+        try:
+            await self.async_client.publish(
+                CACHE_INVALIDATION_CHANNEL,
+                json.dumps({"origin": self.instance_id, "keys": keys})
+            )
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error: {e}")
+    
+    def _get_local(self, key: str) -> Optional[bytes]:
+        if not self._is_local(key):
+            return None
+        value = self.local.get(key)
+        self.stats["l1_hits" if value is not None else "l1_misses"] += 1
+        return value
+    
+    def _fill_local(self, key: str, value: bytes, ttl: Optional[int] = None):
+        if self._is_local(key):
+            self.local.set(key, value, min(ttl, CACHE_L1_TTL) if ttl else CACHE_L1_TTL)
+    
+    def _count_l2(self, hit: bool):
+        self.stats["l2_hits" if hit else "l2_misses"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rates per tier"""
+        l1_total = self.stats["l1_hits"] + self.stats["l1_misses"]
+        l2_total = self.stats["l2_hits"] + self.stats["l2_misses"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "codec": self.codec.describe(),
+            "l1_entries": len(self.local) if self.local is not None else 0,
+            "l1_hit_rate": (self.stats["l1_hits"] / l1_total) * 100 if l1_total else 0.0,
+            "l2_hit_rate": (self.stats["l2_hits"] / l2_total) * 100 if l2_total else 0.0,
+        }
+    
+    @property
+    def async_client(self) -> aioredis.Redis:
+        """
+        Async client backed by a connection pool. Connections belong to the
+        event loop that opened them, so a new pool is made if the loop changes.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            pool = aioredis.ConnectionPool.from_url(
+                self.redis_url,
+                decode_responses=False,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                retry_on_timeout=True
+            )
+            self._async_client = aioredis.Redis(connection_pool=pool)
+            self._async_loop = loop
+        return self._async_client
+    
+    def pipeline(self, transaction: bool = False):
+        """
+        Async pipeline for batching commands into one round-trip:
+        
+            async with cache_service.pipeline() as pipe:
+                pipe.get(a).get(b)
+                results = await pipe.execute()
+        """
+        return self.async_client.pipeline(transaction=transaction)
+    
+    async def ping(self) -> bool:
+        """Check the async pool can reach Redis"""
+        if not self.enabled:
+            return False
         try:
-            return json.dumps(data, default=str)
-        except (TypeError, ValueError) as e:
-            logger.error(f"Serialization error: {e}")
-            return str(data)
+            return bool(await self.async_client.ping())
+        except Exception as e:
+            logger.error(f"Cache ping error: {e}")
+            return False
+    
+    async def close(self):
+        """Release pooled async connections (call on application shutdown)"""
+        if self._async_client is not None:
+            await self._async_client.close(close_connection_pool=True)
+            self._async_client = None
+            self._async_loop = None
+    
+    def _serialize(self, data: Any) -> bytes:
+        """Encode a value with the configured codec (see cache_codec)"""
+        return self.codec.encode(data)
     
-    def _deserialize(self, data: str) -> Any:
-        """Deserialize JSON string to Python object"""
+    def _deserialize(self, data: bytes) -> Any:
+        """Decode a stored value; undecodable payloads are treated as a miss"""
         try:
-            return json.loads(data)
-        except (json.JSONDecodeError, TypeError) as e:
+            return self.codec.decode(data)
+        except CodecError as e:
             logger.error(f"Deserialization error: {e}")
-            return data
+            return None
     
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
@@ -51,16 +276,21 @@ class CacheService:
             return None
         
         try:
-            value = self.redis_client.get(key)
+            value = self._get_local(key)
             if value is None:
-                return None
+                value = await self.async_client.get(key)
+                self._count_l2(value is not None)
+                if value is None:
+                    return None
+                self._fill_local(key, value)
             return self._deserialize(value)
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {e}")
             return None
     
-    async def set(self, key: str, value: Any, ttl: Union[int, timedelta] = 3600) -> bool:
-        """Set value in cache with TTL"""
+    async def set(self, key: str, value: Any, ttl: Union[int, timedelta] = 3600,
+                  tags: Optional[Iterable[str]] = None) -> bool:
+        """Set value in cache with TTL, optionally linked to tags for invalidate_tags"""
         if not self.enabled:
             return False
         
@@ -69,7 +299,16 @@ class CacheService:
             if isinstance(ttl, timedelta):
                 ttl = int(ttl.total_seconds())
             
-            return self.redis_client.setex(key, ttl, serialized_value)
+            if tags:
+                async with self.async_client.pipeline(transaction=False) as pipe:
+                    pipe.setex(key, ttl, serialized_value)
+                    self._queue_tag_links(pipe, key, tags, ttl)
+                    result = bool((await pipe.execute())[0])
+            else:
+                result = bool(await self.async_client.setex(key, ttl, serialized_value))
+            await self._evict_local_async([key])
+            self._fill_local(key, serialized_value, ttl)
+            return result
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {e}")
             return False
@@ -80,18 +319,189 @@ class CacheService:
             return False
         
         try:
-            return bool(self.redis_client.delete(key))
+            result = bool(await self.async_client.delete(key))
+            await self._evict_local_async([key])
+            return result
+        except Exception as e:
+            logger.error(f"Cache delete error for key {key}: {e}")
+            return False
+    
+    def get_sync(self, key: str) -> Optional[Any]:
+        """Get value from cache; usable from synchronous routes and threads"""
+        if not self.enabled:
+            return None
+        
+        try:
+            value = self._get_local(key)
+            if value is None:
+                value = self.redis_client.get(key)
+                self._count_l2(value is not None)
+                if value is None:
+                    return None
+                self._fill_local(key, value)
+            return self._deserialize(value)
+        except Exception as e:
+            logger.error(f"Cache get error for key {key}: {e}")
+            return None
+    
+    def set_sync(self, key: str, value: Any, ttl: Union[int, timedelta] = 3600,
+                 tags: Optional[Iterable[str]] = None) -> bool:
+        """Set value in cache; usable from synchronous routes and threads"""
+        if not self.enabled:
+            return False
+        
+        try:
+            if isinstance(ttl, timedelta):
+                ttl = int(ttl.total_seconds())
+            serialized_value = self._serialize(value)
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, serialized_value)
+                self._queue_tag_links(pipe, key, tags or [], ttl)
+                result = bool(pipe.execute()[0])
+            self._evict_local([key])
+            self._fill_local(key, serialized_value, ttl)
+            return result
+        except Exception as e:
+            logger.error(f"Cache set error for key {key}: {e}")
+            return False
+    
+    def delete_sync(self, key: str) -> bool:
+        """Delete key from cache; usable from synchronous routes and threads"""
+        if not self.enabled:
+            return False
+        
+        try:
+            result = bool(self.redis_client.delete(key))
+            self._evict_local([key])
+            return result
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {e}")
             return False
     
+    # Bulk operations: one MGET or pipeline instead of a round-trip per key
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values for the keys that are cached; missing keys are left out"""
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled or not keys:
+            return {}
+        
+        found: Dict[str, bytes] = {}
+        remote_keys = []
+        for key in keys:
+            value = self._get_local(key)
+            if value is not None:
+                found[key] = value
+            else:
+                remote_keys.append(key)
+        
+        try:
+            if remote_keys:
+                values = await self.async_client.mget(remote_keys)
+                for key, value in zip(remote_keys, values):
+                    self._count_l2(value is not None)
+                    if value is not None:
+                        found[key] = value
+                        self._fill_local(key, value)
+        except Exception as e:
+            logger.error(f"Cache get_many error for {len(remote_keys)} keys: {e}")
+        
+        result = {}
+        for key, value in found.items():
+            decoded = self._deserialize(value)
+            if decoded is not None:
+                result[key] = decoded
+        return result
+    
+    async def set_many(self, items: Dict[str, Any], ttl: Union[int, timedelta] = 3600,
+                       ttls: Optional[Dict[str, Union[int, timedelta]]] = None,
+                       tags: Optional[Dict[str, Iterable[str]]] = None) -> bool:
+        """Set several values in one pipeline; ttls and tags are optional per-key overrides"""
+        if not self.enabled or not items:
+            return False
+        
+        ttls = ttls or {}
+        tags = tags or {}
+        try:
+            encoded = {}
+            async with self.async_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    key_ttl = ttls.get(key, ttl)
+                    if isinstance(key_ttl, timedelta):
+                        key_ttl = int(key_ttl.total_seconds())
+                    encoded[key] = (self._serialize(value), key_ttl)
+                    pipe.setex(key, key_ttl, encoded[key][0])
+                    self._queue_tag_links(pipe, key, tags.get(key, []), key_ttl)
+                await pipe.execute()
+            await self._evict_local_async(list(encoded))
+            for key, (value, key_ttl) in encoded.items():
+                self._fill_local(key, value, key_ttl)
+            return True
+        except Exception as e:
+            logger.error(f"Cache set_many error for {len(items)} keys: {e}")
+            return False
+    
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """Delete several keys with one DEL; returns how many existed"""
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled or not keys:
+            return 0
+        
+        try:
+            deleted = await self.async_client.delete(*keys)
+            await self._evict_local_async(keys)
+            return deleted
+        except Exception as e:
+            logger.error(f"Cache delete_many error for {len(keys)} keys: {e}")
+            return 0
+    
+    async def get_or_load_many(self, ids: Iterable[Any], key_pattern: str, loader: Callable,
+                               ttl: Union[int, timedelta] = 3600,
+                               tags_for: Optional[Callable[[Any, Any], Iterable[str]]] = None) -> Dict[Any, Any]:
+        """
+        Look up many entities by id: cached ones come from one MGET, and
+        loader(missing_ids) (sync or async) is called once for the rest and
+        must return {id: value}. Ids the loader does not return are omitted.
+        key_pattern is formatted with id=..., e.g. CacheKeys.CUSTOMER.
+        """
+        ids = [entity_id for entity_id in dict.fromkeys(ids) if entity_id is not None]
+        if not ids:
+            return {}
+        keys = {entity_id: key_pattern.format(id=entity_id) for entity_id in ids}
+        cached_values = await self.get_many(keys.values())
+        
+        result = {}
+        missing = []
+        for entity_id, key in keys.items():
+            if key in cached_values:
+                result[entity_id] = cached_values[key]
+            else:
+                missing.append(entity_id)
+        if not missing:
+            return result
+        
+        loaded = loader(missing)
+        if inspect.isawaitable(loaded):
+            loaded = await loaded
+        loaded = loaded or {}
+        result.update(loaded)
+        
+        if loaded:
+            await self.set_many(
+                {keys[entity_id]: value for entity_id, value in loaded.items() if entity_id in keys},
+                ttl,
+                tags={keys[entity_id]: tags_for(entity_id, value) for entity_id, value in loaded.items()
+                      if entity_id in keys} if tags_for else None
+            )
+        return result
+    
     async def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
         if not self.enabled:
             return False
         
         try:
-            return bool(self.redis_client.exists(key))
+            return bool(await self.async_client.exists(key))
         except Exception as e:
             logger.error(f"Cache exists error for key {key}: {e}")
             return False
@@ -102,7 +512,7 @@ class CacheService:
             return None
         
         try:
-            return self.redis_client.incrby(key, amount)
+            return await self.async_client.incrby(key, amount)
         except Exception as e:
             logger.error(f"Cache increment error for key {key}: {e}")
             return None
@@ -115,38 +525,303 @@ class CacheService:
         try:
             if isinstance(ttl, timedelta):
                 ttl = int(ttl.total_seconds())
-            return bool(self.redis_client.expire(key, ttl))
+            return bool(await self.async_client.expire(key, ttl))
         except Exception as e:
             logger.error(f"Cache expire error for key {key}: {e}")
             return False
+    
+    # Tag-based invalidation: each tag is a Redis set of the keys cached under it
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+    
+    def _queue_tag_links(self, pipe, key: str, tags: Iterable[str], ttl: int):
+        """Add key to each tag set; a set lives as long as its longest-lived member"""
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
+    
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Delete every key cached under any of the tags in two round-trips; returns
+        keys removed. The tag sets are read and deleted in one MULTI, so a key
+        tagged concurrently lands in a fresh set instead of losing its link.
+        """
+        tag_keys = [self._tag_key(tag) for tag in set(tags)]
+        if not self.enabled or not tag_keys:
+            return 0
+        
+        try:
+            async with self.async_client.pipeline(transaction=True) as pipe:
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                pipe.delete(*tag_keys)
+                members = (await pipe.execute())[:-1]
+            keys = sorted(key.decode("utf-8") for key in set().union(*members))
+            if keys:
+                await self.async_client.delete(*keys)
+            await self._evict_local_async(keys)
+            logger.debug(f"Invalidated {len(keys)} cache keys for tags {tag_keys}")
+            return len(keys)
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for {tag_keys}: {e}")
+            return 0
+    
+    def invalidate_tags_sync(self, tags: Iterable[str]) -> int:
+        tag_keys = [self._tag_key(tag) for tag in set(tags)]
+        if not self.enabled or not tag_keys:
+            return 0
+        
+        try:
+            # Read and drop the tag sets atomically (see invalidate_tags)
+            with self.redis_client.pipeline(transaction=True) as pipe:
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                pipe.delete(*tag_keys)
+                members = pipe.execute()[:-1]
+            keys = sorted(key.decode("utf-8") for key in set().union(*members))
+            if keys:
+                self.redis_client.delete(*keys)
+            self._evict_local(keys)
+            return len(keys)
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for {tag_keys}: {e}")
+            return 0
+    
+    # Short-lived distributed locks (SET NX with expiry, released only by their owner).
+    # acquire_lock returns a token, None (held elsewhere) or LOCK_UNAVAILABLE (Redis down).
+    
+    _RELEASE_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+    
+    async def acquire_lock(self, key: str, ttl: int = 10) -> Any:
+        """
+        Try to take a lock. Returns the owner token, None if it is held
+        elsewhere, or LOCK_UNAVAILABLE if Redis is disabled or failing (callers
+        should then go ahead without waiting for anyone).
+        """
+        if not self.enabled:
+            return LOCK_UNAVAILABLE
+        token = uuid.uuid4().hex
+        try:
+            if await self.async_client.set(f"lock:{key}", token, nx=True, ex=ttl):
+                return token
+        except Exception as e:
+            logger.error(f"Cache lock error for key {key}: {e}")
+            return LOCK_UNAVAILABLE
+        return None
+    
+    async def release_lock(self, key: str, token: str):
+        try:
+            await self.async_client.eval(self._RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+        except Exception as e:
+            logger.error(f"Cache unlock error for key {key}: {e}")
+    
+    def acquire_lock_sync(self, key: str, ttl: int = 10) -> Any:
+        if not self.enabled:
+            return LOCK_UNAVAILABLE
+        token = uuid.uuid4().hex
+        try:
+            if self.redis_client.set(f"lock:{key}", token, nx=True, ex=ttl):
+                return token
+        except Exception as e:
+            logger.error(f"Cache lock error for key {key}: {e}")
+            return LOCK_UNAVAILABLE
+        return None
+    
+    def release_lock_sync(self, key: str, token: str):
+        try:
+            self.redis_client.eval(self._RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+        except Exception as e:
+            logger.error(f"Cache unlock error for key {key}: {e}")
 
 # Global cache service instance
 cache_service = CacheService()
 
-# Cache decorator for functions
-def cached(ttl: Union[int, timedelta] = 3600, key_prefix: str = ""):
+# Arguments that never identify a result (sessions, requests, injected services)
+UNKEYED_ARGS = ("self", "cls", "db", "session", "request", "background_tasks", "current_user")
+# Request-scoped database sessions: closed once the request returns, so they cannot
+# be handed to a stale-while-revalidate refresh that runs afterwards
+SESSION_ARGS = ("db", "session")
+
+def make_cache_key(prefix: str, func: Callable, bound_args: Dict[str, Any], key_args: Optional[Sequence[str]] = None) -> str:
     """
-    Decorator to cache function results
+    Deterministic key from the declared key arguments: the same call gives
+    the same key in every process and across restarts.
     """
+    if key_args is None:
+        key_args = [name for name in bound_args if name not in UNKEYED_ARGS]
+    values = {name: bound_args.get(name) for name in key_args}
+    digest = hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:32]
+    return f"{prefix or 'cached'}:{func.__module__}.{func.__qualname__}:{digest}"
+
+# Keeps stale-while-revalidate refresh tasks referenced until they finish
+_background_refreshes = set()
+
+def _should_refresh_early(entry: Dict[str, Any], beta: float) -> bool:
+    """XFetch: recompute before expiry with a probability that rises as expiry nears"""
+    if beta <= 0:
+        return False
+    delta = entry.get("delta", 0.0)
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= entry["expires_at"]
+
+def cached(ttl: Union[int, timedelta] = 3600, key_prefix: str = "", key_args: Optional[Sequence[str]] = None,
+           stale_ttl: Union[int, timedelta] = 0, beta: float = 1.0, lock_timeout: int = 10):
+    """
+    Decorator to cache function results (sync or async).
+    
+    - key_args: argument names that identify the result; by default every
+      argument except sessions, requests and similar (see UNKEYED_ARGS)
+    - stale_ttl: seconds an expired value is still served while one caller
+      refreshes it in the background (stale-while-revalidate). The refresh
+      reuses the call's arguments after it has returned, so functions using
+      it must not take a db session; open one inside with get_db_context()
+    - beta: XFetch early-refresh aggressiveness; 0 disables it
+    - lock_timeout: on a cold miss only the lock holder computes the value and
+      others wait up to this long for it
+    """
+    if isinstance(ttl, timedelta):
+        ttl = int(ttl.total_seconds())
+    if isinstance(stale_ttl, timedelta):
+        stale_ttl = int(stale_ttl.total_seconds())
+    
     def decorator(func):
-        async def wrapper(*args, **kwargs):
-            # Generate cache key
-            cache_key = f"{key_prefix}:{func.__name__}:{hash(str(args) + str(kwargs))}"
+        signature = inspect.signature(func)
+        if stale_ttl and any(name in SESSION_ARGS for name in signature.parameters):
+            raise TypeError(
+                f"@cached(stale_ttl=...) on {func.__qualname__}: a background refresh cannot reuse a "
+                "request-scoped db session; open a session inside the function instead"
+            )
+        
+        def cache_key(args, kwargs) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return make_cache_key(key_prefix, func, bound.arguments, key_args)
+        
+        def make_entry(value: Any, started: float) -> Dict[str, Any]:
+            return {"value": value, "expires_at": time.time() + ttl, "delta": time.time() - started}
+        
+        def usable(entry: Any) -> bool:
+            return isinstance(entry, dict) and "expires_at" in entry
+        
+        if inspect.iscoroutinefunction(func):
+            async def compute(key, args, kwargs):
+                started = time.time()
+                result = await func(*args, **kwargs)
+                await cache_service.set(key, make_entry(result, started), ttl + stale_ttl)
+                return result
             
-            # Try to get from cache
-            cached_result = await cache_service.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit for {cache_key}")
-                return cached_result
+            async def refresh(key, args, kwargs):
+                token = await cache_service.acquire_lock(key, lock_timeout)
+                if token is None or token is LOCK_UNAVAILABLE:
+                    return
+                try:
+                    await compute(key, args, kwargs)
+                except Exception as e:
+                    logger.error(f"Background refresh failed for {key}: {e}")
+                finally:
+                    await cache_service.release_lock(key, token)
             
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            await cache_service.set(cache_key, result, ttl)
-            logger.debug(f"Cached result for {cache_key}")
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not cache_service.enabled:
+                    return await func(*args, **kwargs)
+                key = cache_key(args, kwargs)
+                
+                entry = await cache_service.get(key)
+                if usable(entry):
+                    if time.time() < entry["expires_at"] and not _should_refresh_early(entry, beta):
+                        logger.debug(f"Cache hit for {key}")
+                        return entry["value"]
+                    if stale_ttl:
+                        task = asyncio.create_task(refresh(key, args, kwargs))
+                        _background_refreshes.add(task)
+                        task.add_done_callback(_background_refreshes.discard)
+                        return entry["value"]
+                
+                token = await cache_service.acquire_lock(key, lock_timeout)
+                if token is LOCK_UNAVAILABLE:
+                    # Redis is failing: nobody can publish a result to wait for
+                    return await func(*args, **kwargs)
+                if token is None:
+                    # Someone else is computing it: wait for their result
+                    deadline = time.monotonic() + lock_timeout
+                    delay = 0.05
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, 0.5)
+                        entry = await cache_service.get(key)
+                        if usable(entry) and time.time() < entry["expires_at"]:
+                            return entry["value"]
+                    return await compute(key, args, kwargs)
+                try:
+                    return await compute(key, args, kwargs)
+                finally:
+                    await cache_service.release_lock(key, token)
             
+            return wrapper
+        
+        def compute_sync(key, args, kwargs):
+            started = time.time()
+            result = func(*args, **kwargs)
+            cache_service.set_sync(key, make_entry(result, started), ttl + stale_ttl)
             return result
         
-        return wrapper
+        def refresh_sync(key, args, kwargs, token):
+            try:
+                compute_sync(key, args, kwargs)
+            except Exception as e:
+                logger.error(f"Background refresh failed for {key}: {e}")
+            finally:
+                cache_service.release_lock_sync(key, token)
+        
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            if not cache_service.enabled:
+                return func(*args, **kwargs)
+            key = cache_key(args, kwargs)
+            
+            entry = cache_service.get_sync(key)
+            if usable(entry):
+                if time.time() < entry["expires_at"] and not _should_refresh_early(entry, beta):
+                    logger.debug(f"Cache hit for {key}")
+                    return entry["value"]
+                if stale_ttl:
+                    token = cache_service.acquire_lock_sync(key, lock_timeout)
+                    if token is not None and token is not LOCK_UNAVAILABLE:
+                        threading.Thread(
+                            target=refresh_sync, args=(key, args, kwargs, token), daemon=True
+                        ).start()
+                    return entry["value"]
+            
+            token = cache_service.acquire_lock_sync(key, lock_timeout)
+            if token is LOCK_UNAVAILABLE:
+                return func(*args, **kwargs)
+            if token is None:
+                deadline = time.monotonic() + lock_timeout
+                delay = 0.05
+                while time.monotonic() < deadline:
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.5)
+                    entry = cache_service.get_sync(key)
+                    if usable(entry) and time.time() < entry["expires_at"]:
+                        return entry["value"]
+                return compute_sync(key, args, kwargs)
+            try:
+                return compute_sync(key, args, kwargs)
+            finally:
+                cache_service.release_lock_sync(key, token)
+        
+        return sync_wrapper
     return decorator
 
 # Common cache keys
@@ -161,3 +836,60 @@ class CacheKeys:
     DASHBOARD_STATS = "dashboard:stats:{user_id}"
     CHAT_SESSIONS = "chat:sessions:{user_id}"
     NOTIFICATIONS = "notifications:{user_id}"
+    # Per-entity lookups used by get_or_load_many
+    CUSTOMER = "entity:customer:{id}"
+    VEHICLE = "entity:vehicle:{id}"
+    TECHNICIAN = "entity:technician:{id}"
+    # Reference data kept warm by shared.cache_warming
+    TECHNICIANS = "technicians:list"
+    CHECKLIST_TEMPLATES = "checklist:templates"
+
+class CacheTags:
+    """Tags linking cached entries to the entities they were built from"""
+    APPOINTMENT = "appointment:{id}"
+    CENTER = "center:{id}"
+    CUSTOMER = "customer:{id}"
+    TECHNICIAN = "technician:{id}"
+    VEHICLE = "vehicle:{id}"
+    INVOICE = "invoice:{id}"
+    USER = "user:{id}"
+    DATE = "date:{date}"
+    DASHBOARD = "dashboard"
+    PARTS = "parts"
+    SERVICE_TYPES = "service-types"
+    SERVICE_CENTERS = "service-centers"
+    TECHNICIANS = "technicians"
+    CHECKLISTS = "checklists"
+    
+    @classmethod
+    def for_appointment(cls, appointment) -> List[str]:
+        tags = [cls.APPOINTMENT.format(id=appointment.id), cls.DASHBOARD]
+        if appointment.service_center_id:
+            tags.append(cls.CENTER.format(id=appointment.service_center_id))
+        if appointment.customer_id:
+            tags.append(cls.CUSTOMER.format(id=appointment.customer_id))
+        if appointment.technician_id:
+            tags.append(cls.TECHNICIAN.format(id=appointment.technician_id))
+        if appointment.vehicle_id:
+            tags.append(cls.VEHICLE.format(id=appointment.vehicle_id))
+        if appointment.appointment_date:
+            tags.append(cls.DATE.format(date=appointment.appointment_date.date().isoformat()))
+        return tags
+    
+    @classmethod
+    def for_invoice(cls, invoice) -> List[str]:
+        tags = [cls.INVOICE.format(id=invoice.id), cls.DASHBOARD]
+        if invoice.customer_id:
+            tags.append(cls.CUSTOMER.format(id=invoice.customer_id))
+        if invoice.appointment_id:
+            tags.append(cls.APPOINTMENT.format(id=invoice.appointment_id))
+        if invoice.service_center_id:
+            tags.append(cls.CENTER.format(id=invoice.service_center_id))
+        return tags
+    
+    @classmethod
+    def for_vehicle(cls, vehicle) -> List[str]:
+        tags = [cls.VEHICLE.format(id=vehicle.id)]
+        if vehicle.customer_id:
+            tags.append(cls.CUSTOMER.format(id=vehicle.customer_id))
+        return tags
@@ -0,0 +1,246 @@
+"""
+Cache Payload Codecs
+Encodes cached values as msgpack (or tagged JSON when msgpack is not
+installed) so Decimal, UUID, date and datetime survive a round-trip, and
+compresses large payloads with zstd or lz4. Every payload carries a small
+header naming its format, so codecs can change without flushing Redis.
+"""
+import os
+import json
+import uuid
+import logging
+import threading
+from enum import Enum
+from decimal import Decimal
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+CACHE_CODEC = os.getenv("CACHE_CODEC", "msgpack")
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zstd")
+CACHE_COMPRESSION_THRESHOLD = int(os.getenv("CACHE_COMPRESSION_THRESHOLD", "1024"))
+CACHE_ZSTD_LEVEL = int(os.getenv("CACHE_ZSTD_LEVEL", "3"))
+
+# Header: magic, format version, codec id, compression id. 0xC1 is never
+# valid msgpack or UTF-8, so header-less legacy JSON values are detectable.
+MAGIC = 0xC1
+FORMAT_VERSION = 1
+HEADER_SIZE = 4
+
+CODEC_JSON = 1
+CODEC_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+COMPRESSION_LZ4 = 2
+
+# msgpack extension type codes
+EXT_DECIMAL = 1
+EXT_UUID = 2
+EXT_DATETIME = 3
+EXT_DATE = 4
+
+
+class CodecError(Exception):
+    """A cached payload could not be decoded"""
+
+
+def _fallback(obj: Any) -> Any:
+    """Values with no typed encoding are stored like json.dumps(default=str) did"""
+    if isinstance(obj, Enum):
+        return obj.value
+    return str(obj)
+
+
+# msgpack
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode("ascii"))
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(EXT_UUID, obj.bytes)
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode("ascii"))
+    if isinstance(obj, date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode("ascii"))
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return _fallback(obj)
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode("ascii"))
+    if code == EXT_UUID:
+        return uuid.UUID(bytes=data)
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode("ascii"))
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode("ascii"))
+    return msgpack.ExtType(code, data)
+
+
+def _msgpack_encode(value: Any) -> bytes:
+    return msgpack.packb(value, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+
+def _msgpack_decode(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+
+
+# Tagged JSON: same types, as {"__type__": ..., "value": ...} objects
+
+_JSON_TYPES: Dict[str, Callable[[str], Any]] = {
+    "decimal": Decimal,
+    "uuid": uuid.UUID,
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+}
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return {"__type__": "decimal", "value": str(obj)}
+    if isinstance(obj, uuid.UUID):
+        return {"__type__": "uuid", "value": str(obj)}
+    if isinstance(obj, datetime):
+        return {"__type__": "datetime", "value": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"__type__": "date", "value": obj.isoformat()}
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return _fallback(obj)
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    type_name = obj.get("__type__")
+    if type_name in _JSON_TYPES and len(obj) == 2 and "value" in obj:
+        return _JSON_TYPES[type_name](obj["value"])
+    return obj
+
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _json_decode(data: bytes) -> Any:
+    return json.loads(data, object_hook=_json_object_hook)
+
+
+CODECS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    CODEC_JSON: (_json_encode, _json_decode),
+}
+if msgpack is not None:
+    CODECS[CODEC_MSGPACK] = (_msgpack_encode, _msgpack_decode)
+
+
+# zstd (de)compressor objects are not thread-safe; the event loop, threadpool
+# routes and the invalidation listener each get their own
+_zstd_local = threading.local()
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=CACHE_ZSTD_LEVEL)
+    return compressor.compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    # Frames written by compress() carry their content size, so decompress() can size its buffer
+    return decompressor.decompress(data)
+
+
+def _compressors() -> Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    available = {}
+    if zstandard is not None:
+        available[COMPRESSION_ZSTD] = (_zstd_compress, _zstd_decompress)
+    if lz4_frame is not None:
+        available[COMPRESSION_LZ4] = (lz4_frame.compress, lz4_frame.decompress)
+    return available
+
+
+COMPRESSORS = _compressors()
+
+
+class CacheCodec:
+    """Encodes values for Redis and decodes any format this or an older version wrote"""
+
+    def __init__(self, codec: str = CACHE_CODEC, compression: str = CACHE_COMPRESSION,
+                 threshold: int = CACHE_COMPRESSION_THRESHOLD):
+        self.codec_id = CODEC_MSGPACK if codec == "msgpack" else CODEC_JSON
+        if self.codec_id not in CODECS:
+            logger.warning("msgpack is not installed; caching with tagged JSON")
+            self.codec_id = CODEC_JSON
+
+        self.compression_id = {"zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4}.get(compression, COMPRESSION_NONE)
+        if self.compression_id != COMPRESSION_NONE and self.compression_id not in COMPRESSORS:
+            logger.warning(f"{compression} is not installed; cached payloads will not be compressed")
+            self.compression_id = COMPRESSION_NONE
+        self.threshold = threshold
+
+    def encode(self, value: Any) -> bytes:
+        body = CODECS[self.codec_id][0](value)
+        compression_id = COMPRESSION_NONE
+        if self.compression_id != COMPRESSION_NONE and len(body) >= self.threshold:
+            compressed = COMPRESSORS[self.compression_id][0](body)
+            if len(compressed) < len(body):
+                body, compression_id = compressed, self.compression_id
+        return bytes((MAGIC, FORMAT_VERSION, self.codec_id, compression_id)) + body
+
+    def decode(self, data: bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data or data[0] != MAGIC:
+            # Written before the codec layer (plain JSON) or by a raw Redis command such as INCRBY
+            try:
+                return json.loads(data)
+            except ValueError as e:
+                raise CodecError(f"Unrecognised cache payload: {e}")
+
+        if len(data) < HEADER_SIZE or data[1] != FORMAT_VERSION:
+            raise CodecError(f"Unsupported cache payload version {data[1] if len(data) > 1 else None}")
+        codec_id, compression_id = data[2], data[3]
+        if codec_id not in CODECS:
+            raise CodecError(f"Cache payload codec {codec_id} is not available")
+
+        body = data[HEADER_SIZE:]
+        try:
+            if compression_id != COMPRESSION_NONE:
+                if compression_id not in COMPRESSORS:
+                    raise CodecError(f"Cache payload compression {compression_id} is not available")
+                body = COMPRESSORS[compression_id][1](body)
+            return CODECS[codec_id][1](body)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f"Corrupt cache payload: {e}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "codec": "msgpack" if self.codec_id == CODEC_MSGPACK else "json",
+            "compression": {COMPRESSION_ZSTD: "zstd", COMPRESSION_LZ4: "lz4"}.get(self.compression_id, "none"),
+            "compression_threshold": self.threshold,
+        }
+
+
+cache_codec = CacheCodec()
@@ -0,0 +1,183 @@
+"""
+Cache Warming
+Lets a service register loaders for its reference data (service types,
+centers, parts, ...), loads them all concurrently at startup so the first
+requests after a deploy do not hit Postgres, and refreshes each entry in the
+background before its TTL runs out.
+"""
+import os
+import time
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache import cache_service
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CACHE_WARM_TIMEOUT = float(os.getenv("CACHE_WARM_TIMEOUT", "30"))
+# Refresh once this fraction of an entry's TTL has elapsed
+CACHE_REFRESH_AHEAD = float(os.getenv("CACHE_REFRESH_AHEAD", "0.8"))
+CACHE_REFRESH_CHECK_INTERVAL = float(os.getenv("CACHE_REFRESH_CHECK_INTERVAL", "5"))
+
+
+@dataclass
+class WarmEntry:
+    """One registered reference-data loader"""
+    name: str
+    key: str
+    loader: Callable[[], Any]
+    ttl: int
+    tags: List[str] = field(default_factory=list)
+    loaded_at: float = 0.0
+    load_time: float = 0.0
+    loads: int = 0
+    failures: int = 0
+    last_error: Optional[str] = None
+
+    @property
+    def refresh_due(self) -> bool:
+        return time.time() - self.loaded_at >= self.ttl * CACHE_REFRESH_AHEAD
+
+
+def model_to_dict(obj) -> Dict[str, Any]:
+    """Column values of an ORM row, cacheable and valid input for any response schema"""
+    return {column.name: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+class CacheWarmer:
+    """
+    Registry of warmable cache entries. Loaders take no arguments and may be
+    sync (run in a worker thread, e.g. a DB query using get_db_context) or
+    async.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, WarmEntry] = {}
+        self.warmed = False
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Concurrent misses of one entry (e.g. right after invalidation) share a single load
+        self._flight = SingleFlight("cache_warming")
+    
+    @property
+    def ready(self) -> bool:
+        """Startup warm-up has run and every entry has loaded at least once"""
+        return self.warmed and all(entry.loaded_at for entry in self.entries.values())
+    
+    @property
+    def failed(self) -> List[str]:
+        """Entries whose latest load failed"""
+        return [name for name, entry in self.entries.items() if entry.last_error is not None]
+
+    def register(self, name: str, key: str, loader: Callable[[], Any], ttl: int = 300,
+                 tags: Optional[List[str]] = None):
+        self.entries[name] = WarmEntry(name=name, key=key, loader=loader, ttl=ttl, tags=list(tags or []))
+
+    def loader(self, name: str, key: str, ttl: int = 300, tags: Optional[List[str]] = None):
+        """Decorator form of register()"""
+        def decorator(func):
+            self.register(name, key, func, ttl, tags)
+            return func
+        return decorator
+
+    async def _call_loader(self, entry: WarmEntry) -> Any:
+        if inspect.iscoroutinefunction(entry.loader):
+            return await entry.loader()
+        return await asyncio.to_thread(entry.loader)
+
+    async def load(self, name: str) -> Any:
+        """Run one loader and store its result"""
+        entry = self.entries[name]
+        started = time.perf_counter()
+        try:
+            value = await self._call_loader(entry)
+        except Exception as e:
+            entry.failures += 1
+            entry.last_error = str(e)
+            logger.error(f"Cache warm loader {name} failed: {e}")
+            raise
+        await cache_service.set(entry.key, value, entry.ttl, tags=entry.tags)
+        entry.loaded_at = time.time()
+        entry.load_time = time.perf_counter() - started
+        entry.loads += 1
+        entry.last_error = None
+        return value
+
+    async def get(self, name: str) -> Any:
+        """Read a warmed entry, loading it on a miss (e.g. right after invalidation)"""
+        entry = self.entries[name]
+        value = await cache_service.get(entry.key)
+        if value is not None:
+            return value
+        return await self._flight.do(name, lambda: self.load(name))
+
+    async def warm_all(self, timeout: float = CACHE_WARM_TIMEOUT):
+        """
+        Run every loader concurrently. Failed or timed-out entries are retried
+        by the refresh loop, and the warmer only reports ready once they load.
+        """
+        if self.entries:
+            started = time.perf_counter()
+            tasks = [asyncio.create_task(self.load(name)) for name in self.entries]
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            for name, task in zip(self.entries, tasks):
+                if task in pending:
+                    self.entries[name].last_error = f"timed out after {timeout}s"
+            failed = sum(1 for task in done if task.exception() is not None) + len(pending)
+            logger.info(
+                "Cache warm-up finished in %.2fs (%d loaders, %d failed)",
+                time.perf_counter() - started, len(tasks), failed
+            )
+        self.warmed = True
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(CACHE_REFRESH_CHECK_INTERVAL)
+            due = [name for name, entry in self.entries.items() if entry.refresh_due]
+            if due:
+                await asyncio.gather(
+                    *(self._flight.do(name, lambda name=name: self.load(name)) for name in due),
+                    return_exceptions=True
+                )
+
+    async def start(self):
+        """Warm everything, then keep entries fresh in the background (call from startup)"""
+        await self.warm_all()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "failed": self.failed,
+            "entries": {
+                name: {
+                    "key": entry.key,
+                    "ttl": entry.ttl,
+                    "age": round(time.time() - entry.loaded_at, 1) if entry.loaded_at else None,
+                    "load_time": round(entry.load_time, 4),
+                    "loads": entry.loads,
+                    "failures": entry.failures,
+                    "last_error": entry.last_error,
+                }
+                for name, entry in self.entries.items()
+            },
+        }
+
+
+# Global cache warmer instance
+cache_warmer = CacheWarmer()
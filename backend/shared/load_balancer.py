@@ -0,0 +1,179 @@
+"""
+Replica-aware Load Balancing
+Spreads calls to a service across several endpoints using power-of-two-choices
+or least-outstanding-requests selection. Endpoints whose calls keep failing
+are ejected with growing backoff until it runs out; endpoints failing their
+/health probe are out of rotation until a probe passes again.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+LB_STRATEGY = os.getenv("LB_STRATEGY", "p2c")
+LB_EJECT_AFTER_FAILURES = int(os.getenv("LB_EJECT_AFTER_FAILURES", "3"))
+LB_EJECT_SECONDS = float(os.getenv("LB_EJECT_SECONDS", "30"))
+LB_MAX_EJECT_SECONDS = float(os.getenv("LB_MAX_EJECT_SECONDS", "300"))
+LB_HEALTH_INTERVAL = float(os.getenv("LB_HEALTH_INTERVAL", "10"))
+LB_HEALTH_TIMEOUT = float(os.getenv("LB_HEALTH_TIMEOUT", "2"))
+LB_HEALTH_PATH = os.getenv("LB_HEALTH_PATH", "/health")
+
+
+def parse_endpoints(value: Optional[str]) -> List[str]:
+    """Split a comma-separated endpoint list, dropping blanks and trailing slashes"""
+    if not value:
+        return []
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+def endpoints_from_env(name: str, default: str) -> List[str]:
+    """Endpoints from a list variable (e.g. PAYMENT_SERVICE_URLS), else the single default URL"""
+    return parse_endpoints(os.getenv(name)) or parse_endpoints(default)
+
+
+@dataclass
+class Endpoint:
+    """One replica of a service and its live state"""
+    url: str
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    healthy: bool = True
+    requests_total: int = 0
+    failures_total: int = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+
+class LoadBalancer:
+    """
+    Picks an endpoint per call. Callers bracket each call with acquire() and
+    release() so outstanding counts and failure streaks stay accurate.
+    """
+
+    def __init__(self, name: str, urls: List[str], strategy: str = LB_STRATEGY):
+        if not urls:
+            raise ValueError(f"No endpoints configured for {name}")
+        self.name = name
+        self.strategy = strategy
+        self.endpoints = [Endpoint(url.rstrip("/")) for url in urls]
+        self._lock = threading.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+
+    def pick(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        """Choose an endpoint, avoiding `exclude` (e.g. the one a retry just failed on)"""
+        now = time.monotonic()
+        candidates = [ep for ep in self.endpoints if ep.available(now)]
+        if exclude is not None and len(candidates) > 1:
+            candidates = [ep for ep in candidates if ep is not exclude]
+        if not candidates:
+            # Every replica looks bad: spread load over all of them rather than failing outright
+            candidates = self.endpoints
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == "least_outstanding":
+            return min(candidates, key=lambda ep: (ep.outstanding, ep.consecutive_failures))
+        first, second = random.sample(candidates, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+    def acquire(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        with self._lock:
+            endpoint = self.pick(exclude)
+            endpoint.outstanding += 1
+            endpoint.requests_total += 1
+        return endpoint
+
+    def release(self, endpoint: Endpoint, success: bool = True):
+        """Finish a call; repeated failures eject the endpoint with growing backoff"""
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if success:
+                endpoint.consecutive_failures = 0
+                return
+            endpoint.failures_total += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= LB_EJECT_AFTER_FAILURES and len(self.endpoints) > 1:
+                self._eject(endpoint)
+
+    def _eject(self, endpoint: Endpoint):
+        now = time.monotonic()
+        if endpoint.ejected_until and now - endpoint.ejected_until > LB_MAX_EJECT_SECONDS:
+            # Served without ejection for a while since the last one: start the backoff over
+            endpoint.ejections = 0
+        duration = min(LB_MAX_EJECT_SECONDS, LB_EJECT_SECONDS * (2 ** endpoint.ejections))
+        endpoint.ejections += 1
+        endpoint.consecutive_failures = 0
+        endpoint.ejected_until = now + duration
+        logger.warning("Ejected %s endpoint %s for %.0fs", self.name, endpoint.url, duration)
+
+    def target_url(self, endpoint: Endpoint, path: str) -> str:
+        return f"{endpoint.url}/{path.lstrip('/')}"
+
+    async def probe(self, client: httpx.AsyncClient):
+        """Check every endpoint's health URL once and update its state"""
+        for endpoint in self.endpoints:
+            try:
+                response = await client.get(endpoint.url + LB_HEALTH_PATH, timeout=LB_HEALTH_TIMEOUT)
+                healthy = response.status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            with self._lock:
+                if healthy and not endpoint.healthy:
+                    logger.info("%s endpoint %s recovered", self.name, endpoint.url)
+                elif not healthy and endpoint.healthy:
+                    logger.warning("%s endpoint %s failed its health check", self.name, endpoint.url)
+                # Probes only decide `healthy`: a replica can pass /health while its
+                # real calls fail, so passive ejections always run out their backoff
+                endpoint.healthy = healthy
+
+    async def _health_loop(self, client: httpx.AsyncClient, interval: float):
+        while True:
+            try:
+                await self.probe(client)
+            except Exception as e:
+                logger.error(f"Health probe for {self.name} failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start_health_checks(self, client: httpx.AsyncClient, interval: float = LB_HEALTH_INTERVAL):
+        """Probe endpoints in the background; only useful with more than one replica"""
+        if len(self.endpoints) < 2 or self._health_task is not None:
+            return
+        self._health_task = asyncio.create_task(self._health_loop(client, interval))
+
+    async def stop_health_checks(self):
+        if self._health_task is None:
+            return
+        self._health_task.cancel()
+        try:
+            await self._health_task
+        except asyncio.CancelledError:
+            pass
+        self._health_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "endpoints": [
+                {
+                    "url": ep.url,
+                    "available": ep.available(now),
+                    "healthy": ep.healthy,
+                    "outstanding": ep.outstanding,
+                    "requests_total": ep.requests_total,
+                    "failures_total": ep.failures_total,
+                    "ejected_for": round(max(0.0, ep.ejected_until - now), 1),
+                }
+                for ep in self.endpoints
+            ],
+        }
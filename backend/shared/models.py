@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, DECIMAL, Date, Time, Enum, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, DECIMAL, Date, Time, Enum, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -204,6 +204,13 @@ class Appointment(Base):
     service_center = relationship("ServiceCenter", back_populates="appointments")
     service_type = relationship("ServiceType", back_populates="appointments")
     technician = relationship("Technician", back_populates="appointments")
+    
+    # Match the dashboard, queue, report and analytics filters (date ranges are half-open, see shared.database.date_range)
+    __table_args__ = (
+        Index("ix_appointments_status_date", "status", "appointment_date"),
+        Index("ix_appointments_technician_date", "technician_id", "appointment_date"),
+        Index("ix_appointments_center_status", "service_center_id", "status"),
+    )
 
 class ServiceRecord(Base):
     __tablename__ = "service_records"
@@ -223,6 +230,10 @@ class ServiceRecord(Base):
     next_service_date = Column(Date)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_service_records_service_date", "service_date"),
+    )
 
 class Part(Base):
     __tablename__ = "parts"
@@ -262,6 +273,10 @@ class Invoice(Base):
     notes = Column(Text)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_invoices_payment_status_due_date", "payment_status", "due_date"),
+    )
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -291,6 +306,11 @@ class Notification(Base):
     scheduled_date = Column(DateTime)
     sent_date = Column(DateTime)
     created_at = Column(DateTime, default=func.now())
+    
+    # Inbox listing and unread counts
+    __table_args__ = (
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+    )
 
 class ServiceChecklist(Base):
     __tablename__ = "service_checklists"
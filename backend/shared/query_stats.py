@@ -0,0 +1,235 @@
+"""
+Query Instrumentation
+Counts SQL statements and database time per request from engine events and
+flags statements repeated with the same shape within one request (the N+1
+pattern). Results go to structured logs and /metrics, and to response
+headers when debug headers are enabled.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", os.getenv("DEBUG", "false")).lower() in ("1", "true", "yes")
+# A shape executed this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# Requests issuing at least this many statements are logged even without N+1
+QUERY_LOG_MIN_STATEMENTS = int(os.getenv("QUERY_LOG_MIN_STATEMENTS", "30"))
+QUERY_TOP_OFFENDERS = int(os.getenv("QUERY_TOP_OFFENDERS", "20"))
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|\?|(?<!:):\w+")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with literals, parameters and IN lists collapsed, so repeats of one query compare equal"""
+    shape = _STRING.sub("?", statement)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+@dataclass
+class RequestQueryStats:
+    """Statements issued while serving one request"""
+    method: str
+    path: str
+    scope: Optional[Dict[str, Any]] = None
+    statements: int = 0
+    db_time: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    @property
+    def endpoint(self) -> str:
+        """Route template once routing has matched (so metrics are not split per id), else the raw path"""
+        route = self.scope.get("route") if self.scope else None
+        if route is not None and getattr(route, "path", None):
+            return f"{self.method} {route.path}"
+        return f"{self.method} {self.path}"
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.db_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[tuple]:
+        """(shape, count) pairs that look like N+1, most repeated first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def current_query_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+# Called as observer(conn, statement, parameters, elapsed, stats) after every statement
+_statement_observers: List[Callable] = []
+
+
+def add_statement_observer(observer: Callable):
+    """Register a callback for every executed statement (e.g. the slow-query log)"""
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start_time")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for observer in _statement_observers:
+        try:
+            observer(conn, statement, parameters, elapsed, stats)
+        except Exception as e:
+            logger.error(f"Statement observer failed: {e}")
+
+
+def instrument_engine(engine):
+    """Attach the statement counters to a sync engine (use async_engine.sync_engine for async ones)"""
+    if not QUERY_STATS_ENABLED or event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@dataclass
+class EndpointQueryMetrics:
+    """Running totals for one endpoint"""
+    requests: int = 0
+    statements: int = 0
+    db_time: float = 0.0
+    max_statements: int = 0
+    n_plus_one: int = 0
+
+
+class QueryMetrics:
+    """Process-wide aggregates of per-request query stats"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointQueryMetrics] = {}
+        self.offenders: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, stats: RequestQueryStats, repeated: List[tuple]):
+        with self._lock:
+            metrics = self.endpoints.setdefault(stats.endpoint, EndpointQueryMetrics())
+            metrics.requests += 1
+            metrics.statements += stats.statements
+            metrics.db_time += stats.db_time
+            metrics.max_statements = max(metrics.max_statements, stats.statements)
+            if repeated:
+                metrics.n_plus_one += 1
+                for shape, count in repeated:
+                    self.offenders[(stats.endpoint, shape)] += count
+                # Keep the offender table bounded
+                if len(self.offenders) > QUERY_TOP_OFFENDERS * 5:
+                    self.offenders = Counter(dict(self.offenders.most_common(QUERY_TOP_OFFENDERS)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: {
+                        "requests": m.requests,
+                        "avg_statements": round(m.statements / m.requests, 2) if m.requests else 0,
+                        "max_statements": m.max_statements,
+                        "avg_db_time_ms": round(m.db_time / m.requests * 1000, 2) if m.requests else 0,
+                        "n_plus_one_requests": m.n_plus_one,
+                    }
+                    for endpoint, m in self.endpoints.items()
+                },
+                "top_n_plus_one": [
+                    {"endpoint": endpoint, "shape": shape, "executions": count}
+                    for (endpoint, shape), count in self.offenders.most_common(QUERY_TOP_OFFENDERS)
+                ],
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition of the per-endpoint totals"""
+        lines = [
+            "# TYPE db_requests_total counter",
+            "# TYPE db_statements_total counter",
+            "# TYPE db_time_seconds_total counter",
+            "# TYPE db_n_plus_one_requests_total counter",
+            "# TYPE db_max_statements_per_request gauge",
+        ]
+        with self._lock:
+            for endpoint, m in sorted(self.endpoints.items()):
+                label = '{endpoint="%s"}' % endpoint.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f"db_requests_total{label} {m.requests}")
+                lines.append(f"db_statements_total{label} {m.statements}")
+                lines.append(f"db_time_seconds_total{label} {m.db_time:.6f}")
+                lines.append(f"db_n_plus_one_requests_total{label} {m.n_plus_one}")
+                lines.append(f"db_max_statements_per_request{label} {m.max_statements}")
+        return "\n".join(lines) + "\n"
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """Collects RequestQueryStats for each request and reports them when it finishes"""
+
+    async def dispatch(self, request: Request, call_next):
+        if not QUERY_STATS_ENABLED:
+            return await call_next(request)
+
+        # The router records the matched route in this same scope dict
+        stats = RequestQueryStats(method=request.method, path=request.url.path, scope=request.scope)
+        token = _current_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            _current_stats.reset(token)
+
+        if stats.statements == 0:
+            return response
+
+        repeated = stats.repeated()
+        query_metrics.record(stats, repeated)
+
+        if QUERY_DEBUG_HEADERS:
+            response.headers["X-DB-Query-Count"] = str(stats.statements)
+            response.headers["X-DB-Time-Ms"] = f"{stats.db_time * 1000:.2f}"
+            response.headers["X-DB-N-Plus-One"] = str(len(repeated))
+
+        if repeated:
+            shape, count = repeated[0]
+            logger.warning(
+                "Possible N+1 on %s: %d statements in %.1fms; %d repeated shapes, worst x%d: %s",
+                stats.endpoint, stats.statements, stats.db_time * 1000, len(repeated), count, shape[:300],
+                extra={"endpoint": stats.endpoint, "statements": stats.statements, "duration": stats.db_time}
+            )
+        elif stats.statements >= QUERY_LOG_MIN_STATEMENTS:
+            logger.info(
+                "%s issued %d statements in %.1fms",
+                stats.endpoint, stats.statements, stats.db_time * 1000,
+                extra={"endpoint": stats.endpoint, "statements": stats.statements, "duration": stats.db_time}
+            )
+        return response
+
+
+# Global query metrics instance
+query_metrics = QueryMetrics()
@@ -0,0 +1,77 @@
+"""
+Single-flight Request Coalescing
+Lets concurrent callers asking for the same key share one in-flight call
+instead of each running it, and tracks how many calls were deduplicated.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls by key. The first caller (the leader)
+    runs the function; callers arriving while it is in flight (followers)
+    await the same result or exception.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func once for every concurrent caller sharing key"""
+        future = self._calls.get(key)
+        if future is not None:
+            self.followers += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: run the call again
+                if future.cancelled():
+                    return await self.do(key, func)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def get_dedup_ratio(self) -> float:
+        """Percentage of calls that were served by another caller's request"""
+        total = self.leaders + self.followers
+        if total == 0:
+            return 0.0
+        return (self.followers / total) * 100
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": self.in_flight,
+            "dedup_ratio": self.get_dedup_ratio(),
+        }
@@ -0,0 +1,177 @@
+"""
+Slow Query Log
+Records statements slower than a threshold by SQL shape, with bind-parameter
+types, durations and the endpoints that issued them, and keeps a ranked
+top-N in memory. A sampled subset of slow SELECTs is re-run under
+EXPLAIN (ANALYZE, BUFFERS) in the background so the plan sits next to the
+timing.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .query_stats import add_statement_observer, statement_shape
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_ENABLED = os.getenv("SLOW_QUERY_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "50"))
+# Fraction of slow SELECTs to EXPLAIN; 0 disables plan capture
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0"))
+SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv("SLOW_QUERY_EXPLAIN_ANALYZE", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+
+
+def parameter_types(parameters: Any) -> Any:
+    """Type names of the bind parameters (never their values)"""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany: the first row is representative
+        parameters = parameters[0]
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def _explainable(statement: str) -> bool:
+    """Only plain reads: ANALYZE executes the statement, and FOR UPDATE would take locks"""
+    head = statement.lstrip().upper()
+    return (head.startswith("SELECT") or head.startswith("WITH")) and "FOR UPDATE" not in head and "FOR SHARE" not in head
+
+
+@dataclass
+class SlowQuery:
+    """Aggregated slow executions of one statement shape"""
+    shape: str
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    last_seen: float = 0.0
+    parameter_types: Any = None
+    endpoints: Counter = field(default_factory=Counter)
+    plan: Any = None
+    plan_captured_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "shape": self.shape,
+            "count": self.count,
+            "total_ms": round(self.total_time * 1000, 2),
+            "avg_ms": round(self.total_time / self.count * 1000, 2) if self.count else 0,
+            "max_ms": round(self.max_time * 1000, 2),
+            "last_seen": self.last_seen,
+            "parameter_types": self.parameter_types,
+            "endpoints": dict(self.endpoints.most_common(5)),
+            "plan": self.plan,
+            "plan_captured_at": self.plan_captured_at,
+        }
+
+
+class SlowQueryLog:
+    """In-memory ranking of slow statement shapes for this process"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, top_n: int = SLOW_QUERY_TOP_N):
+        self.threshold = threshold_ms / 1000
+        self.top_n = top_n
+        self.queries: Dict[str, SlowQuery] = {}
+        self._lock = threading.Lock()
+        # One EXPLAIN at a time; samples arriving while it runs are skipped
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        self._explaining = threading.Event()
+
+    def observe(self, conn, statement: str, parameters: Any, elapsed: float, stats=None):
+        if not SLOW_QUERY_ENABLED or elapsed < self.threshold or statement.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        shape = statement_shape(statement)
+        endpoint = stats.endpoint if stats is not None else "background"
+        with self._lock:
+            entry = self.queries.get(shape)
+            if entry is None:
+                entry = self.queries[shape] = SlowQuery(shape=shape)
+            entry.count += 1
+            entry.total_time += elapsed
+            entry.max_time = max(entry.max_time, elapsed)
+            entry.last_seen = time.time()
+            entry.parameter_types = parameter_types(parameters)
+            entry.endpoints[endpoint] += 1
+            self._trim()
+
+        logger.warning(
+            "Slow query (%.1fms) from %s: %s", elapsed * 1000, endpoint, shape[:500],
+            extra={"endpoint": endpoint, "duration": elapsed}
+        )
+        if self._should_explain(conn, statement):
+            self._explaining.set()
+            self._explainer.submit(self._capture_plan, conn.engine, shape, statement, parameters)
+
+    def _trim(self):
+        """Keep a few times top_n shapes, dropping those with the least total time"""
+        if len(self.queries) <= self.top_n * 4:
+            return
+        ranked = sorted(self.queries.values(), key=lambda q: q.total_time, reverse=True)
+        self.queries = {q.shape: q for q in ranked[:self.top_n * 2]}
+
+    def _should_explain(self, conn, statement: str) -> bool:
+        return (
+            SLOW_QUERY_EXPLAIN_SAMPLE_RATE > 0
+            and not self._explaining.is_set()
+            and conn.dialect.name == "postgresql"
+            and not conn.dialect.is_async
+            and _explainable(statement)
+            and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        )
+
+    def _capture_plan(self, engine, shape: str, statement: str, parameters: Any):
+        """Re-run the statement under EXPLAIN on a separate connection; the transaction is rolled back"""
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if SLOW_QUERY_EXPLAIN_ANALYZE else "FORMAT JSON"
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                plan = conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters).scalar()
+                conn.rollback()
+            with self._lock:
+                entry = self.queries.get(shape)
+                if entry is not None:
+                    entry.plan = plan
+                    entry.plan_captured_at = time.time()
+        except Exception as e:
+            logger.error(f"EXPLAIN capture failed for slow query: {e}")
+        finally:
+            self._explaining.clear()
+
+    def top(self, limit: Optional[int] = None, order_by: str = "total") -> List[Dict[str, Any]]:
+        """Slow shapes ranked by total, max, avg time or count"""
+        keys = {
+            "total": lambda q: q.total_time,
+            "max": lambda q: q.max_time,
+            "avg": lambda q: q.total_time / q.count if q.count else 0,
+            "count": lambda q: q.count,
+        }
+        with self._lock:
+            ranked = sorted(self.queries.values(), key=keys.get(order_by, keys["total"]), reverse=True)
+            return [q.to_dict() for q in ranked[:limit or self.top_n]]
+
+    def reset(self):
+        with self._lock:
+            self.queries.clear()
+
+    def get_stats(self, limit: Optional[int] = None, order_by: str = "total") -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "explain_sample_rate": SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+            "tracked_shapes": len(self.queries),
+            "queries": self.top(limit, order_by),
+        }
+
+
+# Global slow query log, fed by every instrumented engine
+slow_query_log = SlowQueryLog()
+add_statement_observer(slow_query_log.observe)
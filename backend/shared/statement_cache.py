@@ -0,0 +1,137 @@
+"""
+Statement Cache
+Registry of the hottest point lookups (customer/technician by user_id,
+service type and invoice by id), built once at import with bind parameters.
+Reusing the same select() object means its cache key is computed once and
+every call hits the engine's compiled-SQL cache, instead of rebuilding and
+re-hashing a Query per request. Column lookups return plain Rows rather
+than ORM instances.
+"""
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, bindparam
+
+from .models import Customer, Technician, ServiceType, Invoice
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PointLookup:
+    """A prebuilt parameterized statement and its call counters"""
+    name: str
+    statement: Any
+    # Entity lookups return the ORM object, column lookups a Row
+    scalar: bool = True
+    calls: int = 0
+    hits: int = 0
+    total_time: float = 0.0
+
+
+class StatementCache:
+    """Named, precompiled point lookups usable from sync and async sessions"""
+
+    def __init__(self):
+        self.lookups: Dict[str, PointLookup] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, statement, scalar: bool = True) -> PointLookup:
+        lookup = PointLookup(name=name, statement=statement, scalar=scalar)
+        self.lookups[name] = lookup
+        return lookup
+
+    def _record(self, lookup: PointLookup, started: float, found: bool):
+        with self._lock:
+            lookup.calls += 1
+            lookup.hits += int(found)
+            lookup.total_time += time.perf_counter() - started
+
+    def first(self, db, name: str, **params) -> Optional[Any]:
+        """Run a lookup on a sync Session; returns the object/Row or None"""
+        lookup = self.lookups[name]
+        started = time.perf_counter()
+        result = db.execute(lookup.statement, params)
+        row = result.scalars().first() if lookup.scalar else result.first()
+        self._record(lookup, started, row is not None)
+        return row
+
+    async def first_async(self, db, name: str, **params) -> Optional[Any]:
+        """Run a lookup on an AsyncSession"""
+        lookup = self.lookups[name]
+        started = time.perf_counter()
+        result = await db.execute(lookup.statement, params)
+        row = result.scalars().first() if lookup.scalar else result.first()
+        self._record(lookup, started, row is not None)
+        return row
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": lookup.calls,
+                    "hits": lookup.hits,
+                    "avg_ms": round(lookup.total_time / lookup.calls * 1000, 3) if lookup.calls else 0,
+                }
+                for name, lookup in self.lookups.items()
+            }
+
+
+# Global statement cache with the shared lookups
+statement_cache = StatementCache()
+
+statement_cache.register(
+    "customer_by_user", select(Customer).where(Customer.user_id == bindparam("user_id")).limit(1)
+)
+statement_cache.register(
+    "customer_id_by_user",
+    select(Customer.id).where(Customer.user_id == bindparam("user_id")).limit(1), scalar=False
+)
+statement_cache.register(
+    "technician_by_user", select(Technician).where(Technician.user_id == bindparam("user_id")).limit(1)
+)
+statement_cache.register(
+    "technician_id_by_user",
+    select(Technician.id).where(Technician.user_id == bindparam("user_id")).limit(1), scalar=False
+)
+statement_cache.register(
+    "service_type_by_id", select(ServiceType).where(ServiceType.id == bindparam("id"))
+)
+statement_cache.register(
+    "invoice_by_id", select(Invoice).where(Invoice.id == bindparam("id"))
+)
+
+
+def customer_by_user(db, user_id) -> Optional[Customer]:
+    return statement_cache.first(db, "customer_by_user", user_id=user_id)
+
+
+def customer_id_by_user(db, user_id):
+    """Just the customer's id (None when the user has no customer profile)"""
+    row = statement_cache.first(db, "customer_id_by_user", user_id=user_id)
+    return row.id if row is not None else None
+
+
+def technician_by_user(db, user_id) -> Optional[Technician]:
+    return statement_cache.first(db, "technician_by_user", user_id=user_id)
+
+
+def technician_id_by_user(db, user_id):
+    """Just the technician's id (None when the user is not a technician)"""
+    row = statement_cache.first(db, "technician_id_by_user", user_id=user_id)
+    return row.id if row is not None else None
+
+
+def service_type_by_id(db, service_type_id) -> Optional[ServiceType]:
+    return statement_cache.first(db, "service_type_by_id", id=service_type_id)
+
+
+def invoice_by_id(db, invoice_id) -> Optional[Invoice]:
+    return statement_cache.first(db, "invoice_by_id", id=invoice_id)
+
+
+async def customer_by_user_async(db, user_id) -> Optional[Customer]:
+    return await statement_cache.first_async(db, "customer_by_user", user_id=user_id)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import shared.* the same way the services do
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+"""
+Plan Regression Test
+EXPLAINs the filters used by reports, analytics, the dashboard and the
+service-center queues and fails unless PostgreSQL plans each one through
+the composite index declared for it in shared/models.py. Sequential scans
+are disabled so a nearly empty database still shows whether the index is
+usable at all. Skipped unless DATABASE_URL points at a reachable PostgreSQL.
+
+Usage: DATABASE_URL=postgresql://... python -m pytest tests/test_plan_regression.py
+"""
+import os
+from datetime import date, timedelta
+
+import pytest
+
+if not os.getenv("DATABASE_URL", "").startswith("postgresql"):
+    pytest.skip("plan regression needs DATABASE_URL pointing at PostgreSQL", allow_module_level=True)
+
+from sqlalchemy import select
+
+from shared.database import Base, engine, ensure_indexes, date_range
+from shared.models import Appointment, ServiceRecord, Invoice, Notification
+
+SOME_ID = "00000000-0000-0000-0000-000000000000"
+TODAY = date.today()
+
+CASES = [
+    (
+        "appointments by status and date",
+        select(Appointment.id).where(
+            Appointment.status == "completed",
+            date_range(Appointment.appointment_date, TODAY - timedelta(days=30), TODAY)
+        ),
+        "ix_appointments_status_date",
+    ),
+    (
+        "technician appointments by date",
+        select(Appointment.id).where(
+            Appointment.technician_id == SOME_ID,
+            date_range(Appointment.appointment_date, TODAY, TODAY)
+        ),
+        "ix_appointments_technician_date",
+    ),
+    (
+        "service center appointments by status",
+        select(Appointment.id).where(Appointment.service_center_id == SOME_ID, Appointment.status == "pending"),
+        "ix_appointments_center_status",
+    ),
+    (
+        "service records by date",
+        select(ServiceRecord.id).where(date_range(ServiceRecord.service_date, TODAY - timedelta(days=30), TODAY)),
+        "ix_service_records_service_date",
+    ),
+    (
+        "overdue invoices",
+        select(Invoice.id).where(Invoice.payment_status == "pending", Invoice.due_date < TODAY),
+        "ix_invoices_payment_status_due_date",
+    ),
+    (
+        "unread notifications",
+        select(Notification.id).where(
+            Notification.user_id == SOME_ID, Notification.is_read == False
+        ).order_by(Notification.created_at.desc()),
+        "ix_notifications_user_read_created",
+    ),
+]
+
+
+def index_names(plan):
+    """Every index the plan (EXPLAIN FORMAT JSON) touches"""
+    if isinstance(plan, list):
+        for item in plan:
+            yield from index_names(item)
+    elif isinstance(plan, dict):
+        if "Index Name" in plan:
+            yield plan["Index Name"]
+        for value in plan.values():
+            yield from index_names(value)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        connection = engine.connect()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes()
+    connection.exec_driver_sql("SET enable_seqscan = off")
+    yield connection
+    connection.rollback()
+    connection.close()
+
+
+@pytest.mark.parametrize("name,statement,expected", CASES, ids=[case[0] for case in CASES])
+def test_filter_uses_index(conn, name, statement, expected):
+    compiled = statement.compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    used = sorted(set(index_names(plan)))
+    assert expected in used, f"{name}: expected {expected}, plan uses {used or 'no index'}"